@@ -0,0 +1,71 @@
+{{ config(cluster_by=['player', 'match_year']) }}
+
+-- One row per player per match, from the player's side: player-vs-field
+-- breakdowns and rivalry networks are a single group-by over this table
+with played_matches as (
+    -- Walkovers are not matches played, as in fct_player_tournament_summary
+    select m.*
+    from {{ ref('stg_all_matches_simple') }} m
+    left join {{ ref('stg_match_scores') }} sc
+        on m.tournament_id = sc.tournament_id
+        and m.match_num = sc.match_num
+        and m.governing_body = sc.governing_body
+    where coalesce(sc.completion_status, 'unknown') != 'walkover'
+),
+player_matches as (
+    select
+        winner_name as player,
+        loser_name as opponent,
+        1 as won,
+        winner_rank as player_rank,
+        loser_rank as opponent_rank,
+        governing_body,
+        tournament_id,
+        tournament_name,
+        tournament_level,
+        tournament_date,
+        match_num,
+        surface,
+        round_of_match,
+        round_of_match_number
+    from played_matches
+    union all
+    select
+        loser_name as player,
+        winner_name as opponent,
+        0 as won,
+        loser_rank as player_rank,
+        winner_rank as opponent_rank,
+        governing_body,
+        tournament_id,
+        tournament_name,
+        tournament_level,
+        tournament_date,
+        match_num,
+        surface,
+        round_of_match,
+        round_of_match_number
+    from played_matches
+)
+select
+    *,
+    year(tournament_date) as match_year,
+    case
+        when opponent_rank is null then 'Unranked'
+        when opponent_rank <= 5 then 'Top 5'
+        when opponent_rank <= 10 then '6-10'
+        when opponent_rank <= 20 then '11-20'
+        when opponent_rank <= 50 then '21-50'
+        when opponent_rank <= 100 then '51-100'
+        else '101+'
+    end as opponent_rank_bucket,
+    case
+        when opponent_rank is null then 7
+        when opponent_rank <= 5 then 1
+        when opponent_rank <= 10 then 2
+        when opponent_rank <= 20 then 3
+        when opponent_rank <= 50 then 4
+        when opponent_rank <= 100 then 5
+        else 6
+    end as opponent_rank_bucket_order
+from player_matches
\ No newline at end of file
@@ -0,0 +1,94 @@
+with player_matches as (
+    select
+        winner_name as player,
+        governing_body,
+        year(tournament_date) as season,
+        surface,
+        1 as won,
+        winner_ace as aces,
+        winner_double_faults as double_faults,
+        winner_service_points as service_points,
+        winner_1st_serves as first_serves_in,
+        winner_1st_serves_won as first_serves_won,
+        winner_2nd_serves_won as second_serves_won,
+        winner_serve_games as service_games,
+        winner_break_points_saved as break_points_saved,
+        winner_break_points_faced as break_points_faced,
+        loser_service_points as return_points,
+        loser_service_points - loser_1st_serves_won - loser_2nd_serves_won as return_points_won,
+        loser_serve_games as return_games,
+        loser_break_points_faced as break_point_chances,
+        loser_break_points_faced - loser_break_points_saved as break_points_converted
+    from {{ ref('stg_all_matches_simple') }}
+    where winner_service_points > 0
+      and loser_service_points > 0
+    union all
+    select
+        loser_name as player,
+        governing_body,
+        year(tournament_date) as season,
+        surface,
+        0 as won,
+        loser_ace as aces,
+        loser_double_faults as double_faults,
+        loser_service_points as service_points,
+        loser_1st_serves as first_serves_in,
+        loser_1st_serves_won as first_serves_won,
+        loser_2nd_serves_won as second_serves_won,
+        loser_serve_games as service_games,
+        loser_break_points_saved as break_points_saved,
+        loser_break_points_faced as break_points_faced,
+        winner_service_points as return_points,
+        winner_service_points - winner_1st_serves_won - winner_2nd_serves_won as return_points_won,
+        winner_serve_games as return_games,
+        winner_break_points_faced as break_point_chances,
+        winner_break_points_faced - winner_break_points_saved as break_points_converted
+    from {{ ref('stg_all_matches_simple') }}
+    where winner_service_points > 0
+      and loser_service_points > 0
+),
+season_totals as (
+    select
+        player,
+        governing_body,
+        season,
+        surface,
+        count(*) as matches,
+        sum(won) as matches_won,
+        sum(aces) as aces,
+        sum(double_faults) as double_faults,
+        sum(service_points) as service_points,
+        sum(first_serves_in) as first_serves_in,
+        sum(first_serves_won) as first_serves_won,
+        sum(service_points - first_serves_in) as second_serve_points,
+        sum(second_serves_won) as second_serves_won,
+        sum(service_games) as service_games,
+        sum(break_points_saved) as break_points_saved,
+        sum(break_points_faced) as break_points_faced,
+        sum(return_points) as return_points,
+        sum(return_points_won) as return_points_won,
+        sum(return_games) as return_games,
+        sum(break_point_chances) as break_point_chances,
+        sum(break_points_converted) as break_points_converted
+    from player_matches
+    group by
+        player,
+        governing_body,
+        season,
+        surface
+)
+select
+    *,
+    round(aces / nullif(service_points, 0) * 100, 1) as ace_pct,
+    round(double_faults / nullif(service_points, 0) * 100, 1) as double_fault_pct,
+    round(first_serves_in / nullif(service_points, 0) * 100, 1) as first_serve_in_pct,
+    round(first_serves_won / nullif(first_serves_in, 0) * 100, 1) as first_serve_won_pct,
+    round(second_serves_won / nullif(second_serve_points, 0) * 100, 1) as second_serve_won_pct,
+    round(break_points_saved / nullif(break_points_faced, 0) * 100, 1) as break_points_saved_pct,
+    round((service_games - (break_points_faced - break_points_saved)) / nullif(service_games, 0) * 100, 1) as service_games_won_pct,
+    round(return_points_won / nullif(return_points, 0) * 100, 1) as return_points_won_pct,
+    round(break_points_converted / nullif(break_point_chances, 0) * 100, 1) as break_points_converted_pct,
+    round(break_points_converted / nullif(return_games, 0) * 100, 1) as return_games_won_pct
+from season_totals
+order by
+    player, season, surface
\ No newline at end of file
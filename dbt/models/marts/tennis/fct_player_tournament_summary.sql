@@ -1,4 +1,21 @@
-with player_games as (
+with matches as (
+    select
+        m.*,
+        -- Walkovers are not counted as matches played or won
+        iff(coalesce(sc.completion_status, 'unknown') = 'walkover', 0, 1) as match_played,
+        coalesce(sc.winner_sets, 0) as winner_sets,
+        coalesce(sc.loser_sets, 0) as loser_sets,
+        coalesce(sc.winner_games, 0) as winner_games,
+        coalesce(sc.loser_games, 0) as loser_games,
+        coalesce(sc.winner_tiebreaks, 0) as winner_tiebreaks,
+        coalesce(sc.loser_tiebreaks, 0) as loser_tiebreaks
+    from {{ ref('stg_all_matches_simple') }} m
+    left join {{ ref('stg_match_scores') }} sc
+        on m.tournament_id = sc.tournament_id
+        and m.match_num = sc.match_num
+        and m.governing_body = sc.governing_body
+),
+player_games as (
     select
        tournament_date,
        tournament_name,
@@ -6,12 +23,18 @@ with player_games as (
        winner_name as player,
        winner_rank as rank,
        winner_rank_points as points,
-       1 as games_won,
-       0 as games_lost,
+       match_played as matches_won,
+       0 as matches_lost,
+       winner_sets as sets_won,
+       loser_sets as sets_lost,
+       winner_games as games_won,
+       loser_games as games_lost,
+       winner_tiebreaks as tiebreaks_won,
+       loser_tiebreaks as tiebreaks_lost,
        governing_body,
        round_of_match,
        round_of_match_number
-    from {{ ref('stg_all_matches_simple') }}
+    from matches
     union all
     select
        tournament_date,
@@ -20,12 +43,18 @@ with player_games as (
        loser_name as player,
        loser_rank as rank,
        loser_rank_points as points,
-       0 as games_won,
-       1 as games_lost,
+       0 as matches_won,
+       match_played as matches_lost,
+       loser_sets as sets_won,
+       winner_sets as sets_lost,
+       loser_games as games_won,
+       winner_games as games_lost,
+       loser_tiebreaks as tiebreaks_won,
+       winner_tiebreaks as tiebreaks_lost,
        governing_body,
        round_of_match,
        round_of_match_number
-    from {{ ref('stg_all_matches_simple') }}
+    from matches
 ),
 last_round as (
     select
@@ -52,8 +81,14 @@ SELECT
     max(pg.tournament_date) as as_of,
     min(pg.rank) as min_rank,
     max(pg.points) as max_points,
+    sum(pg.matches_won) as matches_won,
+    sum(pg.matches_lost) as matches_lost,
+    sum(pg.sets_won) as sets_won,
+    sum(pg.sets_lost) as sets_lost,
     sum(pg.games_won) as games_won,
     sum(pg.games_lost) as games_lost,
+    sum(pg.tiebreaks_won) as tiebreaks_won,
+    sum(pg.tiebreaks_lost) as tiebreaks_lost,
     min(pg.round_of_match_number) as round_of_match_number,
     lr.round_of_match as last_round_of_match,
     pg.governing_body
@@ -0,0 +1,20 @@
+{{ config(cluster_by=['governing_body', 'match_year']) }}
+
+select
+    player,
+    governing_body,
+    match_year,
+    count(*) as tournaments,
+    sum(matches_won) as matches_won,
+    sum(matches_lost) as matches_lost,
+    sum(games_won) as games_won,
+    sum(games_lost) as games_lost,
+    min(min_rank) as best_rank,
+    max(max_points) as max_points
+from {{ ref('fct_player_tournament_summary') }}
+group by
+    player,
+    governing_body,
+    match_year
+order by
+    governing_body, match_year, tournaments desc
\ No newline at end of file
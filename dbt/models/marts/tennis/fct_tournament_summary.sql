@@ -0,0 +1,120 @@
+with matches as (
+    select * from {{ ref('stg_all_matches_simple') }}
+),
+player_entries as (
+    select
+        tournament_id,
+        governing_body,
+        winner_name as player,
+        winner_seed as seed,
+        round_of_match,
+        round_of_match_number,
+        1 as won
+    from matches
+    union all
+    select
+        tournament_id,
+        governing_body,
+        loser_name as player,
+        loser_seed as seed,
+        round_of_match,
+        round_of_match_number,
+        0 as won
+    from matches
+),
+player_progress as (
+    select
+        tournament_id,
+        governing_body,
+        player,
+        min(seed) as seed,
+        min(round_of_match_number) as best_round_number,
+        case
+            when max(case when round_of_match = 'F' and won = 1 then 1 else 0 end) = 1 then 'W'
+            else min_by(round_of_match, round_of_match_number)
+        end as best_round
+    from player_entries
+    group by
+        tournament_id,
+        governing_body,
+        player
+),
+seed_progress as (
+    select
+        tournament_id,
+        governing_body,
+        count(seed) as seeds_entered,
+        count_if(seed is not null and best_round_number <= 8) as seeds_reached_qf,
+        count_if(seed is not null and best_round_number <= 4) as seeds_reached_sf,
+        min_by(player, seed) as top_seed,
+        min_by(best_round, seed) as top_seed_best_round
+    from player_progress
+    group by
+        tournament_id,
+        governing_body
+),
+finals as (
+    select
+        tournament_id,
+        governing_body,
+        winner_name as champion,
+        winner_seed as champion_seed,
+        loser_name as finalist,
+        loser_seed as finalist_seed,
+        score as final_score
+    from matches
+    where round_of_match = 'F'
+    qualify row_number() over (partition by tournament_id, governing_body order by match_num desc) = 1
+),
+editions as (
+    select
+        tournament_id,
+        tournament_name,
+        tournament_level,
+        governing_body,
+        max(surface) as surface,
+        max(draw_size) as draw_size,
+        min(tournament_date) as tournament_date,
+        year(min(tournament_date)) as match_year,
+        count(*) as total_matches,
+        count_if(winner_rank > loser_rank) as upsets,
+        avg(minutes) as avg_match_minutes
+    from matches
+    group by
+        tournament_id,
+        tournament_name,
+        tournament_level,
+        governing_body
+)
+select
+    e.tournament_id,
+    e.tournament_name,
+    e.tournament_level,
+    e.governing_body,
+    e.surface,
+    e.draw_size,
+    e.tournament_date,
+    e.match_year,
+    f.champion,
+    f.champion_seed,
+    f.finalist,
+    f.finalist_seed,
+    f.final_score,
+    e.total_matches,
+    e.upsets,
+    round(e.upsets / nullif(e.total_matches, 0) * 100, 1) as upset_pct,
+    round(e.avg_match_minutes, 1) as avg_match_minutes,
+    s.seeds_entered,
+    s.seeds_reached_qf,
+    s.seeds_reached_sf,
+    s.top_seed,
+    s.top_seed_best_round
+from editions e
+left join finals f
+    on e.tournament_id = f.tournament_id
+    and e.governing_body = f.governing_body
+left join seed_progress s
+    on e.tournament_id = s.tournament_id
+    and e.governing_body = s.governing_body
+order by
+    tournament_name asc, match_year desc
\ No newline at end of file
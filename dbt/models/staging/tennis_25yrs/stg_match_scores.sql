@@ -0,0 +1,99 @@
+{{ config(materialized='table') }}
+
+-- Parses SCORE strings such as '7-6(5) 3-6 6-4 RET' or '6-3 4-6 [10-8]' into
+-- per-side set, game and tiebreak totals. Set tokens are split and parsed
+-- set-wise in the warehouse; a bracketed match tiebreak counts as a set and a
+-- tiebreak but its points are not games.
+with matches as (
+    select
+        tournament_id,
+        match_num,
+        governing_body,
+        tournament_date,
+        winner_name,
+        loser_name,
+        best_of,
+        score,
+        upper(coalesce(score, '')) as score_upper
+    from {{ ref('stg_all_matches_simple') }}
+),
+set_tokens as (
+    select
+        m.tournament_id,
+        m.match_num,
+        m.governing_body,
+        t.index + 1 as set_number,
+        try_to_number(regexp_substr(t.value::string, '^[[]?([0-9]+)-([0-9]+)', 1, 1, 'e', 1)) as winner_score,
+        try_to_number(regexp_substr(t.value::string, '^[[]?([0-9]+)-([0-9]+)', 1, 1, 'e', 2)) as loser_score,
+        regexp_like(t.value::string, '.*[(].*') as has_tiebreak_points,
+        -- regexp_like matches the whole token: '[10-8]' needs its own alternative
+        regexp_like(t.value::string, '[[][0-9]+-[0-9]+[]]') as is_match_tiebreak
+    from matches m,
+        lateral flatten(input => split(trim(m.score), ' ')) t
+    where regexp_like(t.value::string, '[0-9]+-[0-9]+([(][0-9]+[)])?|[[][0-9]+-[0-9]+[]]')
+),
+sets as (
+    select
+        *,
+        iff(is_match_tiebreak, 0, winner_score) as winner_games,
+        iff(is_match_tiebreak, 0, loser_score) as loser_games,
+        -- Tiebreak sets: a match tiebreak, loser's points in brackets, or the classic 7-6
+        is_match_tiebreak
+            or has_tiebreak_points
+            or (greatest(winner_score, loser_score) = 7 and least(winner_score, loser_score) = 6) as is_tiebreak
+    from set_tokens
+),
+decided_sets as (
+    select
+        *,
+        -- A set counts as won once it is decided; a set cut short by a retirement does not
+        is_tiebreak or (greatest(winner_score, loser_score) >= 6 and abs(winner_score - loser_score) >= 2) as is_decided
+    from sets
+),
+set_totals as (
+    select
+        tournament_id,
+        match_num,
+        governing_body,
+        count(*) as sets_played,
+        sum(iff(is_decided and winner_score > loser_score, 1, 0)) as winner_sets,
+        sum(iff(is_decided and loser_score > winner_score, 1, 0)) as loser_sets,
+        sum(winner_games) as winner_games,
+        sum(loser_games) as loser_games,
+        sum(iff(is_tiebreak and winner_score > loser_score, 1, 0)) as winner_tiebreaks,
+        sum(iff(is_tiebreak and loser_score > winner_score, 1, 0)) as loser_tiebreaks
+    from decided_sets
+    group by
+        tournament_id,
+        match_num,
+        governing_body
+)
+select
+    m.tournament_id,
+    m.match_num,
+    m.governing_body,
+    m.tournament_date,
+    m.winner_name,
+    m.loser_name,
+    m.best_of,
+    m.score,
+    case
+        when m.score is null or trim(m.score) = '' then 'unknown'
+        when m.score_upper like '%W/O%' or m.score_upper like '%WALKOVER%' then 'walkover'
+        when m.score_upper like '%RET%' then 'retired'
+        when m.score_upper like '%DEF%' then 'defaulted'
+        when m.score_upper like '%ABD%' or m.score_upper like '%ABN%' or m.score_upper like '%UNFINISHED%' then 'abandoned'
+        else 'completed'
+    end as completion_status,
+    coalesce(s.sets_played, 0) as sets_played,
+    coalesce(s.winner_sets, 0) as winner_sets,
+    coalesce(s.loser_sets, 0) as loser_sets,
+    coalesce(s.winner_games, 0) as winner_games,
+    coalesce(s.loser_games, 0) as loser_games,
+    coalesce(s.winner_tiebreaks, 0) as winner_tiebreaks,
+    coalesce(s.loser_tiebreaks, 0) as loser_tiebreaks
+from matches m
+left join set_totals s
+    on m.tournament_id = s.tournament_id
+    and m.match_num = s.match_num
+    and m.governing_body = s.governing_body
\ No newline at end of file
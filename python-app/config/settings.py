@@ -7,32 +7,137 @@ Created on Mon Aug 11 22:22:25 2025
 Configuration settings for the Tennis Analytics application.
 """
 import os
-from dotenv import load_dotenv
+import threading
+from typing import Any, Callable, Optional
 
-# Load environment variables from .env file
-load_dotenv(dotenv_path="MyKeys.env")
+_env_file_loaded = False
+_env_file_lock = threading.Lock()
+
+def _load_env_file():
+    """Load environment variables from MyKeys.env, once, on the first setting read."""
+    global _env_file_loaded
+    if _env_file_loaded:
+        return
+    with _env_file_lock:
+        if not _env_file_loaded:
+            from dotenv import load_dotenv
+            load_dotenv(dotenv_path="MyKeys.env")
+            _env_file_loaded = True
+
+def _flag(value: str) -> bool:
+    return value.lower() == "true"
+
+class Env:
+    """A setting read from the environment on first access rather than at import."""
+    
+    _unset = object()
+    
+    def __init__(self, name: str, default: Optional[str] = None, cast: Callable[[str], Any] = str):
+        self.name = name
+        self.default = default
+        self.cast = cast
+        self._value = self._unset
+    
+    def __get__(self, instance, owner) -> Any:
+        if self._value is self._unset:
+            _load_env_file()
+            raw = os.getenv(self.name, self.default)
+            self._value = self.cast(raw) if raw is not None else None
+        return self._value
 
 class Settings:
     """Application configuration settings."""
     
     # Anthropic API settings
-    ANTHROPIC_API_KEY = os.getenv("ANTHROPIC_API_KEY")
+    ANTHROPIC_API_KEY = Env("ANTHROPIC_API_KEY")
     ANTHROPIC_MODEL = "claude-3-5-sonnet-20241022"
     ANTHROPIC_MAX_TOKENS = 1024
     ANTHROPIC_TEMPERATURE = 0.1
+    ANTHROPIC_BASE_URL = Env("ANTHROPIC_BASE_URL")  # e.g. a local stub server for load tests
+    
+    # LLM scheduler settings (process-wide)
+    LLM_REQUESTS_PER_MINUTE = Env("LLM_REQUESTS_PER_MINUTE", "50", int)
+    LLM_TOKENS_PER_MINUTE = Env("LLM_TOKENS_PER_MINUTE", "40000", int)
+    LLM_MAX_CONCURRENCY = Env("LLM_MAX_CONCURRENCY", "4", int)
+    LLM_MAX_RETRIES = 4
+    LLM_BACKOFF_BASE_SECONDS = 1.0
+    LLM_BACKOFF_MAX_SECONDS = 30.0
+    LLM_QUEUE_TIMEOUT_SECONDS = 60.0
     
     # Snowflake connection settings
-    SNOWFLAKE_ACCOUNT = os.getenv("SNOWFLAKE_ACCOUNT")
-    SNOWFLAKE_USER = os.getenv("SNOWFLAKE_USER")
-    SNOWFLAKE_ROLE = os.getenv("SNOWFLAKE_ROLE")
-    SNOWFLAKE_WAREHOUSE = os.getenv("SNOWFLAKE_WAREHOUSE")
-    SNOWFLAKE_DATABASE = os.getenv("SNOWFLAKE_DATABASE")
-    SNOWFLAKE_SCHEMA = os.getenv("SNOWFLAKE_SCHEMA")
+    SNOWFLAKE_ACCOUNT = Env("SNOWFLAKE_ACCOUNT")
+    SNOWFLAKE_USER = Env("SNOWFLAKE_USER")
+    SNOWFLAKE_ROLE = Env("SNOWFLAKE_ROLE")
+    SNOWFLAKE_WAREHOUSE = Env("SNOWFLAKE_WAREHOUSE")
+    SNOWFLAKE_DATABASE = Env("SNOWFLAKE_DATABASE")
+    SNOWFLAKE_SCHEMA = Env("SNOWFLAKE_SCHEMA")
     SNOWFLAKE_PRIVATE_KEY_PATH = "rsa_key.p8"
+    SNOWFLAKE_POOL_SIZE = Env("SNOWFLAKE_POOL_SIZE", "8", int)  # Idle connections kept for reuse
+    SNOWFLAKE_POOL_IDLE_SECONDS = 600  # Idle connections older than this are closed, not reused
     
     # Application settings
     DEFAULT_PLAYER_LIMIT = 20
+    MAX_PLAYER_LIMIT = 100
     MAX_SEARCH_RESULTS = 25
+    TOOL_RESULT_TOKEN_BUDGET = 1500  # Tool result size sent to the follow-up call
+    UI_HISTORY_MAX_MESSAGES = 200  # Per session; older messages are dropped
+    UI_HISTORY_PAGE_SIZE = 20  # Messages rendered per rerun before "show earlier"
+    MATCH_PAGE_SIZE = 50  # Rows per match listing page
+    MAX_MATCH_PAGE_SIZE = 500
+    MAX_NETWORK_PLAYERS = 20  # Players in one rivalry network query
+    
+    # Speculative prefetch settings
+    SPECULATION_ENABLED = Env("SPECULATION_ENABLED", "true", _flag)
+    SPECULATION_MAX_WORKERS = 4
+    
+    # Warehouse guard settings (budgets of 0 disable that check)
+    QUERY_TIMEOUT_SECONDS = Env("QUERY_TIMEOUT_SECONDS", "30", int)
+    SESSION_BYTES_PER_MINUTE = Env("SESSION_BYTES_PER_MINUTE", str(5 * 1024 ** 3), int)
+    SESSION_CREDITS_PER_MINUTE = Env("SESSION_CREDITS_PER_MINUTE", "0.02", float)
+    WAREHOUSE_CREDITS_PER_HOUR = Env("WAREHOUSE_CREDITS_PER_HOUR", "1", float)  # X-Small
+    WAREHOUSE_SCAN_BYTES_PER_SECOND = Env("WAREHOUSE_SCAN_BYTES_PER_SECOND", str(200 * 1024 ** 2), int)
+    TOOL_RESULT_CACHE_SIZE = 256
+    TOOL_RESULT_CACHE_TTL_SECONDS = 3600
+    RESULT_REUSE_REFRESH_SECONDS = 300  # Query history lookups for the result reuse metrics
+    
+    # Local file-drop ingestion settings
+    INGEST_ENABLED = Env("INGEST_ENABLED", "false", _flag)
+    INGEST_WATCH_DIR = Env("INGEST_WATCH_DIR", "data/incoming")
+    INGEST_OUTPUT_DIR = Env("INGEST_OUTPUT_DIR", "data/parquet")
+    INGEST_WORKERS = Env("INGEST_WORKERS", str(os.cpu_count() or 1), int)
+    INGEST_POLL_SECONDS = 5
+    
+    # Rating engine settings
+    ELO_SNAPSHOT_PATH = Env("ELO_SNAPSHOT_PATH", "data/elo_snapshot.npz")
+    
+    # Precomputed player answers, rebuilt after each dbt run
+    ANSWER_STORE_PATH = Env("ANSWER_STORE_PATH", "data/player_answers.bin")
+    ANSWER_STORE_CHECK_SECONDS = 300  # Data version checks against the warehouse
+    
+    # Tool call log, read by the warm-up scheduler
+    QUERY_LOG_PATH = Env("QUERY_LOG_PATH", "data/query_log.jsonl")
+    QUERY_LOG_MAX_BYTES = 16 * 1024 ** 2  # Rotated to <path>.1 past this size
+    
+    # Cache warm-up after startup and detected data refreshes
+    WARMUP_ENABLED = Env("WARMUP_ENABLED", "false", _flag)
+    WARMUP_CONCURRENCY = Env("WARMUP_CONCURRENCY", "2", int)  # Calls in flight; live traffic gets the rest
+    WARMUP_MAX_CALLS = Env("WARMUP_MAX_CALLS", "60", int)
+    WARMUP_LOG_DAYS = 14  # Query log window for the most asked calls
+    WARMUP_TOP_PLAYERS = 10  # Seeded career stats per tour
+    WARMUP_RIVALRY_PLAYERS = 5  # Seeded head-to-heads among each tour's top players
+    WARMUP_POLL_SECONDS = 60
+    WARMUP_DEBOUNCE_SECONDS = 5
+    WARMUP_CHECK_WAREHOUSE = Env("WARMUP_CHECK_WAREHOUSE", "true", _flag)
+    DBT_RUN_RESULTS_PATH = Env("DBT_RUN_RESULTS_PATH", "../dbt/target/run_results.json")
+    
+    # Agent backend; the UI runs the agent in-process unless BACKEND_URL is set
+    BACKEND_URL = Env("BACKEND_URL")  # e.g. http://127.0.0.1:8600
+    BACKEND_HOST = Env("BACKEND_HOST", "127.0.0.1")
+    BACKEND_PORT = Env("BACKEND_PORT", "8600", int)
+    BACKEND_WORKERS = Env("BACKEND_WORKERS", "16", int)
+    BACKEND_MAX_QUEUE = 64
+    BACKEND_SESSION_TTL_SECONDS = 3600
+    BACKEND_TIMEOUT_SECONDS = 300
     
     @classmethod
     def validate(cls):
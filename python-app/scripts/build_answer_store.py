@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+"""
+Build the precomputed player answer store.
+
+Run after each dbt build (or nightly): pulls per-player, per-year totals
+from FCT_PLAYER_TOURNAMENT_SUMMARY in one query and atomically replaces the
+memory-mapped store. Running app processes pick up the new file on their
+next lookup.
+
+    python scripts/build_answer_store.py [--output data/player_answers.bin]
+"""
+import argparse
+import os
+import sys
+import time
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config.settings import settings
+from src.data.answer_store import SOURCE_TABLE, build_answer_store
+from src.data.repositories import MetadataRepository, PlayerRepository
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the precomputed player answer store")
+    parser.add_argument('--output', default=settings.ANSWER_STORE_PATH)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    # Read before the totals: a refresh during the build leaves the store marked stale
+    data_version = MetadataRepository().get_tables_last_altered([SOURCE_TABLE])
+    totals = PlayerRepository().get_player_year_totals()
+    if totals is None or totals.num_rows == 0:
+        print("AS - No player totals returned; keeping the existing store")
+        sys.exit(1)
+
+    players = build_answer_store(totals, args.output, data_version)
+    print(f"AS - Wrote {players} players ({totals.num_rows} player-years, "
+          f"{os.path.getsize(args.output) / 1024 ** 2:.1f} MB) to {args.output} "
+          f"in {time.perf_counter() - started:.1f}s")
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
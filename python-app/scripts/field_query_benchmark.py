@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark set-based player-vs-field and rivalry network queries against the
+pairwise head-to-head calls they replace.
+
+For a rivalry network among the top K players, compares one grouped query
+over FCT_PLAYER_MATCHES with K*(K-1)/2 head-to-head queries; for a player's
+record per opponent, compares one grouped query with one head-to-head query
+per opponent. Reports wall time, warehouse queries, rows and Arrow bytes
+fetched, and checks that both approaches count the same matches.
+
+Repeated runs can be served from Snowflake's result cache, so the first run
+is reported separately from the median.
+
+    python scripts/field_query_benchmark.py --players 8 --field-player "Roger Federer" --runs 3
+"""
+import argparse
+import os
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import combinations
+from typing import Any, Callable, Dict, List, Tuple
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.data.connections import snowflake_db
+from src.data.repositories import MatchRepository, PlayerRepository
+
+class FetchCounter:
+    """Counts the warehouse queries and Arrow data the repositories fetch."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.queries = self.rows = self.bytes = 0
+        self._execute = snowflake_db.execute_query_arrow
+        snowflake_db.execute_query_arrow = self._counted
+
+    def _counted(self, query, params=None):
+        table = self._execute(query, params)
+        with self._lock:
+            self.queries += 1
+            self.rows += table.num_rows
+            self.bytes += table.nbytes
+        return table
+
+    def reset(self):
+        with self._lock:
+            self.queries = self.rows = self.bytes = 0
+
+def pairwise_counts(match_repo: MatchRepository, pairs: List[Tuple[str, str]], workers: int,
+                    year_start, year_end) -> Dict[Tuple[str, str], int]:
+    """Matches per pair, one head-to-head query each (the N-pairwise approach)."""
+    def count(pair: Tuple[str, str]) -> int:
+        matches = match_repo.get_head_to_head_matches(pair[0], pair[1], year_start, year_end)
+        return matches.num_rows if matches is not None else 0
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return {pair: matches for pair, matches in zip(pairs, pool.map(count, pairs)) if matches}
+
+def network_counts(match_repo: MatchRepository, players: List[str], year_start, year_end) -> Dict[Tuple[str, str], int]:
+    edges = match_repo.get_rivalry_network(players, year_start, year_end)
+    return {
+        (player, opponent): matches
+        for player, opponent, matches in zip(*(edges.column(column).to_pylist() for column in ('PLAYER', 'OPPONENT', 'MATCHES')))
+        if player < opponent
+    }
+
+def field_counts(match_repo: MatchRepository, player: str, year_start, year_end) -> Dict[Tuple[str, str], int]:
+    groups = match_repo.get_player_vs_field(player, 'opponent', year_start, year_end, limit=10000)
+    return {
+        (player, opponent): matches
+        for opponent, matches in zip(groups.column('GROUP_VALUE').to_pylist(), groups.column('MATCHES').to_pylist())
+    }
+
+def measure(counter: FetchCounter, runs: int, approach: Callable[[], Dict]) -> Dict[str, Any]:
+    times = []
+    for _ in range(runs):
+        counter.reset()
+        started = time.perf_counter()
+        result = approach()
+        times.append(time.perf_counter() - started)
+    return {
+        'result': result,
+        'first_s': times[0],
+        'median_s': statistics.median(times),
+        'queries': counter.queries,
+        'rows': counter.rows,
+        'bytes': counter.bytes
+    }
+
+def report(title: str, grouped: Dict[str, Any], pairwise: Dict[str, Any]):
+    print(f"\n{title}")
+    print(f"{'approach':<10} {'first s':>9} {'median s':>9} {'queries':>8} {'rows':>9} {'bytes':>12}")
+    for name, run in (('grouped', grouped), ('pairwise', pairwise)):
+        print(f"{name:<10} {run['first_s']:>9.3f} {run['median_s']:>9.3f} {run['queries']:>8} "
+              f"{run['rows']:>9} {run['bytes']:>12}")
+    print(f"speedup (median): {pairwise['median_s'] / grouped['median_s']:.1f}x")
+
+    mismatched = {pair for pair in set(grouped['result']) | set(pairwise['result'])
+                  if grouped['result'].get(pair) != pairwise['result'].get(pair)}
+    if mismatched:
+        print(f"MISMATCH in {len(mismatched)} pairs, e.g. "
+              + ", ".join(f"{pair}: {grouped['result'].get(pair)} vs {pairwise['result'].get(pair)}"
+                          for pair in sorted(mismatched)[:5]))
+    else:
+        print(f"match counts agree for {len(grouped['result'])} pairs")
+
+def main():
+    parser = argparse.ArgumentParser(description="Grouped vs pairwise head-to-head benchmark")
+    parser.add_argument('--players', type=int, default=8, help="Top players in the rivalry network")
+    parser.add_argument('--governing-body', default='ATP')
+    parser.add_argument('--field-player', help="Player for the per-opponent breakdown (default: the top player)")
+    parser.add_argument('--year-start', type=int)
+    parser.add_argument('--year-end', type=int)
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--workers', type=int, default=1, help="Concurrent pairwise queries")
+    args = parser.parse_args()
+
+    top = PlayerRepository().get_all_players(args.governing_body, args.year_start, args.year_end, args.players)
+    players = sorted(top.column('PLAYER').to_pylist())
+    field_player = args.field_player or top.column('PLAYER')[0].as_py()
+    match_repo = MatchRepository()
+    counter = FetchCounter()
+
+    pairs = list(combinations(players, 2))
+    report(
+        f"Rivalry network: {len(players)} {args.governing_body} players, {len(pairs)} pairs",
+        measure(counter, args.runs, lambda: network_counts(match_repo, players, args.year_start, args.year_end)),
+        measure(counter, args.runs, lambda: pairwise_counts(match_repo, pairs, args.workers,
+                                                            args.year_start, args.year_end))
+    )
+
+    # The pairwise approach needs the opponent list first; it is taken from the grouped run
+    grouped = measure(counter, args.runs, lambda: field_counts(match_repo, field_player, args.year_start, args.year_end))
+    opponents = sorted(grouped['result'])
+    report(
+        f"Player vs field: {field_player}, {len(opponents)} opponents",
+        grouped,
+        measure(counter, args.runs, lambda: pairwise_counts(match_repo, opponents, args.workers,
+                                                            args.year_start, args.year_end))
+    )
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
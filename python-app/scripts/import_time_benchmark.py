@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+"""
+Cold-start import benchmark for the app modules.
+
+Imports each module in a fresh interpreter under `python -X importtime`,
+reports its cumulative import time and the slowest imports it pulled in,
+and exits non-zero if a module eagerly imports one of the heavy
+dependencies that must only load on first use, or exceeds the time budget.
+
+    python scripts/import_time_benchmark.py [--budget-ms 400] [--runs 5]
+"""
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules whose import is on the app's startup path
+TARGETS = [
+    'config.settings',
+    'src.data.connections',
+    'src.data.repositories',
+    'src.services.tennis_service',
+    'src.ai.claude_agent',
+]
+
+# Must not be imported until first use: a query, LLM call, rating, chart or setting read
+DEFERRED = ['anthropic', 'pandas', 'pyarrow', 'numpy', 'snowflake.connector', 'cryptography', 'dotenv']
+
+IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+def measure(module: str) -> Tuple[float, Dict[str, Tuple[int, int]]]:
+    """Import `module` in a fresh interpreter; returns (cumulative ms, {imported: (self us, cumulative us)})."""
+    completed = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f"import {module}"],
+        cwd=PROJECT_ROOT, capture_output=True, text=True
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{completed.stderr[-2000:]}")
+
+    imports: Dict[str, Tuple[int, int]] = {}
+    for line in completed.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            imports[match.group(4)] = (int(match.group(1)), int(match.group(2)))
+    if module not in imports:
+        raise RuntimeError(f"No import timing for {module}")
+    return imports[module][1] / 1000, imports
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold-start import benchmark")
+    parser.add_argument('--runs', type=int, default=5, help="Fresh interpreters per module (median reported)")
+    parser.add_argument('--budget-ms', type=float, default=400.0, help="Fail if a module's median import exceeds this")
+    parser.add_argument('--top', type=int, default=8, help="Slowest imports to list per module")
+    args = parser.parse_args()
+
+    failures: List[str] = []
+    for module in TARGETS:
+        timings, imports = [], {}
+        for _ in range(args.runs):
+            elapsed, imports = measure(module)
+            timings.append(elapsed)
+        median = statistics.median(timings)
+        print(f"{module:<32} {median:8.1f} ms (min {min(timings):.1f}, max {max(timings):.1f})")
+
+        slowest = sorted(imports.items(), key=lambda item: item[1][0], reverse=True)[:args.top]
+        for name, (self_us, cumulative_us) in slowest:
+            print(f"    {name:<40} self {self_us / 1000:7.1f} ms  cumulative {cumulative_us / 1000:7.1f} ms")
+
+        eager = [name for name in DEFERRED if name in imports]
+        if eager:
+            failures.append(f"{module} eagerly imports {', '.join(eager)}")
+        if median > args.budget_ms:
+            failures.append(f"{module} takes {median:.1f} ms to import (budget {args.budget_ms:.0f} ms)")
+
+    if failures:
+        print("\nFAILED")
+        for failure in failures:
+            print(f"  {failure}")
+        sys.exit(1)
+    print("\nOK")
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
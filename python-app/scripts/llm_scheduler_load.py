@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+"""
+Load test for the LLM scheduler against the local rate-limiting stub.
+
+Fires concurrent interactive and batch calls through an LLMScheduler whose
+own limit is set above the stub's, so the stub returns 429s and the
+scheduler has to back off, and reports per-priority latency and the
+scheduler's metrics.
+
+    python scripts/llm_scheduler_load.py --interactive 20 --batch 40
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import anthropic
+
+from src.ai.llm_scheduler import BATCH, INTERACTIVE, LLMScheduler, LLMUnavailable
+from stub_anthropic_server import serve_stub
+
+def main():
+    parser = argparse.ArgumentParser(description="LLM scheduler load test")
+    parser.add_argument('--interactive', type=int, default=20)
+    parser.add_argument('--batch', type=int, default=40)
+    parser.add_argument('--stub-rpm', type=int, default=40)
+    parser.add_argument('--scheduler-rpm', type=int, default=60)
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--port', type=int, default=8765)
+    args = parser.parse_args()
+
+    server = serve_stub(args.port, rpm=args.stub_rpm, latency=0.2, overload_rate=0.05)
+    client = anthropic.Anthropic(api_key="stub", base_url=f"http://127.0.0.1:{args.port}", max_retries=0)
+    scheduler = LLMScheduler(
+        requests_per_minute=args.scheduler_rpm, tokens_per_minute=1_000_000,
+        max_concurrency=args.concurrency, max_retries=6,
+        backoff_base=0.5, backoff_max=10.0, queue_timeout=300.0
+    )
+
+    latencies = {INTERACTIVE: [], BATCH: []}
+    failures = {INTERACTIVE: 0, BATCH: 0}
+    lock = threading.Lock()
+
+    def call(priority: int, i: int):
+        started = time.monotonic()
+        try:
+            scheduler.create_message(
+                client, priority=priority, model="stub", max_tokens=16,
+                messages=[{"role": "user", "content": f"request {i}"}]
+            )
+            with lock:
+                latencies[priority].append(time.monotonic() - started)
+        except LLMUnavailable:
+            with lock:
+                failures[priority] += 1
+
+    # Batch work arrives first; interactive calls should still overtake it
+    threads = [threading.Thread(target=call, args=(BATCH, i)) for i in range(args.batch)]
+    threads += [threading.Thread(target=call, args=(INTERACTIVE, i)) for i in range(args.interactive)]
+    started = time.monotonic()
+    for thread in threads:
+        thread.start()
+        time.sleep(0.01)
+    for thread in threads:
+        thread.join()
+
+    print(f"Completed in {time.monotonic() - started:.1f}s")
+    for priority, name in ((INTERACTIVE, 'interactive'), (BATCH, 'batch')):
+        values = sorted(latencies[priority])
+        if values:
+            print(f"{name:>12}: {len(values)} ok, {failures[priority]} failed, "
+                  f"median {values[len(values) // 2]:.2f}s, max {values[-1]:.2f}s")
+    print(f"Stub: {server.state.counts}")
+    print(f"Scheduler: {scheduler.stats()}")
+    server.shutdown()
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
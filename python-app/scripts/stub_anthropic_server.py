@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+"""
+Local stub of the Anthropic Messages API that simulates rate limits.
+
+Accepts at most `rpm` requests per rolling minute (or `window` seconds, for
+tests) and answers the rest with 429 and a `retry-after` header; a fraction of requests can also fail with
+529 (overloaded). Point the app at it with
+ANTHROPIC_BASE_URL=http://127.0.0.1:8765.
+
+    python scripts/stub_anthropic_server.py --port 8765 --rpm 30
+"""
+import argparse
+import itertools
+import json
+import math
+import random
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+class StubState:
+    """Rolling request window and counters shared by the handler threads."""
+
+    def __init__(self, rpm: int, latency: float, overload_rate: float, window: float = 60.0):
+        self.rpm = rpm
+        self.window = window
+        self.latency = latency
+        self.overload_rate = overload_rate
+        self.lock = threading.Lock()
+        self.accepted = deque()
+        self.ids = itertools.count(1)
+        self.counts = {'ok': 0, 'rate_limited': 0, 'overloaded': 0}
+
+    def admit(self) -> float:
+        """Return 0 if the request is accepted, else seconds until the window has room."""
+        now = time.monotonic()
+        with self.lock:
+            while self.accepted and now - self.accepted[0] >= self.window:
+                self.accepted.popleft()
+            if len(self.accepted) >= self.rpm:
+                self.counts['rate_limited'] += 1
+                return self.window - (now - self.accepted[0])
+            self.accepted.append(now)
+            return 0.0
+
+def make_handler(state: StubState):
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get('content-length', 0)))
+            if not self.path.startswith('/v1/messages'):
+                return self._send(404, {'type': 'error', 'error': {'type': 'not_found_error', 'message': self.path}})
+
+            retry_after = state.admit()
+            if retry_after:
+                return self._send(429, {
+                    'type': 'error',
+                    'error': {'type': 'rate_limit_error', 'message': 'Stub rate limit exceeded'}
+                }, {'retry-after': str(math.ceil(retry_after))})
+
+            if random.random() < state.overload_rate:
+                with state.lock:
+                    state.counts['overloaded'] += 1
+                return self._send(529, {'type': 'error', 'error': {'type': 'overloaded_error', 'message': 'Overloaded'}})
+
+            time.sleep(state.latency)
+            request = json.loads(body or b'{}')
+            with state.lock:
+                state.counts['ok'] += 1
+            self._send(200, {
+                'id': f"msg_stub_{next(state.ids)}",
+                'type': 'message',
+                'role': 'assistant',
+                'model': request.get('model', 'stub'),
+                'content': [{'type': 'text', 'text': 'Stub reply.'}],
+                'stop_reason': 'end_turn',
+                'stop_sequence': None,
+                'usage': {'input_tokens': len(body) // 4, 'output_tokens': 5}
+            })
+
+        def _send(self, status: int, payload: dict, headers: dict = None):
+            data = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header('content-type', 'application/json')
+            self.send_header('content-length', str(len(data)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+def serve_stub(port: int = 8765, rpm: int = 30, latency: float = 0.2,
+               overload_rate: float = 0.0, window: float = 60.0) -> ThreadingHTTPServer:
+    """Start the stub server in a background thread and return it (port 0 picks a free port)."""
+    state = StubState(rpm, latency, overload_rate, window)
+    server = ThreadingHTTPServer(('127.0.0.1', port), make_handler(state))
+    server.state = state
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--rpm', type=int, default=30, help="Requests accepted per rolling minute")
+    parser.add_argument('--latency', type=float, default=0.2, help="Seconds per accepted request")
+    parser.add_argument('--overload-rate', type=float, default=0.0, help="Fraction of requests failing with 529")
+    args = parser.parse_args()
+
+    server = serve_stub(args.port, args.rpm, args.latency, args.overload_rate)
+    print(f"Stub Anthropic API on http://127.0.0.1:{args.port} ({args.rpm} requests/minute)")
+    try:
+        while True:
+            time.sleep(10)
+            print(f"Stub - {server.state.counts}")
+    except KeyboardInterrupt:
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -7,27 +7,61 @@ Claude AI agent for Tennis Analytics.
 Handles conversation flow, intent recognition, and AI orchestration.
 
 """
-import anthropic
-from typing import Dict, Any, List
+import queue
+import threading
+import time
+import uuid
+from concurrent.futures import Executor
+from typing import BinaryIO, Callable, Dict, Any, Iterator, List, Optional, Union
 from config.settings import settings
 from ..services.tennis_service import TennisAnalysisService
+from ..data.repositories import MatchRepository
+from ..data.single_flight import query_flights, tool_flights, call_key
+from ..data.connections import snowflake_db
+from ..data.query_guard import (QueryBudgetExceeded, QueryCancelled, current_scope, format_bytes,
+                                query_guard, session_scope)
+from ..data.result_cache import tool_result_cache
+from ..data.answer_store import get_player_answer_store
+from .speculation import Speculator, SpeculationRound
+from .llm_scheduler import INTERACTIVE, LLMUnavailable, get_llm_scheduler
+from .result_encoding import EncodedResult, as_tool_result, encode_table, result_encoding_metrics
+from .query_log import get_query_log
+from .warmup import warmup_scheduler
 
 class TennisAnalysisAgent:
     """AI agent for tennis analysis conversations."""
     
     def __init__(self):
-        self.client = anthropic.Anthropic(api_key=settings.ANTHROPIC_API_KEY)
+        self._client = None
+        self._client_lock = threading.Lock()
+        # One agent per UI session; its queries are budgeted and cancelled together
+        self.session_id = uuid.uuid4().hex
         self.tennis_service = TennisAnalysisService()
+        self.speculator = Speculator(
+            execute=self._speculate_function,
+            index_loader=lambda: (
+                self.tennis_service.player_repo.get_player_name_index(),
+                self.tennis_service.tournament_repo.get_tournament_name_index()
+            ),
+            tournament_resolver=self.tennis_service.tournament_repo.resolve_tournament_name,
+            # Guesses get their own budget, separate from this session's real queries
+            session_id=f"{self.session_id}:speculation",
+            cancel_scope=snowflake_db.cancel_scope_queries
+        )
         
         # System prompt defining the assistant behavior
         self.system_prompt = """
 You are a professional tennis statistics analyst. You help users analyze ATP and WTA tennis data from 2000-2024.
 
 AVAILABLE METRICS:
-- Player tournament performance (games won/lost, rankings, points)
+- Player tournament performance (matches, sets, games and tiebreaks won/lost parsed from scores, rankings, points)
 - Tournament-level statistics
 - Player career summaries by year ranges
 - Player comparison
+- Elo ratings (overall and by surface, at any past date) and match win probabilities
+- Serve and return statistics (aces, serve points won, break points) by season and surface
+- A player's record against the field by opponent, opponent ranking, surface, round, tournament level or year
+- Rivalry networks: head-to-head records among a group of players
 
 RULES:
 1. NEVER perform calculations yourself - always call the appropriate function
@@ -37,12 +71,18 @@ RULES:
 5. Only answer tennis-related queries using the available functions
 6. IMPORTANT: When a function returns complete results, use ONLY those results. Do NOT call additional functions unless specifically requested by the user.
 7. Answer the user's question completely using the function result provided. Do not gather additional data unless the user explicitly asks for it.
+8. Pass players' full names as recorded by the ATP/WTA (e.g. "Rafael Nadal", not "Nadal")
+9. Tabular function results are CSV with a header row. If rows were omitted, the closing [..] line summarizes all rows (totals, overall percentages and ranges); use it instead of guessing about the omitted rows
 
 FUNCTION CALLING:
 - If asked about player performance: call get_player_stats
 - If asked about available players: call get_available_players
 - If asked about player games comparison: call compare_players_games
-- If asked about tournament results: call get_tournament_stats (not implemented yet)
+- If asked about serving, returning, aces or break points: call get_serve_return_stats
+- If asked about player strength, ratings or who would win a match: call get_elo_rating
+- If asked about tournament results (champions, finals, upsets, seeds): call get_tournament_stats
+- If asked about a player's record against top-10 opponents, by round or level, or who they beat or lost to most: call get_player_vs_field
+- If asked about rivalries among three or more players (e.g. the Big Three): call get_rivalry_network
 
 Remember: You interpret the user's intent and call functions. The functions do all calculations.
 """
@@ -51,7 +91,7 @@ Remember: You interpret the user's intent and call functions. The functions do a
         self.tools = [
             {
                 "name": "get_player_stats",
-                "description": "Get tournament performance statistics for a specific player",
+                "description": "Get tournament performance statistics for a specific player: match, set, game and tiebreak win-loss records, ranking and points",
                 "input_schema": {
                     "type": "object",
                     "properties": {
@@ -71,7 +111,7 @@ Remember: You interpret the user's intent and call functions. The functions do a
                         "governing_body": {"type": "string", "description": "ATP or WTA or All"},
                         "year_start": {"type": "integer", "description": "Start year (optional)"},
                         "year_end": {"type": "integer", "description": "End year (optional)"},
-                        "limit": {"type": "integer", "description": "Number of players to return"}
+                        "limit": {"type": "integer", "description": "Number of players to return (default 20, max 100)"}
                     }
                 }
             },
@@ -92,13 +132,204 @@ Remember: You interpret the user's intent and call functions. The functions do a
                     "required": ["player_one_name", "player_two_name"]
                 }
             },
+            {
+                "name": "get_tournament_stats",
+                "description": "Get edition summaries for a tournament: champion, finalist, final score, upsets, seeds' progress, average match length and surface",
+                "input_schema": {
+                    "type": "object",
+                    "properties": {
+                        "tournament_name": {"type": "string", "description": "Tournament name, e.g. Wimbledon or French Open"},
+                        "year": {"type": "integer", "description": "Edition year (optional, all editions if omitted)"},
+                        "governing_body": {"type": "string", "description": "ATP or WTA or All (optional)"}
+                    },
+                    "required": ["tournament_name"]
+                }
+            },
+            {
+                "name": "get_serve_return_stats",
+                "description": "Get serve and return percentages for a player (ace %, first/second serve won %, break points saved/converted, return points won)",
+                "input_schema": {
+                    "type": "object",
+                    "properties": {
+                        "player_name": {"type": "string", "description": "Player name"},
+                        "year_start": {"type": "integer", "description": "Start year (optional)"},
+                        "year_end": {"type": "integer", "description": "End year (optional)"},
+                        "surface": {"type": "string", "description": "Hard, Clay, Grass or Carpet (optional)"},
+                        "by_year": {"type": "boolean", "description": "Break results down by season (optional)"},
+                        "by_surface": {"type": "boolean", "description": "Break results down by surface (optional)"}
+                    },
+                    "required": ["player_name"]
+                }
+            },
+            {
+                "name": "get_elo_rating",
+                "description": "Get a player's Elo rating (overall and surface-specific) at a point in time, or the win probability when a second player is given",
+                "input_schema": {
+                    "type": "object",
+                    "properties": {
+                        "player_one_name": {"type": "string", "description": "Player name"},
+                        "player_two_name": {"type": "string", "description": "Opponent name for a win probability (optional)"},
+                        "surface": {"type": "string", "description": "Hard, Clay, Grass or Carpet (optional)"},
+                        "as_of_date": {"type": "string", "description": "Date in YYYY-MM-DD format (optional, latest if omitted)"}
+                    },
+                    "required": ["player_one_name"]
+                }
+            },
+            {
+                "name": "get_player_vs_field",
+                "description": "Get a player's win-loss record against the whole field in one breakdown: per opponent, opponent ranking bucket (Top 5, 6-10, 11-20, ...), surface, round, tournament level or year",
+                "input_schema": {
+                    "type": "object",
+                    "properties": {
+                        "player_name": {"type": "string", "description": "Player name"},
+                        "group_by": {"type": "string", "enum": list(MatchRepository.FIELD_GROUPS), "description": "Breakdown (default opponent)"},
+                        "year_start": {"type": "integer", "description": "Start year (optional)"},
+                        "year_end": {"type": "integer", "description": "End year (optional)"},
+                        "surface": {"type": "string", "description": "Hard, Clay, Grass or Carpet (optional)"},
+                        "tournament_level": {"type": "string", "description": "Tournament level (optional)"},
+                        "max_opponent_rank": {"type": "integer", "description": "Only opponents ranked this or better, e.g. 10 for top-10 opponents (optional)"},
+                        "min_matches": {"type": "integer", "description": "Only groups with at least this many matches (optional)"},
+                        "sort_by": {"type": "string", "enum": list(MatchRepository.FIELD_SORTS), "description": "Sort groups by this, descending (optional)"},
+                        "limit": {"type": "integer", "description": "Number of groups to return (max 100; default 20 opponents, every group for other breakdowns)"}
+                    },
+                    "required": ["player_name"]
+                }
+            },
+            {
+                "name": "get_rivalry_network",
+                "description": "Get head-to-head records between every pair in a group of players, and each player's record against the rest of the group",
+                "input_schema": {
+                    "type": "object",
+                    "properties": {
+                        "player_names": {"type": "array", "items": {"type": "string"}, "description": f"2 to {settings.MAX_NETWORK_PLAYERS} player names"},
+                        "year_start": {"type": "integer", "description": "Start year (optional)"},
+                        "year_end": {"type": "integer", "description": "End year (optional)"},
+                        "surface": {"type": "string", "description": "Hard, Clay, Grass or Carpet (optional)"},
+                        "tournament_level": {"type": "string", "description": "Tournament level (optional)"}
+                    },
+                    "required": ["player_names"]
+                }
+            },
         ]
     
-    def process_query(self, user_message: str) -> Dict[str, Any]:
-        """Process user query using Claude with function calling."""
+    @property
+    def client(self):
+        """Anthropic client, created (and the SDK imported) on the first LLM call."""
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    import anthropic
+                    # Retries are owned by the scheduler so backoff is coordinated across sessions
+                    self._client = anthropic.Anthropic(
+                        api_key=settings.ANTHROPIC_API_KEY,
+                        base_url=settings.ANTHROPIC_BASE_URL,
+                        max_retries=0
+                    )
+        return self._client
+    
+    def process_query(self, user_message: str, priority: int = INTERACTIVE,
+                      on_event: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+        """Process user query using Claude with function calling.
+        
+        `priority` orders LLM calls in the scheduler: interactive users ahead of batch jobs.
+        `on_event` is called with a status event as each stage starts.
+        """
+        with session_scope(self.session_id):
+            return self._process_query(user_message, priority, on_event)
+    
+    def process_query_stream(self, user_message: str, priority: int = INTERACTIVE,
+                             executor: Optional[Executor] = None,
+                             heartbeat_seconds: float = 0.5) -> Iterator[Dict[str, Any]]:
+        """Process a query in the background, yielding events while it runs.
+        
+        Yields {'type': 'status', 'stage', 'message'} as stages start,
+        {'type': 'heartbeat', 'elapsed'} while waiting, and finally
+        {'type': 'result', 'response'}. Closing the generator early cancels the
+        session's running queries.
+        """
+        events: 'queue.Queue[Dict[str, Any]]' = queue.Queue()
+        
+        def run():
+            try:
+                response = self.process_query(user_message, priority, on_event=events.put)
+            except BaseException as e:
+                response = {"text": f"Error processing query: {str(e)}", "chart_data": None}
+            events.put({'type': 'result', 'response': response})
+        
+        if executor is not None:
+            executor.submit(run)
+        else:
+            threading.Thread(target=run, name="agent-stream", daemon=True).start()
+        
+        started = time.monotonic()
+        finished = False
+        try:
+            while True:
+                try:
+                    event = events.get(timeout=heartbeat_seconds)
+                except queue.Empty:
+                    event = {'type': 'heartbeat', 'elapsed': round(time.monotonic() - started, 1)}
+                finished = event['type'] == 'result'
+                yield event
+                if finished:
+                    return
+        finally:
+            if not finished:
+                cancelled = self.cancel_active_queries()
+                print(f"CA - Stream closed early, cancelled {cancelled} running queries")
+    
+    def cancel_active_queries(self) -> int:
+        """Cancel this session's in-flight work, e.g. when the user sends a new message."""
+        return snowflake_db.cancel_session_queries(self.session_id)
+    
+    def run_tool(self, function_name: str, parameters: Dict[str, Any]) -> Dict[str, Any]:
+        """Run one tool call outside a conversation, e.g. to warm caches.
+        
+        Shares in-flight calls and fills the result cache like a live call, but
+        budget and cancellation errors propagate instead of becoming text.
+        """
+        key = call_key(function_name, parameters)
+        with session_scope(self.session_id):
+            result = tool_flights.do(key, lambda: self._run_function(function_name, parameters))
+        tool_result_cache.put(key, result)
+        return result
+    
+    def list_matches(self, player_name: str, **filters) -> Dict[str, Any]:
+        """One page of a player's match listing for the UI (see TennisAnalysisService.list_player_matches)."""
+        with session_scope(self.session_id):
+            try:
+                return self.tennis_service.list_player_matches(player_name, **filters)
+            except QueryBudgetExceeded as e:
+                return {'success': False, 'message': (
+                    f"Listing would scan about {format_bytes(e.estimated_bytes)}, more than this session's "
+                    "remaining warehouse budget. Narrow the filters or retry in a minute."
+                )}
+            except QueryCancelled:
+                return {'success': False, 'message': "Listing cancelled."}
+    
+    def export_matches(self, out: BinaryIO, file_format: str, player_name: str, **filters) -> int:
+        """Stream a player's full match listing to `out`; returns the row count.
+        
+        Warehouse errors propagate, since part of the file may already be written.
+        """
+        with session_scope(self.session_id):
+            return self.tennis_service.export_player_matches(out, file_format, player_name, **filters)
+    
+    @staticmethod
+    def _notify(on_event: Optional[Callable[[Dict[str, Any]], None]], stage: str, message: str):
+        if on_event is not None:
+            on_event({'type': 'status', 'stage': stage, 'message': message})
+    
+    def _process_query(self, user_message: str, priority: int,
+                       on_event: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+        # Start likely tool calls while Claude decides which one to make
+        speculation = self.speculator.start(user_message)
         try:
+            self._notify(on_event, 'thinking', "Reading the question")
             # Create message with tools
-            message = self.client.messages.create(
+            message = get_llm_scheduler().create_message(
+                self.client,
+                priority=priority,
                 model=settings.ANTHROPIC_MODEL,
                 max_tokens=settings.ANTHROPIC_MAX_TOKENS,
                 temperature=settings.ANTHROPIC_TEMPERATURE,
@@ -120,16 +351,26 @@ Remember: You interpret the user's intent and call functions. The functions do a
             
             # Check if Claude wants to use a tool
             if message.stop_reason == "tool_use":
-                return self._handle_tool_use(message, user_message)
+                return self._handle_tool_use(message, user_message, speculation, priority, on_event)
             else:
                 # Direct response without tool use
                 text_content = self._extract_text_content(message.content)
                 return {"text": text_content, "chart_data": None}
                 
+        except QueryCancelled:
+            return {"text": "Query cancelled.", "chart_data": None}
+        except LLMUnavailable as e:
+            print(f"CA - LLM unavailable: {str(e)}")
+            return {"text": "The assistant is busy right now. Please try again in a moment.", "chart_data": None}
         except Exception as e:
             return {"text": f"Error processing query: {str(e)}", "chart_data": None}
+        finally:
+            speculation.finish()
     
-    def _handle_tool_use(self, message, user_message: str) -> Dict[str, Any]:
+    def _handle_tool_use(self, message, user_message: str,
+                         speculation: Optional[SpeculationRound] = None,
+                         priority: int = INTERACTIVE,
+                         on_event: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
         """Handle tool use requests from Claude."""
         if not message.content or len(message.content) == 0:
             return {"text": "Error: Tool use indicated but message.content is empty", "chart_data": None}
@@ -144,8 +385,15 @@ Remember: You interpret the user's intent and call functions. The functions do a
         if not tool_use:
             return {"text": "Error: Tool use indicated but no tool_use block found", "chart_data": None}
         
-        # Execute the function
-        function_result = self._execute_function(tool_use.name, tool_use.input)
+        # Use the speculated result when the prediction matched, otherwise execute
+        self._notify(on_event, 'tool', f"Running {tool_use.name}")
+        started = time.perf_counter()
+        function_result = speculation.claim(tool_use.name, tool_use.input) if speculation else None
+        if function_result is None:
+            function_result = self._execute_function(tool_use.name, tool_use.input)
+        else:
+            print(f"CA - Speculation hit for {tool_use.name}")
+        get_query_log().record(tool_use.name, tool_use.input, time.perf_counter() - started)
         print(f"CA - Function {tool_use.name} completed with results")
         
         # Check if the function returned text and chart data
@@ -155,10 +403,20 @@ Remember: You interpret the user's intent and call functions. The functions do a
         else:
             text_to_interpret = str(function_result)
             chart_df = None
+        result_encoding_metrics.record(tool_use.name, {"text": text_to_interpret, **(
+            {"encoding": function_result.get("encoding")} if isinstance(function_result, dict) else {})})
+        
+        # Don't spend a follow-up call on an answer nobody is waiting for
+        scope = current_scope()
+        if scope is not None:
+            scope.raise_if_cancelled()
         
         # Send result back to Claude for final response
+        self._notify(on_event, 'answering', "Writing the answer")
         try:
-            follow_up = self.client.messages.create(
+            follow_up = get_llm_scheduler().create_message(
+                self.client,
+                priority=priority,
                 model=settings.ANTHROPIC_MODEL,
                 max_tokens=settings.ANTHROPIC_MAX_TOKENS,
                 temperature=0.2,
@@ -171,6 +429,8 @@ Remember: You interpret the user's intent and call functions. The functions do a
                 ]
             )
             
+            usage = getattr(follow_up, 'usage', None)
+            result_encoding_metrics.record_follow_up(tool_use.name, getattr(usage, 'input_tokens', None))
             final_response = self._extract_text_content(follow_up.content)
             
             return {
@@ -178,58 +438,165 @@ Remember: You interpret the user's intent and call functions. The functions do a
                 "chart_data": chart_df
             }
             
+        except LLMUnavailable as e:
+            print(f"CA - LLM unavailable for follow-up: {str(e)}")
+            return {"text": f"The assistant is busy right now. Raw result:\n{text_to_interpret}", "chart_data": chart_df}
         except Exception as e:
             return {"text": f"Error in follow-up: {str(e)}", "chart_data": chart_df}
     
     def _execute_function(self, function_name: str, parameters: Dict[str, Any]) -> Dict[str, Any]:
-        """Execute the requested function using the tennis service."""
+        """Execute the requested function, sharing results of identical concurrent calls."""
+        key = call_key(function_name, parameters)
         try:
             print(f"CA - Executing function: {function_name}")
             print(f"CA - Parameters: {parameters}")
             
-            if function_name == "get_player_stats":
-                result = self.tennis_service.analyze_player_performance(
-                    player_name=parameters.get('player_name'),
-                    year_start=parameters.get('year_start'),
-                    year_end=parameters.get('year_end')
-                )
-                return {"text": self._format_player_stats_response(result)}
+            try:
+                result = tool_flights.do(key, lambda: self._run_function(function_name, parameters))
+            except QueryCancelled:
+                scope = current_scope()
+                if scope is None or scope.cancelled:
+                    raise
+                # The shared call belonged to a session that was cancelled; run our own
+                result = self._run_function(function_name, parameters)
             
-            elif function_name == "get_available_players":
-                result = self.tennis_service.get_available_players_list(
-                    governing_body=parameters.get('governing_body', 'All'),
-                    year_start=parameters.get('year_start'),
-                    year_end=parameters.get('year_end'),
-                    limit=parameters.get('limit')
-                )
-                return {"text": self._format_players_list_response(result)}
+            tool_result_cache.put(key, result)
+            return result
             
-            elif function_name == "compare_players_games":
-                result = self.tennis_service.analyze_head_to_head(
-                    player_one=parameters.get('player_one_name'),
-                    player_two=parameters.get('player_two_name'),
-                    year_start=parameters.get('year_start'),
-                    year_end=parameters.get('year_end'),
-                    tournament_name=parameters.get('tournament_name'),
-                    tournament_level=parameters.get('tournament_level'),
-                    surface=parameters.get('surface')
-                )
-                
-                if result['success']:
-                    return {
-                        "text": self._format_head_to_head_response(result),
-                        "chart_data": result['chart_data']
-                    }
-                else:
-                    return {"text": result['message']}
-            
-            else:
-                return {"text": f"Error: Unknown function {function_name}"}
-                
+        except QueryBudgetExceeded as e:
+            print(f"CA - Over budget for {function_name}: {str(e)}")
+            return self._over_budget_response(key, e)
+        except QueryCancelled:
+            raise
         except Exception as e:
             print(f"CA - ERROR in execute_function: {str(e)}")
             return {"text": f"Function execution error: {str(e)}"}
     
+    def _speculate_function(self, function_name: str, parameters: Dict[str, Any]) -> Dict[str, Any]:
+        """Execute a speculated call; errors raise so they are never served as hits."""
+        key = call_key(function_name, parameters)
+        result = tool_flights.do(key, lambda: self._run_function(function_name, parameters))
+        tool_result_cache.put(key, result)
+        return result
+    
+    def _over_budget_response(self, key, error: QueryBudgetExceeded) -> Dict[str, Any]:
+        """Degrade gracefully: reuse a recent answer, or ask for a narrower question."""
+        cached = tool_result_cache.get(key)
+        if cached is not None:
+            return dict(cached, text=f"(Recent cached result; the live query is over this session's warehouse budget)\n{cached['text']}")
+        return {"text": (
+            f"Query not run: it would scan about {format_bytes(error.estimated_bytes)}, more than this "
+            f"session's remaining warehouse budget ({format_bytes(error.remaining_bytes)} this minute). "
+            "Ask the user to narrow the question (a year range, tour, surface or tournament) or to retry in a minute."
+        )}
+    
+    def _run_function(self, function_name: str, parameters: Dict[str, Any]) -> Dict[str, Any]:
+        """Run the requested function using the tennis service."""
+        if function_name == "get_player_stats":
+            result = self.tennis_service.analyze_player_performance(
+                player_name=parameters.get('player_name'),
+                year_start=parameters.get('year_start'),
+                year_end=parameters.get('year_end')
+            )
+            return {"text": self._format_player_stats_response(result)}
+        
+        elif function_name == "get_available_players":
+            result = self.tennis_service.get_available_players_list(
+                governing_body=parameters.get('governing_body', 'All'),
+                year_start=parameters.get('year_start'),
+                year_end=parameters.get('year_end'),
+                limit=parameters.get('limit')
+            )
+            return as_tool_result(self._format_players_list_response(result))
+        
+        elif function_name == "compare_players_games":
+            result = self.tennis_service.analyze_head_to_head(
+                player_one=parameters.get('player_one_name'),
+                player_two=parameters.get('player_two_name'),
+                year_start=parameters.get('year_start'),
+                year_end=parameters.get('year_end'),
+                tournament_name=parameters.get('tournament_name'),
+                tournament_level=parameters.get('tournament_level'),
+                surface=parameters.get('surface')
+            )
+            
+            if result['success']:
+                return as_tool_result(self._format_head_to_head_response(result), chart_data=result['chart_data'])
+            else:
+                return {"text": result['message']}
+        
+        elif function_name == "get_tournament_stats":
+            result = self.tennis_service.analyze_tournament(
+                tournament_name=parameters.get('tournament_name'),
+                year=parameters.get('year'),
+                governing_body=parameters.get('governing_body')
+            )
+            return as_tool_result(self._format_tournament_response(result))
+        
+        elif function_name == "get_serve_return_stats":
+            result = self.tennis_service.analyze_serve_return_stats(
+                player_name=parameters.get('player_name'),
+                year_start=parameters.get('year_start'),
+                year_end=parameters.get('year_end'),
+                surface=parameters.get('surface'),
+                by_year=parameters.get('by_year', False),
+                by_surface=parameters.get('by_surface', False)
+            )
+            return as_tool_result(self._format_serve_return_response(result))
+        
+        elif function_name == "get_elo_rating":
+            result = self.tennis_service.analyze_player_rating(
+                player_one=parameters.get('player_one_name'),
+                player_two=parameters.get('player_two_name'),
+                surface=parameters.get('surface'),
+                as_of=parameters.get('as_of_date')
+            )
+            return {"text": self._format_rating_response(result)}
+        
+        elif function_name == "get_player_vs_field":
+            result = self.tennis_service.analyze_player_vs_field(
+                player_name=parameters.get('player_name'),
+                group_by=parameters.get('group_by', 'opponent'),
+                year_start=parameters.get('year_start'),
+                year_end=parameters.get('year_end'),
+                surface=parameters.get('surface'),
+                tournament_level=parameters.get('tournament_level'),
+                max_opponent_rank=parameters.get('max_opponent_rank'),
+                min_matches=parameters.get('min_matches'),
+                sort_by=parameters.get('sort_by'),
+                limit=parameters.get('limit')
+            )
+            return as_tool_result(self._format_player_vs_field_response(result))
+        
+        elif function_name == "get_rivalry_network":
+            result = self.tennis_service.analyze_rivalry_network(
+                players=parameters.get('player_names') or [],
+                year_start=parameters.get('year_start'),
+                year_end=parameters.get('year_end'),
+                surface=parameters.get('surface'),
+                tournament_level=parameters.get('tournament_level')
+            )
+            return as_tool_result(self._format_rivalry_network_response(result))
+        
+        else:
+            return {"text": f"Error: Unknown function {function_name}"}
+    
+    @staticmethod
+    def get_metrics() -> Dict[str, Any]:
+        """Process-wide performance counters for monitoring."""
+        return {
+            'query_coalescing': query_flights.stats(),
+            'tool_coalescing': tool_flights.stats(),
+            'speculation': Speculator.stats(),
+            'result_reuse': snowflake_db.result_reuse_stats(settings.RESULT_REUSE_REFRESH_SECONDS),
+            'query_guard': query_guard.stats(),
+            'tool_result_cache': tool_result_cache.stats(),
+            'answer_store': get_player_answer_store().stats(),
+            'result_encoding': result_encoding_metrics.stats(),
+            'llm_scheduler': get_llm_scheduler().stats(),
+            'warmup': warmup_scheduler.stats()
+        }
+    
     def _format_player_stats_response(self, result: Dict[str, Any]) -> str:
         """Format player statistics response."""
         if not result['success']:
@@ -242,49 +609,153 @@ Remember: You interpret the user's intent and call functions. The functions do a
         return f"""Player: {result['player_name']} ({result['governing_body']})
 Filters: {result['period']}
 Total Tournaments: {stats['total_tournaments']}
-Games Won: {stats['games_won']}
-Games Lost: {stats['games_lost']}
-Games Win %: {stats['win_percentage']}%
+Matches: {stats['matches_won']}-{stats['matches_lost']} ({stats['match_win_percentage']}% won, walkovers excluded)
+Sets: {stats['sets_won']}-{stats['sets_lost']} ({stats['set_win_percentage']}% won)
+Games: {stats['games_won']}-{stats['games_lost']} ({stats['game_win_percentage']}% won)
+Tiebreaks: {stats['tiebreaks_won']}-{stats['tiebreaks_lost']} ({stats['tiebreak_win_percentage']}% won)
 Average Ranking: {stats['average_ranking'] if stats['average_ranking'] else 'N/A'}
 Total Points: {stats['total_points']}"""
     
-    def _format_players_list_response(self, result: Dict[str, Any]) -> str:
+    def _format_players_list_response(self, result: Dict[str, Any]) -> Union[str, EncodedResult]:
         """Format available players list response."""
         if not result['success']:
             return result['message']
         
-        header = f"Top {result['limit']} {result['governing_body']} players:"
-        return header + "\n" + "\n".join(result['players'])
+        players = result['players']
+        return encode_table(
+            f"Top {result['limit']} {result['governing_body']} players ({result['period']}), by tournaments:",
+            ['player', 'tournaments', 'matches'],
+            zip(
+                players.column('PLAYER').to_pylist(),
+                players.column('TOURNAMENT_COUNT').to_pylist(),
+                players.column('TOTAL_MATCHES').to_pylist()
+            ),
+            totals=['tournaments', 'matches']
+        )
     
-    def _format_head_to_head_response(self, result: Dict[str, Any]) -> str:
+    def _format_head_to_head_response(self, result: Dict[str, Any]) -> Union[str, EncodedResult]:
         """Format head-to-head analysis response."""
         player_one = result['player_one']
         player_two = result['player_two']
-        overall = result['overall_record']
-        grand_slam = result['grand_slam_record']
-        surface = result['surface_breakdown']
+        rows = [
+            ('Overall', result['overall_record'][player_one], result['overall_record'][player_two]),
+            ('Grand Slam', result['grand_slam_record'][player_one], result['grand_slam_record'][player_two])
+        ]
+        rows += [(surface, wins[player_one], wins[player_two]) for surface, wins in result['surface_breakdown'].items()]
         
-        response = f"""Head-to-Head: {player_one} vs {player_two}
-{result['period']}
-
-Overall Record:
-Total Matches: {result['total_matches']}
-{player_one}: {overall[player_one]} wins
-{player_two}: {overall[player_two]} wins
-
-Grand Slam Record:
-{player_one}: {grand_slam[player_one]} wins
-{player_two}: {grand_slam[player_two]} wins
-
-Surface Breakdown:"""
+        return encode_table(
+            f"Head-to-Head wins: {player_one} vs {player_two} ({result['period']}), {result['total_matches']} matches",
+            ['scope', player_one, player_two],
+            rows
+        )
+    
+    def _format_tournament_response(self, result: Dict[str, Any]) -> Union[str, EncodedResult]:
+        """Format tournament edition summaries response."""
+        if not result['success']:
+            response = result['message']
+            if result.get('similar_tournaments'):
+                response += f"\n\nSimilar tournaments found: {', '.join(result['similar_tournaments'])}"
+            return response
+        
+        columns = [
+            'year', 'governing_body', 'surface', 'level', 'draw_size', 'champion', 'champion_seed',
+            'finalist', 'finalist_seed', 'final_score', 'total_matches', 'upsets', 'upset_percentage',
+            'average_match_minutes', 'seeds_entered', 'seeds_reached_qf', 'seeds_reached_sf',
+            'top_seed', 'top_seed_best_round'
+        ]
+        return encode_table(
+            f"Tournament: {result['tournament_name']} ({result['period']})",
+            columns,
+            [[edition[column] for column in columns] for edition in result['editions']],
+            totals=['total_matches', 'upsets', 'seeds_entered', 'seeds_reached_qf', 'seeds_reached_sf'],
+            ratios={'upset_percentage': ('upsets', 'total_matches')}
+        )
+    
+    def _format_serve_return_response(self, result: Dict[str, Any]) -> Union[str, EncodedResult]:
+        """Format serve/return statistics response."""
+        if not result['success']:
+            response = result['message']
+            if result.get('similar_players'):
+                response += f"\n\nSimilar players found: {', '.join(result['similar_players'])}"
+            return response
+        
+        # Columns as the repository names them: groupings first, then counts and percentages
+        breakdown = result['breakdown']
+        columns = list(breakdown[0])
+        return encode_table(
+            f"Serve/Return Statistics: {result['player_name']} ({result['period']}, {result['surface']})",
+            columns,
+            [[row[column] for column in columns] for row in breakdown],
+            totals=['matches', 'matches_won', 'aces', 'double_faults']
+        )
+    
+    def _format_rating_response(self, result: Dict[str, Any]) -> str:
+        """Format Elo rating and win probability response."""
+        if not result['success']:
+            response = result['message']
+            if result.get('similar_players'):
+                response += f"\n\nSimilar players found: {', '.join(result['similar_players'])}"
+            return response
+        
+        lines = []
+        for key in ('player_one', 'player_two'):
+            rating = result.get(key)
+            if not rating:
+                continue
+            line = f"{rating['player_name']}: Elo {rating['rating']} ({rating['matches']} matches, as of {rating['as_of']})"
+            if rating['surface']:
+                line += f", {rating['surface']} Elo {rating['surface_rating']}"
+            lines.append(line)
+        
+        if 'player_one_win_probability' in result:
+            lines.append("")
+            lines.append(f"Win Probability: {result['player_one']['player_name']} {result['player_one_win_probability']}%, "
+                         f"{result['player_two']['player_name']} {result['player_two_win_probability']}%")
+        
+        return "\n".join(lines)
+    
+    def _format_player_vs_field_response(self, result: Dict[str, Any]) -> Union[str, EncodedResult]:
+        """Format player vs field breakdown response."""
+        if not result['success']:
+            response = result['message']
+            if result.get('similar_players'):
+                response += f"\n\nSimilar players found: {', '.join(result['similar_players'])}"
+            return response
         
-        for surf, wins in surface.items():
-            response += f"""
-{surf} Court:
-  {player_one}: {wins[player_one]} wins
-  {player_two}: {wins[player_two]} wins"""
+        groups = result['groups']
+        shown = "" if groups.num_rows == result['group_count'] else f", top {groups.num_rows} of {result['group_count']} shown"
+        return encode_table(
+            f"{result['player_name']} vs the field by {result['group_by']} ({result['period']}; filters: {result['filters']}): "
+            f"{result['total_wins']}-{result['total_losses']} overall ({result['total_win_percentage']}% won){shown}",
+            [result['group_by'], 'matches', 'wins', 'losses', 'win_pct', 'first_match', 'last_match'],
+            zip(*(groups.column(column).to_pylist() for column in
+                  ('GROUP_VALUE', 'MATCHES', 'WINS', 'LOSSES', 'WIN_PCT', 'FIRST_MATCH', 'LAST_MATCH'))),
+            totals=['matches', 'wins', 'losses'],
+            ratios={'win_pct': ('wins', 'matches')}
+        )
+    
+    def _format_rivalry_network_response(self, result: Dict[str, Any]) -> Union[str, EncodedResult]:
+        """Format rivalry network response: the pairs, then each player's record within the group."""
+        if not result['success']:
+            return result['message']
         
-        return response
+        rows = [
+            ('rivalry', rivalry['player_one'], rivalry['player_two'], rivalry['matches'],
+             rivalry['player_one_wins'], rivalry['player_two_wins'], '', rivalry['last_match'])
+            for rivalry in sorted(result['rivalries'], key=lambda rivalry: -rivalry['matches'])
+        ]
+        rows += [
+            ('group_record', row['player'], '', row['matches'], row['wins'], row['losses'], row['win_percentage'], '')
+            for row in result['standings']
+        ]
+        title = f"Rivalry network: {', '.join(result['players'])} ({result['period']}, {result['surface']})"
+        if result['no_matches']:
+            title += f"; no matches within the group for {', '.join(result['no_matches'])}"
+        return encode_table(
+            title,
+            ['row', 'player_one', 'player_two', 'matches', 'player_one_wins', 'player_two_wins', 'win_pct', 'last_match'],
+            rows
+        )
     
     def _extract_text_content(self, content_blocks) -> str:
         """Extract text content from Claude's response blocks."""
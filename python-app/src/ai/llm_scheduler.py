@@ -0,0 +1,237 @@
+# -*- coding: utf-8 -*-
+"""
+Admission control for Anthropic API calls.
+
+Every `messages.create` call in the process goes through one scheduler that
+enforces token-bucket limits on requests and tokens per minute and a bound
+on concurrent calls. Waiting calls are admitted in priority order
+(interactive before batch), and rate-limited or overloaded responses are
+retried with jittered exponential backoff that honors `retry-after`.
+"""
+from __future__ import annotations
+
+import heapq
+import itertools
+import json
+import random
+import threading
+import time
+from collections import deque
+from typing import TYPE_CHECKING, Any, Deque, Dict, List, Optional
+
+from config.settings import settings
+
+if TYPE_CHECKING:
+    import anthropic
+
+INTERACTIVE = 0
+BATCH = 1
+PRIORITY_NAMES = {INTERACTIVE: 'interactive', BATCH: 'batch'}
+
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504, 529}
+
+class LLMUnavailable(Exception):
+    """The call could not be admitted or kept failing after retries."""
+
+class TokenBucket:
+    """Token bucket refilled continuously at `per_minute` up to `per_minute` capacity."""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Seconds until `amount` is available (0 if it is now)."""
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        if self._tokens >= amount:
+            return 0.0
+        return (amount - self._tokens) / self.rate
+
+    def take(self, amount: float, now: float):
+        self._refill(now)
+        self._tokens -= min(amount, self.capacity)
+
+    def give_back(self, amount: float, now: float):
+        self._refill(now)
+        self._tokens = min(self.capacity, self._tokens + amount)
+
+class _Ticket:
+    """A call waiting for admission."""
+
+    def __init__(self, priority: int, sequence: int, tokens: int):
+        self.priority = priority
+        self.sequence = sequence
+        self.tokens = tokens
+        self.enqueued = time.monotonic()
+
+    def __lt__(self, other: '_Ticket') -> bool:
+        return (self.priority, self.sequence) < (other.priority, other.sequence)
+
+class LLMScheduler:
+    """Process-wide rate-aware scheduler for LLM calls."""
+
+    def __init__(self, requests_per_minute: float, tokens_per_minute: float, max_concurrency: int,
+                 max_retries: int, backoff_base: float, backoff_max: float, queue_timeout: float):
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.queue_timeout = queue_timeout
+
+        self._requests = TokenBucket(requests_per_minute)
+        self._tokens = TokenBucket(tokens_per_minute)
+        self._cond = threading.Condition()
+        self._queue: List[_Ticket] = []
+        self._sequence = itertools.count()
+        self._active = 0
+        self._paused_until = 0.0
+
+        self._counts = {'requests': 0, 'retries': 0, 'rate_limited': 0, 'failed': 0, 'rejected': 0}
+        self._max_queue_depth = 0
+        self._waits: Dict[int, Deque[float]] = {p: deque(maxlen=500) for p in PRIORITY_NAMES}
+
+    @staticmethod
+    def estimate_tokens(request: Dict[str, Any]) -> int:
+        """Rough token cost of a request: ~4 characters per input token plus max output."""
+        payload = json.dumps(
+            [request.get('system'), request.get('messages'), request.get('tools')], default=str
+        )
+        return len(payload) // 4 + int(request.get('max_tokens', 0))
+
+    def create_message(self, client: anthropic.Anthropic, priority: int = INTERACTIVE, **request):
+        """Call `client.messages.create(**request)` under admission control, with retries."""
+        estimated = self.estimate_tokens(request)
+        attempt = 0
+        while True:
+            self._admit(priority, estimated)
+            try:
+                response = client.messages.create(**request)
+            except Exception as e:
+                self._release(estimated, used=None)
+                status = getattr(e, 'status_code', None)
+                # Already imported by the client that raised
+                import anthropic
+                retryable = status in RETRYABLE_STATUS or isinstance(e, anthropic.APIConnectionError)
+                if not retryable or attempt >= self.max_retries:
+                    with self._cond:
+                        self._counts['failed'] += 1
+                    raise LLMUnavailable(f"LLM call failed after {attempt + 1} attempts: {str(e)}") from e
+
+                delay = self._backoff(attempt, e)
+                with self._cond:
+                    self._counts['retries'] += 1
+                    if status == 429:
+                        # Hold every caller, not just this one, until the server's window reopens
+                        self._counts['rate_limited'] += 1
+                        self._paused_until = max(self._paused_until, time.monotonic() + delay)
+                print(f"LS - Retrying after {delay:.1f}s (status {status}, attempt {attempt + 1})")
+                time.sleep(delay)
+                attempt += 1
+                continue
+
+            usage = getattr(response, 'usage', None)
+            used = None
+            if usage is not None:
+                used = (getattr(usage, 'input_tokens', 0) or 0) + (getattr(usage, 'output_tokens', 0) or 0)
+            self._release(estimated, used)
+            return response
+
+    def _backoff(self, attempt: int, error: Exception) -> float:
+        """Full-jitter exponential backoff, never shorter than the server's retry-after."""
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+        response = getattr(error, 'response', None)
+        retry_after = response.headers.get('retry-after') if response is not None else None
+        if retry_after:
+            try:
+                delay = max(delay, float(retry_after) + random.uniform(0, self.backoff_base))
+            except ValueError:
+                pass
+        return delay
+
+    def _admit(self, priority: int, tokens: int):
+        """Block until this call is first in line and fits the concurrency and rate limits."""
+        with self._cond:
+            ticket = _Ticket(priority, next(self._sequence), tokens)
+            heapq.heappush(self._queue, ticket)
+            self._max_queue_depth = max(self._max_queue_depth, len(self._queue))
+            deadline = ticket.enqueued + self.queue_timeout
+
+            while True:
+                now = time.monotonic()
+                if now >= deadline:
+                    self._queue.remove(ticket)
+                    heapq.heapify(self._queue)
+                    self._counts['rejected'] += 1
+                    self._cond.notify_all()
+                    raise LLMUnavailable(f"LLM call waited more than {self.queue_timeout:.0f}s for admission")
+
+                wait = deadline - now
+                if self._queue[0] is ticket and self._active < self.max_concurrency:
+                    wait = max(self._paused_until - now,
+                               self._requests.wait_time(1, now),
+                               self._tokens.wait_time(tokens, now))
+                    if wait <= 0:
+                        heapq.heappop(self._queue)
+                        self._requests.take(1, now)
+                        self._tokens.take(tokens, now)
+                        self._active += 1
+                        self._counts['requests'] += 1
+                        self._waits[priority].append(now - ticket.enqueued)
+                        # The next in line may be admissible too
+                        self._cond.notify_all()
+                        return
+                self._cond.wait(timeout=min(wait, deadline - now))
+
+    def _release(self, estimated: int, used: Optional[int]):
+        """Free the concurrency slot and return over-estimated tokens to the bucket."""
+        with self._cond:
+            self._active -= 1
+            if used is not None and used < estimated:
+                self._tokens.give_back(estimated - used, time.monotonic())
+            self._cond.notify_all()
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth, admission wait times per priority and retry counters."""
+        with self._cond:
+            waits = {}
+            for priority, samples in self._waits.items():
+                ordered = sorted(samples)
+                waits[PRIORITY_NAMES[priority]] = {
+                    'samples': len(ordered),
+                    'avg_wait_seconds': round(sum(ordered) / len(ordered), 3) if ordered else 0.0,
+                    'p95_wait_seconds': round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 3) if ordered else 0.0
+                }
+            return dict(
+                self._counts,
+                queue_depth=len(self._queue),
+                max_queue_depth=self._max_queue_depth,
+                in_flight=self._active,
+                waits=waits
+            )
+
+_llm_scheduler: Optional[LLMScheduler] = None
+_llm_scheduler_lock = threading.Lock()
+
+def get_llm_scheduler() -> LLMScheduler:
+    """Process-wide scheduler shared by every session, created on the first LLM call."""
+    global _llm_scheduler
+    if _llm_scheduler is None:
+        with _llm_scheduler_lock:
+            if _llm_scheduler is None:
+                _llm_scheduler = LLMScheduler(
+                    requests_per_minute=settings.LLM_REQUESTS_PER_MINUTE,
+                    tokens_per_minute=settings.LLM_TOKENS_PER_MINUTE,
+                    max_concurrency=settings.LLM_MAX_CONCURRENCY,
+                    max_retries=settings.LLM_MAX_RETRIES,
+                    backoff_base=settings.LLM_BACKOFF_BASE_SECONDS,
+                    backoff_max=settings.LLM_BACKOFF_MAX_SECONDS,
+                    queue_timeout=settings.LLM_QUEUE_TIMEOUT_SECONDS
+                )
+    return _llm_scheduler
\ No newline at end of file
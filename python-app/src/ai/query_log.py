@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+"""
+Tool call log for Tennis Analytics.
+
+Each tool call Claude makes is appended as one JSON line (time, tool,
+arguments, duration). The warm-up scheduler reads it back to find the most
+asked questions. Speculative and warm-up calls are not logged, so the log
+reflects what users asked.
+"""
+import json
+import os
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+from config.settings import settings
+
+class QueryLog:
+    """Append-only JSONL log of tool calls, rotated to `<path>.1` past a size limit."""
+
+    def __init__(self, path: str, max_bytes: int):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    def record(self, function_name: str, parameters: Optional[Dict[str, Any]], seconds: float):
+        """Append one call; logging failures never affect the answer."""
+        line = json.dumps({
+            'ts': round(time.time(), 3),
+            'tool': function_name,
+            'args': {name: value for name, value in (parameters or {}).items() if value is not None},
+            'seconds': round(seconds, 3)
+        }, sort_keys=True, default=str)
+        try:
+            with self._lock:
+                directory = os.path.dirname(self.path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                if os.path.exists(self.path) and os.path.getsize(self.path) > self.max_bytes:
+                    os.replace(self.path, f"{self.path}.1")
+                with open(self.path, "a", encoding="utf-8") as log_file:
+                    log_file.write(line + "\n")
+        except OSError as e:
+            print(f"QL - Error writing query log: {str(e)}")
+
+    def top_calls(self, limit: int, since_seconds: Optional[float] = None) -> Tuple[List[Tuple[str, Dict[str, Any], int]], int]:
+        """The most frequent (tool, arguments) calls, most asked first, and the total call count.
+
+        Only calls newer than `since_seconds` ago are counted; unreadable lines are skipped.
+        """
+        cutoff = time.time() - since_seconds if since_seconds else 0
+        counts: Counter = Counter()
+        for path in (f"{self.path}.1", self.path):
+            if not os.path.exists(path):
+                continue
+            with open(path, "r", encoding="utf-8") as log_file:
+                for line in log_file:
+                    try:
+                        entry = json.loads(line)
+                        if entry['ts'] < cutoff:
+                            continue
+                        counts[(entry['tool'], json.dumps(entry['args'], sort_keys=True))] += 1
+                    except (ValueError, KeyError, TypeError):
+                        continue
+
+        calls = [(tool, json.loads(args), count) for (tool, args), count in counts.most_common(limit)]
+        return calls, sum(counts.values())
+
+_query_log: Optional[QueryLog] = None
+_query_log_lock = threading.Lock()
+
+def get_query_log() -> QueryLog:
+    """Log shared by every session in the process, created on the first tool call."""
+    global _query_log
+    if _query_log is None:
+        with _query_log_lock:
+            if _query_log is None:
+                _query_log = QueryLog(settings.QUERY_LOG_PATH, settings.QUERY_LOG_MAX_BYTES)
+    return _query_log
\ No newline at end of file
@@ -0,0 +1,197 @@
+# -*- coding: utf-8 -*-
+"""
+Compact encoding of tool results for the follow-up LLM call.
+
+Tabular results are sent as CSV with the header once instead of labelled
+prose per row. Past a token budget the table keeps its leading rows (results
+arrive ranked) and ends with a summary line over every row, so the model
+still sees the whole result's shape: totals of the columns the caller
+declares additive, percentages recomputed from those totals, and the range
+of every other numeric column (years, seeds, ranks). Per-tool result sizes
+and the follow-up call's reported input tokens are recorded, so encodings can
+be compared by what the API actually counted.
+"""
+import csv
+import io
+import numbers
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, Mapping, Optional, Sequence, Tuple, Union
+
+from config.settings import settings
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count: about 4 characters per token, as in the LLM scheduler."""
+    return (len(text) + 3) // 4
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, numbers.Number) and not isinstance(value, bool)
+
+def _cell(value: Any) -> Any:
+    if value is None:
+        return ""
+    if _is_number(value) and not isinstance(value, int):
+        # Floats and warehouse decimals
+        value = float(value)
+        return int(value) if value.is_integer() else round(value, 2)
+    return value
+
+def _csv(columns: Sequence[str], rows: Sequence[Sequence[Any]]) -> str:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerow(columns)
+    writer.writerows([_cell(value) for value in row] for row in rows)
+    return buffer.getvalue().rstrip("\n")
+
+def _records(columns: Sequence[str], rows: Sequence[Sequence[Any]]) -> str:
+    """Labelled 'column: value' lines, one block per row."""
+    return "\n\n".join(
+        "\n".join(f"{column}: {_cell(value)}" for column, value in zip(columns, row)) for row in rows
+    )
+
+def _summary(columns: Sequence[str], rows: Sequence[Sequence[Any]], shown: int,
+             totals: Sequence[str], ratios: Mapping[str, Tuple[str, str]]) -> str:
+    """Summary over all rows, plus the range of the omitted rows, for each numeric column.
+
+    `totals` columns are summed, `ratios` columns are recomputed as a percentage
+    of two summed columns, and any other numeric column gets its min-max range.
+    """
+    def numbers(i: int, subset: Sequence[Sequence[Any]]):
+        return [float(row[i]) for row in subset if _is_number(row[i])]
+
+    index = {column: i for i, column in enumerate(columns)}
+    sums = {column: sum(numbers(index[column], rows)) for column in totals if column in index}
+    parts = []
+    for i, column in enumerate(columns):
+        values = numbers(i, rows)
+        if len(values) < len(rows) / 2:
+            continue
+        if column in sums:
+            part = f"{column} total {_cell(sums[column])}"
+        elif column in ratios:
+            numerator, denominator = ratios[column]
+            if not sums.get(denominator) or numerator not in sums:
+                continue
+            part = f"{column} overall {_cell(round(sums[numerator] / sums[denominator] * 100, 1))}"
+        else:
+            part = f"{column} range {_cell(min(values))} to {_cell(max(values))}"
+        omitted = numbers(i, rows[shown:])
+        if omitted:
+            part += f" (omitted range {_cell(min(omitted))} to {_cell(max(omitted))})"
+        parts.append(part)
+    summary = f"[{len(rows) - shown} of {len(rows)} rows omitted"
+    return summary + ("; all rows: " + "; ".join(parts) if parts else "") + "]"
+
+@dataclass(frozen=True)
+class EncodedResult:
+    """A tool result as sent to the model, with its size accounting."""
+    text: str
+    encoding: str
+    rows: int
+    rows_sent: int
+    tokens: int
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            'encoding': self.encoding,
+            'rows': self.rows,
+            'rows_sent': self.rows_sent,
+            'tokens': self.tokens
+        }
+
+def encode_table(title: str, columns: Sequence[str], rows: Sequence[Sequence[Any]],
+                 budget_tokens: Optional[int] = None, totals: Sequence[str] = (),
+                 ratios: Optional[Mapping[str, Tuple[str, str]]] = None) -> EncodedResult:
+    """Encode a ranked table as CSV, truncated with a summary if it exceeds the budget.
+
+    A single row is sent as labelled lines when that costs little more than
+    CSV, since the model reads it more reliably. `totals` names the additive
+    columns and `ratios` maps percentage columns to their (numerator,
+    denominator) total columns, for the truncation summary.
+    """
+    ratios = ratios or {}
+    budget = budget_tokens or settings.TOOL_RESULT_TOKEN_BUDGET
+    rows = [tuple(row) for row in rows]
+
+    if not rows:
+        text = f"{title}\n(no rows)"
+        return EncodedResult(text, 'empty', 0, 0, estimate_tokens(text))
+
+    text = f"{title}\n{_csv(columns, rows)}"
+    encoding = 'csv'
+    if len(rows) == 1:
+        records = f"{title}\n{_records(columns, rows)}"
+        if estimate_tokens(records) <= estimate_tokens(text) * 1.5:
+            text, encoding = records, 'records'
+
+    shown = len(rows)
+    if estimate_tokens(text) > budget and len(rows) > 1:
+        # Largest prefix of rows that fits with the summary line
+        low, high = 1, len(rows) - 1
+        while low < high:
+            middle = (low + high + 1) // 2
+            candidate = f"{title}\n{_csv(columns, rows[:middle])}\n{_summary(columns, rows, middle, totals, ratios)}"
+            if estimate_tokens(candidate) <= budget:
+                low = middle
+            else:
+                high = middle - 1
+        shown = low
+        text = f"{title}\n{_csv(columns, rows[:shown])}\n{_summary(columns, rows, shown, totals, ratios)}"
+        encoding = 'csv_truncated'
+
+    return EncodedResult(text, encoding, len(rows), shown, estimate_tokens(text))
+
+def as_tool_result(formatted: Union[str, EncodedResult], **extra) -> Dict[str, Any]:
+    """Wrap a formatter's output as a tool result, keeping the encoding stats."""
+    if isinstance(formatted, EncodedResult):
+        return dict(extra, text=formatted.text, encoding=formatted.summary())
+    return dict(extra, text=formatted)
+
+class ResultEncodingMetrics:
+    """Per-tool token counts for tool results and the follow-up calls that read them."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tools: Dict[str, Dict[str, int]] = {}
+
+    def _entry(self, tool: str) -> Dict[str, int]:
+        return self._tools.setdefault(tool, {
+            'calls': 0, 'tokens': 0, 'truncated': 0,
+            'follow_ups': 0, 'follow_up_input_tokens': 0
+        })
+
+    def record(self, tool: str, result: Dict[str, Any]):
+        """Count the tokens of one tool result sent to the model."""
+        encoding = result.get('encoding') or {}
+        tokens = encoding.get('tokens', estimate_tokens(result.get('text', '')))
+        with self._lock:
+            entry = self._entry(tool)
+            entry['calls'] += 1
+            entry['tokens'] += tokens
+            entry['truncated'] += encoding.get('encoding') == 'csv_truncated'
+
+    def record_follow_up(self, tool: str, input_tokens: Optional[int]):
+        """Count the input tokens the API reported for the follow-up call."""
+        if input_tokens is None:
+            return
+        with self._lock:
+            entry = self._entry(tool)
+            entry['follow_ups'] += 1
+            entry['follow_up_input_tokens'] += input_tokens
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            stats = {}
+            for tool, entry in self._tools.items():
+                calls = entry['calls'] or 1
+                stats[tool] = {
+                    'calls': entry['calls'],
+                    'truncated': entry['truncated'],
+                    'avg_result_tokens': round(entry['tokens'] / calls, 1),
+                    'avg_follow_up_input_tokens': round(entry['follow_up_input_tokens'] / entry['follow_ups'], 1)
+                    if entry['follow_ups'] else None
+                }
+            return stats
+
+# Process-wide; reported by the agent's metrics
+result_encoding_metrics = ResultEncodingMetrics()
\ No newline at end of file
@@ -0,0 +1,334 @@
+# -*- coding: utf-8 -*-
+"""
+Speculative prefetch for Tennis Analytics.
+
+While Claude's first `messages.create` call is in flight, a fast local
+entity extractor guesses the tool call it is likely to make and starts it
+in the background. When the real tool call arrives with matching
+arguments its result is already warm; unused guesses are cancelled along
+with any warehouse queries they started.
+"""
+import re
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Dict, Hashable, List, Optional, Set, Tuple
+
+from config.settings import settings
+from ..data.name_index import NameIndex
+from ..data.query_guard import QueryCancelled, QueryScope, session_scope
+from ..data.single_flight import call_key
+
+SURFACE_WORDS = {'hard': 'Hard', 'clay': 'Clay', 'grass': 'Grass', 'carpet': 'Carpet'}
+SERVE_WORDS = {'serve', 'serving', 'ace', 'aces', 'return', 'returning', 'break', 'double'}
+RATING_WORDS = {'elo', 'rating', 'ratings', 'probability', 'chance', 'chances', 'favorite', 'favourite'}
+YEAR_PATTERN = re.compile(r"\b(19[6-9]\d|20\d{2})\b")
+
+class EntityExtractor:
+    """Extracts players, tournaments, years and surfaces from a user message."""
+
+    def __init__(self, player_index: NameIndex, tournament_index: NameIndex):
+        self.player_index = player_index
+        self.tournament_index = tournament_index
+
+        # Surname lookup: the most active player with a given last name wins
+        self._surnames: Dict[str, str] = {}
+        for name in player_index.names():
+            tokens = NameIndex.normalize(name).split()
+            if tokens and len(tokens[-1]) >= 4:
+                self._surnames.setdefault(tokens[-1], name)
+
+    def extract(self, message: str) -> Dict[str, Any]:
+        """Return the entities mentioned in the message, in order of appearance."""
+        tokens = NameIndex.normalize(message).split()
+        players: List[str] = []
+        tournament: Optional[str] = None
+
+        i = 0
+        while i < len(tokens):
+            matched = 0
+            # Longest n-gram first: full names and multi-word tournaments
+            for n in (3, 2, 1):
+                if i + n > len(tokens):
+                    continue
+                phrase = " ".join(tokens[i:i + n])
+                if tournament is None:
+                    tournament_match = self.tournament_index.match_exact(phrase)
+                    if tournament_match:
+                        tournament = tournament_match
+                        matched = n
+                        break
+                player = self.player_index.match_exact(phrase) if n > 1 else self._surnames.get(phrase)
+                if player:
+                    if player not in players:
+                        players.append(player)
+                    matched = n
+                    break
+            i += matched or 1
+
+        years = sorted(int(year) for year in YEAR_PATTERN.findall(message))
+        surface = next((SURFACE_WORDS[t] for t in tokens if t in SURFACE_WORDS), None)
+
+        return {
+            'players': players,
+            'tournament': tournament,
+            'year_start': years[0] if years else None,
+            'year_end': years[-1] if years else None,
+            'surface': surface,
+            'tokens': set(tokens)
+        }
+
+    def predict_calls(self, message: str) -> List[Tuple[str, Dict[str, Any]]]:
+        """Predict the most likely tool calls for a message."""
+        entities = self.extract(message)
+        players = entities['players']
+        tokens = entities['tokens']
+        year_start, year_end = entities['year_start'], entities['year_end']
+
+        if len(players) >= 2:
+            if tokens & RATING_WORDS:
+                return [("get_elo_rating", {
+                    'player_one_name': players[0],
+                    'player_two_name': players[1],
+                    'surface': entities['surface']
+                })]
+            return [("compare_players_games", {
+                'player_one_name': players[0],
+                'player_two_name': players[1],
+                'year_start': year_start,
+                'year_end': year_end,
+                'tournament_name': entities['tournament'],
+                'surface': entities['surface']
+            })]
+
+        if len(players) == 1:
+            if tokens & SERVE_WORDS:
+                return [("get_serve_return_stats", {
+                    'player_name': players[0],
+                    'year_start': year_start,
+                    'year_end': year_end,
+                    'surface': entities['surface']
+                })]
+            if tokens & RATING_WORDS:
+                return [("get_elo_rating", {
+                    'player_one_name': players[0],
+                    'surface': entities['surface']
+                })]
+            return [("get_player_stats", {
+                'player_name': players[0],
+                'year_start': year_start,
+                'year_end': year_end
+            })]
+
+        if entities['tournament']:
+            return [("get_tournament_stats", {
+                'tournament_name': entities['tournament'],
+                'year': year_start if year_start == year_end else None
+            })]
+
+        return []
+
+class SpeculationRound:
+    """Speculative calls started for one user message."""
+
+    def __init__(self, speculator: 'Speculator'):
+        self._speculator = speculator
+        self._planned: Future = Future()
+        self._lock = threading.Lock()
+        self._finished = False
+        self._calls: Dict[Hashable, Tuple[Future, float]] = {}
+        self._running: Set[QueryScope] = set()
+
+    def _submit(self, key: Hashable, task: Callable[[], Tuple[Dict[str, Any], float]]) -> bool:
+        """Start a speculated call unless the round already finished (planning ran late)."""
+        with self._lock:
+            if self._finished:
+                return False
+            self._calls[key] = (_executor.submit(task), time.perf_counter())
+            return True
+
+    def _enter(self, scope: QueryScope) -> bool:
+        """Track a speculated call's queries so finish() can cancel them; False once finished."""
+        with self._lock:
+            if self._finished:
+                return False
+            self._running.add(scope)
+            return True
+
+    def _exit(self, scope: QueryScope):
+        with self._lock:
+            self._running.discard(scope)
+
+    def claim(self, function_name: str, parameters: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Return the speculated result for this tool call, or None on a miss."""
+        try:
+            # Planning is local and fast; don't let it stall the real call
+            self._planned.result(timeout=0.5)
+        except Exception:
+            return None
+
+        key = self._speculator.normalize_call(function_name, parameters)
+        with self._lock:
+            entry = self._calls.pop(key, None)
+        if entry is None:
+            self._speculator.record(hit=False)
+            return None
+
+        future, started = entry
+        if future.cancel():
+            # Still queued behind other sessions' speculation: running it inline is faster
+            self._speculator.record(hit=False)
+            self._speculator.record_cancelled()
+            return None
+
+        claimed_at = time.perf_counter()
+        try:
+            # Failed and over-budget calls raise, so only real answers are hits
+            result, finished = future.result()
+        except Exception:
+            self._speculator.record(hit=False)
+            return None
+
+        # Latency saved is the part of the call that overlapped with the LLM call
+        self._speculator.record(hit=True, saved_seconds=max(0.0, min(claimed_at, finished) - started))
+        return result
+
+    def finish(self):
+        """Cancel speculated calls that were not claimed, including their running queries."""
+        try:
+            self._planned.result(timeout=0.5)
+        except Exception:
+            pass
+        with self._lock:
+            self._finished = True
+            futures = [future for future, _ in self._calls.values()]
+            running = list(self._running)
+            self._calls.clear()
+        for future in futures:
+            if future.cancel():
+                self._speculator.record_cancelled()
+        for scope in running:
+            self._speculator.cancel(scope)
+
+class Speculator:
+    """Starts likely tool calls in the background and tracks the hit rate.
+
+    Speculated calls run under their own session id, so mispredictions are
+    charged to a separate budget from the user's and can be cancelled
+    without touching the user's queries.
+    """
+
+    def __init__(self, execute: Callable[[str, Dict[str, Any]], Dict[str, Any]],
+                 index_loader: Callable[[], Tuple[NameIndex, NameIndex]],
+                 tournament_resolver: Callable[[str], Optional[str]],
+                 session_id: str,
+                 cancel_scope: Callable[[QueryScope], int]):
+        self._execute = execute
+        self._index_loader = index_loader
+        self._resolve_tournament = tournament_resolver
+        self._session_id = session_id
+        self._cancel_scope = cancel_scope
+        self._extractor: Optional[EntityExtractor] = None
+        self._indexes: Optional[Tuple[NameIndex, NameIndex]] = None
+
+    def _get_extractor(self) -> EntityExtractor:
+        indexes = self._index_loader()
+        # Rebuild when the cached name indexes are replaced after a data refresh
+        if self._extractor is None or self._indexes is None or any(
+                a is not b for a, b in zip(indexes, self._indexes)):
+            self._extractor = EntityExtractor(*indexes)
+            self._indexes = indexes
+        return self._extractor
+
+    def normalize_call(self, function_name: str, parameters: Dict[str, Any]) -> Hashable:
+        """Key for matching a speculated call to a real one.
+
+        Tournament names are resolved the same way the service resolves them,
+        so 'French Open' and 'Roland Garros' hit the same speculation.
+        """
+        parameters = dict(parameters or {})
+        if parameters.get('tournament_name'):
+            parameters['tournament_name'] = (
+                self._resolve_tournament(parameters['tournament_name']) or parameters['tournament_name']
+            )
+        return call_key(function_name, parameters)
+
+    def start(self, message: str) -> SpeculationRound:
+        """Plan and start speculative calls for a message without blocking."""
+        speculation = SpeculationRound(self)
+        if not settings.SPECULATION_ENABLED:
+            speculation._planned.set_result(None)
+            return speculation
+
+        def plan():
+            try:
+                for function_name, parameters in self._get_extractor().predict_calls(message):
+                    key = self.normalize_call(function_name, parameters)
+                    if not speculation._submit(key, partial(self._run, speculation, function_name, parameters)):
+                        break
+                    _metrics.add('started')
+                    print(f"SP - Speculating {function_name} {parameters}")
+            finally:
+                speculation._planned.set_result(None)
+
+        _executor.submit(plan)
+        return speculation
+
+    def _run(self, speculation: SpeculationRound, function_name: str,
+             parameters: Dict[str, Any]) -> Tuple[Dict[str, Any], float]:
+        """Execute a speculated call in its own query scope, returning its result and completion time."""
+        with session_scope(self._session_id) as scope:
+            if not speculation._enter(scope):
+                raise QueryCancelled("Speculation finished before the call started")
+            try:
+                result = self._execute(function_name, parameters)
+            finally:
+                speculation._exit(scope)
+        return result, time.perf_counter()
+
+    def cancel(self, scope: QueryScope):
+        """Cancel an unclaimed speculated call's running queries."""
+        cancelled = self._cancel_scope(scope)
+        _metrics.add('cancelled')
+        if cancelled:
+            print(f"SP - Cancelled {cancelled} speculative queries")
+
+    @staticmethod
+    def record(hit: bool, saved_seconds: float = 0.0):
+        _metrics.add('hits' if hit else 'misses', saved_seconds)
+
+    @staticmethod
+    def record_cancelled():
+        _metrics.add('cancelled')
+
+    @staticmethod
+    def stats() -> Dict[str, Any]:
+        return _metrics.snapshot()
+
+class _SpeculationMetrics:
+    """Process-wide speculation counters."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = {'started': 0, 'hits': 0, 'misses': 0, 'cancelled': 0}
+        self._saved_seconds = 0.0
+
+    def add(self, counter: str, saved_seconds: float = 0.0):
+        with self._lock:
+            self._counts[counter] += 1
+            self._saved_seconds += saved_seconds
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            claims = self._counts['hits'] + self._counts['misses']
+            return dict(
+                self._counts,
+                hit_rate_pct=round(self._counts['hits'] / claims * 100, 1) if claims else 0.0,
+                latency_saved_seconds=round(self._saved_seconds, 3),
+                avg_latency_saved_seconds=round(self._saved_seconds / self._counts['hits'], 3) if self._counts['hits'] else 0.0
+            )
+
+# Shared by every session so speculation stays bounded process-wide
+_executor = ThreadPoolExecutor(max_workers=settings.SPECULATION_MAX_WORKERS, thread_name_prefix="speculation")
+_metrics = _SpeculationMetrics()
\ No newline at end of file
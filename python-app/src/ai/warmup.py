@@ -0,0 +1,249 @@
+# -*- coding: utf-8 -*-
+"""
+Cache warm-up for Tennis Analytics.
+
+After startup and after each data refresh (an ingestion event, or a dbt run
+seen by the refresh detector), the first users would otherwise pay for a cold
+warehouse, an empty result cache and unloaded indexes on the most popular
+questions. The scheduler loads the player and tournament name indexes and
+the ratings, then replays the most asked tool calls from the query log, plus
+seeded popular ones (the player lists, career stats of each tour's top
+players and the head-to-heads among them), through the agent's tool path.
+That reissues the same canonical SQL, so the live question is served from
+Snowflake's result cache. The tool results it stores are only read as a
+fallback for sessions over their budget, so coverage is reported as the
+share of logged calls whose SQL is now in the warehouse's result cache.
+
+Calls run on a small pool under their own session budget, so warm-up can't
+starve live traffic.
+
+    python -m src.ai.warmup --once
+"""
+import argparse
+import itertools
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+# Add the project root to the Python path when run as a script
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from config.settings import settings
+from src.ai.query_log import QueryLog, get_query_log
+from src.data.events import WAREHOUSE_SOURCE, DataChangeEvent, data_events
+from src.data.query_guard import QueryBudgetExceeded, session_scope
+from src.data.refresh_detector import RefreshDetector, default_detector
+from src.data.single_flight import call_key
+
+TOURS = ('ATP', 'WTA')
+
+class WarmupScheduler:
+    """Replays popular tool calls after startup and data refreshes, and reports coverage."""
+
+    def __init__(self, log: Optional[QueryLog] = None, detector: Optional[RefreshDetector] = None):
+        self.log = log  # The shared query log unless given
+        self.detector = detector
+        self._agent = None
+        self._run_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stats_lock = threading.Lock()
+        self._runs = 0
+        self._last_report: Optional[Dict[str, Any]] = None
+
+    def _get_agent(self):
+        """A dedicated agent: warm-up calls get their own session and budget."""
+        if self._agent is None:
+            from src.ai.claude_agent import TennisAnalysisAgent
+            self._agent = TennisAnalysisAgent()
+        return self._agent
+
+    def plan(self) -> Tuple[List[Tuple[str, Dict[str, Any]]], List[int], Dict[str, Any]]:
+        """Calls to replay, most asked first, their logged counts and how much of the logged traffic they cover."""
+        logged, total = (self.log or get_query_log()).top_calls(settings.WARMUP_MAX_CALLS, settings.WARMUP_LOG_DAYS * 86400)
+        calls = [(tool, args) for tool, args, _ in logged]
+        counts = [count for _, _, count in logged]
+        coverage = {
+            'from_log': len(calls),
+            'logged_calls': total,
+            # Share of the logged calls that are repeats of a planned call
+            'logged_share_pct': round(sum(counts) / total * 100, 1) if total else 0.0
+        }
+
+        seeded = 0
+        for call in self._seed_calls():
+            if len(calls) >= settings.WARMUP_MAX_CALLS:
+                break
+            if all(call_key(*call) != call_key(*planned) for planned in calls):
+                calls.append(call)
+                counts.append(0)
+                seeded += 1
+        coverage['seeded'] = seeded
+        return calls, counts, coverage
+
+    def _seed_calls(self) -> List[Tuple[str, Dict[str, Any]]]:
+        """The player lists, then each tour's top players' career stats and head-to-heads."""
+        calls: List[Tuple[str, Dict[str, Any]]] = [("get_available_players", {})]
+        calls += [("get_available_players", {'governing_body': tour}) for tour in TOURS]
+
+        service = self._get_agent().tennis_service
+        for tour in TOURS:
+            # Same query as the default list tool call above, so it warms that too
+            result = service.get_available_players_list(governing_body=tour)
+            if not result.get('success'):
+                continue
+            players = result['players'].column('PLAYER').to_pylist()
+            calls += [("get_player_stats", {'player_name': player})
+                      for player in players[:settings.WARMUP_TOP_PLAYERS]]
+            calls += [("compare_players_games", {'player_one_name': one, 'player_two_name': two})
+                      for one, two in itertools.combinations(players[:settings.WARMUP_RIVALRY_PLAYERS], 2)]
+        return calls
+
+    def _warm_indexes(self) -> List[str]:
+        """Load the shared name indexes and ratings the tools need before the first question."""
+        service = self._get_agent().tennis_service
+        warmed = []
+        for name, load in (
+            ('player_names', service.player_repo.get_player_name_index),
+            ('tournament_names', service.tournament_repo.get_tournament_name_index),
+            ('ratings', lambda: service.rating_engine.is_empty and service.refresh_ratings()),
+        ):
+            try:
+                load()
+                warmed.append(name)
+            except Exception as e:
+                print(f"WU - Error warming {name}: {str(e)}")
+        return warmed
+
+    def run(self, trigger: str = 'manual') -> Dict[str, Any]:
+        """Warm caches once and return the report; concurrent triggers wait for the running pass."""
+        with self._run_lock:
+            started = time.perf_counter()
+            print(f"WU - Warm-up started ({trigger})")
+            agent = self._get_agent()
+            with session_scope(agent.session_id):
+                indexes = self._warm_indexes()
+                try:
+                    calls, counts, coverage = self.plan()
+                except Exception as e:
+                    print(f"WU - Error planning warm-up: {str(e)}")
+                    calls, counts, coverage = [], [], {}
+
+            outcomes = {'warmed': 0, 'over_budget': 0, 'failed': 0}
+            warmed_count = 0
+
+            def replay(call: Tuple[str, Dict[str, Any]]) -> str:
+                try:
+                    agent.run_tool(*call)
+                    return 'warmed'
+                except QueryBudgetExceeded:
+                    return 'over_budget'
+                except Exception as e:
+                    print(f"WU - Error replaying {call[0]} {call[1]}: {str(e)}")
+                    return 'failed'
+
+            with ThreadPoolExecutor(max_workers=max(1, settings.WARMUP_CONCURRENCY),
+                                    thread_name_prefix="warmup") as pool:
+                for outcome, count in zip(pool.map(replay, calls), counts):
+                    outcomes[outcome] += 1
+                    if outcome == 'warmed':
+                        warmed_count += count
+
+            report = dict(
+                coverage,
+                **outcomes,
+                trigger=trigger,
+                planned=len(calls),
+                indexes=indexes,
+                warmed_pct=round(outcomes['warmed'] / len(calls) * 100, 1) if calls else 0.0,
+                # Share of the logged calls whose SQL Snowflake's result cache now answers
+                result_cache_share_pct=(round(warmed_count / coverage['logged_calls'] * 100, 1)
+                                        if coverage.get('logged_calls') else 0.0),
+                duration_seconds=round(time.perf_counter() - started, 2),
+                finished_at=time.strftime("%Y-%m-%dT%H:%M:%S")
+            )
+            with self._stats_lock:
+                self._runs += 1
+                self._last_report = report
+            print(f"WU - Warm-up finished: {outcomes['warmed']}/{len(calls)} calls in {report['duration_seconds']}s "
+                  f"({outcomes['over_budget']} over budget, {outcomes['failed']} failed), "
+                  f"{report['result_cache_share_pct']}% of logged calls in the result cache, indexes: {indexes}")
+            return report
+
+    def notify_data_change(self, event: DataChangeEvent):
+        """Subscriber for data events: wake the scheduler loop to warm again."""
+        self._wake.set()
+
+    def run_forever(self, poll_seconds: float):
+        """Warm up now, then again whenever data changes or the detector sees a refresh."""
+        if self.detector is not None:
+            self._check_refresh()
+        trigger: Optional[str] = 'startup'
+        while True:
+            if trigger:
+                try:
+                    self.run(trigger)
+                except Exception as e:
+                    print(f"WU - Warm-up failed: {str(e)}")
+                trigger = None
+
+            if self._wake.wait(poll_seconds):
+                # Let a burst of ingestion events settle before replaying
+                time.sleep(settings.WARMUP_DEBOUNCE_SECONDS)
+                self._wake.clear()
+                trigger = 'data_change'
+            elif self.detector is not None and self._check_refresh():
+                # Caches built from the old data invalidate themselves; this warm-up follows
+                data_events.publish(DataChangeEvent(sources=(WAREHOUSE_SOURCE,), tours=(), years=(), partitions=()))
+                self._wake.clear()
+                trigger = 'dbt_refresh'
+
+    def _check_refresh(self) -> bool:
+        try:
+            return self.detector.check()
+        except Exception as e:
+            print(f"WU - Refresh check failed: {str(e)}")
+            return False
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            return {'runs': self._runs, 'last_run': self._last_report}
+
+# Process-wide; the agent reports its stats
+warmup_scheduler = WarmupScheduler()
+
+_scheduler_thread: Optional[threading.Thread] = None
+_scheduler_lock = threading.Lock()
+
+def start_warmup_scheduler() -> threading.Thread:
+    """Start the scheduler in a background thread of this process (once).
+
+    Running in the app's process means it warms the caches the app reads.
+    """
+    global _scheduler_thread
+    with _scheduler_lock:
+        if _scheduler_thread is None:
+            warmup_scheduler.detector = default_detector()
+            data_events.subscribe(warmup_scheduler.notify_data_change)
+            _scheduler_thread = threading.Thread(
+                target=warmup_scheduler.run_forever, args=(settings.WARMUP_POLL_SECONDS,),
+                name="warmup-scheduler", daemon=True
+            )
+            _scheduler_thread.start()
+        return _scheduler_thread
+
+def main():
+    parser = argparse.ArgumentParser(description="Warm Tennis Analytics caches with the most asked questions")
+    parser.add_argument('--once', action='store_true', help="Warm once, print the report and exit")
+    args = parser.parse_args()
+
+    if args.once:
+        import json
+        print(json.dumps(warmup_scheduler.run('manual'), indent=2))
+    else:
+        start_warmup_scheduler().join()
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
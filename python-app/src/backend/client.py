@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+"""
+Thin client for the agent backend.
+
+Has the same query, streaming, listing and cancellation methods as
+TennisAnalysisAgent, so the UI can use either one. Failures come back as
+text responses, like the agent's own errors.
+"""
+import json
+import shutil
+import urllib.error
+import urllib.request
+from typing import Any, BinaryIO, Dict, Iterator, Optional
+
+from config.settings import settings
+from ..ai.llm_scheduler import INTERACTIVE
+from .protocol import decode_event, decode_listing, decode_response
+
+class BackendClient:
+    """Client for one UI session; the backend keeps the session's agent."""
+    
+    def __init__(self, base_url: str, timeout_seconds: Optional[float] = None):
+        self.base_url = base_url.rstrip('/')
+        self.timeout_seconds = timeout_seconds or settings.BACKEND_TIMEOUT_SECONDS
+        self.session_id: Optional[str] = None
+    
+    def _request(self, path: str, payload: Optional[Dict[str, Any]] = None, timeout: Optional[float] = None):
+        data = json.dumps(payload).encode('utf-8') if payload is not None else None
+        request = urllib.request.Request(
+            f"{self.base_url}{path}", data=data,
+            headers={'content-type': 'application/json'} if data is not None else {}
+        )
+        return urllib.request.urlopen(request, timeout=timeout or self.timeout_seconds)
+    
+    @staticmethod
+    def _error_response(error: Exception) -> Dict[str, Any]:
+        if isinstance(error, urllib.error.HTTPError) and error.code == 503:
+            return {"text": "The assistant is busy right now. Please try again in a moment.", "chart_data": None}
+        print(f"UI - Backend request failed: {str(error)}")
+        return {"text": f"The analysis backend is unavailable: {str(error)}", "chart_data": None}
+    
+    def process_query(self, user_message: str, priority: int = INTERACTIVE) -> Dict[str, Any]:
+        """Run a query on the backend and wait for the response."""
+        payload = {'message': user_message, 'session_id': self.session_id, 'priority': priority}
+        try:
+            with self._request('/query', payload) as response:
+                body = json.loads(response.read())
+        except Exception as e:
+            return self._error_response(e)
+        self.session_id = body['session_id']
+        return decode_response(body['response'])
+    
+    def process_query_stream(self, user_message: str, priority: int = INTERACTIVE) -> Iterator[Dict[str, Any]]:
+        """Stream a query's events from the backend; closing early disconnects, which cancels it."""
+        payload = {'message': user_message, 'session_id': self.session_id, 'priority': priority}
+        try:
+            response = self._request('/query/stream', payload)
+        except Exception as e:
+            yield {'type': 'result', 'response': self._error_response(e)}
+            return
+        
+        with response:
+            try:
+                for line in response:
+                    event = decode_event(line)
+                    if event['type'] == 'session':
+                        self.session_id = event['session_id']
+                        continue
+                    yield event
+                    if event['type'] == 'result':
+                        return
+            except (OSError, ValueError) as e:
+                yield {'type': 'result', 'response': self._error_response(e)}
+                return
+        yield {'type': 'result', 'response': self._error_response(Exception("stream ended without a result"))}
+    
+    def list_matches(self, player_name: str, **filters) -> Dict[str, Any]:
+        """One page of a player's match listing from the backend."""
+        payload = dict(filters, player_name=player_name, session_id=self.session_id)
+        try:
+            with self._request('/matches', payload) as response:
+                body = json.loads(response.read())
+        except Exception as e:
+            return {'success': False, 'message': self._error_response(e)['text']}
+        self.session_id = body['session_id']
+        return decode_listing(body['listing'])
+    
+    def export_matches(self, out: BinaryIO, file_format: str, player_name: str, **filters) -> int:
+        """Copy a backend export to `out` as it arrives; returns the bytes written.
+        
+        Raises on failure, including a transfer cut short by a backend error.
+        """
+        payload = dict(filters, player_name=player_name, session_id=self.session_id, format=file_format)
+        with self._request('/export', payload) as response:
+            before = out.tell()
+            shutil.copyfileobj(response, out)
+            return out.tell() - before
+    
+    def cancel_active_queries(self) -> int:
+        """Cancel this session's running queries on the backend."""
+        if self.session_id is None:
+            return 0
+        try:
+            with self._request('/cancel', {'session_id': self.session_id}, timeout=10) as response:
+                return json.loads(response.read()).get('cancelled', 0)
+        except Exception as e:
+            print(f"UI - Cancel request failed: {str(e)}")
+            return 0
+    
+    def get_metrics(self) -> Dict[str, Any]:
+        with self._request('/metrics', timeout=10) as response:
+            return json.loads(response.read())
\ No newline at end of file
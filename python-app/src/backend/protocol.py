@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+"""
+Wire format shared by the agent backend and its clients.
+
+Agent responses carry chart data as a pandas DataFrame, and match listings
+an Arrow table; on the wire both are lists of records. Streaming responses
+are newline-delimited JSON events.
+"""
+import json
+from typing import Any, Dict
+
+STREAM_CONTENT_TYPE = "application/x-ndjson"
+EXPORT_CONTENT_TYPES = {"csv": "text/csv", "parquet": "application/vnd.apache.parquet"}
+
+def encode_response(response: Dict[str, Any]) -> Dict[str, Any]:
+    """Make an agent response JSON-serializable."""
+    encoded = dict(response)
+    chart_data = encoded.get("chart_data")
+    if chart_data is not None and hasattr(chart_data, "to_dict"):
+        encoded["chart_data"] = chart_data.to_dict(orient="records")
+    return encoded
+
+def decode_response(response: Dict[str, Any]) -> Dict[str, Any]:
+    """Inverse of encode_response: chart records back to a DataFrame."""
+    decoded = dict(response)
+    if decoded.get("chart_data") is not None:
+        import pandas as pd
+        decoded["chart_data"] = pd.DataFrame(decoded["chart_data"])
+    return decoded
+
+def encode_listing(listing: Dict[str, Any]) -> Dict[str, Any]:
+    """Make a match listing page JSON-serializable."""
+    encoded = dict(listing)
+    if encoded.get("matches") is not None:
+        encoded["matches"] = encoded["matches"].to_pylist()
+    return encoded
+
+def decode_listing(listing: Dict[str, Any]) -> Dict[str, Any]:
+    """Inverse of encode_listing (dates arrive as ISO strings)."""
+    decoded = dict(listing)
+    if decoded.get("matches") is not None:
+        import pyarrow as pa
+        decoded["matches"] = pa.Table.from_pylist(decoded["matches"])
+    return decoded
+
+def encode_event(event: Dict[str, Any]) -> bytes:
+    """One stream event as an NDJSON line."""
+    if event.get("type") == "result":
+        event = dict(event, response=encode_response(event["response"]))
+    return (json.dumps(event, default=str) + "\n").encode("utf-8")
+
+def decode_event(line: bytes) -> Dict[str, Any]:
+    event = json.loads(line)
+    if event.get("type") == "result":
+        event["response"] = decode_response(event["response"])
+    return event
\ No newline at end of file
@@ -0,0 +1,338 @@
+# -*- coding: utf-8 -*-
+"""
+Standalone agent backend for Tennis Analytics.
+
+Runs TennisAnalysisAgent behind a local HTTP API so the Streamlit UI can be a
+thin client: several UI replicas share one warm process (its caches, answer
+store, rating engine and LLM scheduler), and the backend can be scaled out
+on its own. Agent work runs on a bounded worker pool; requests beyond the
+pool and its queue are turned away with 503 and a retry-after.
+
+    python -m src.backend.server --port 8600 --workers 16
+
+Endpoints:
+    POST /query          {"message", "session_id"?, "priority"?} -> {"session_id", "response"}
+    POST /query/stream   same body -> NDJSON events (session, status, heartbeat, result)
+    POST /matches        {"player_name", "session_id"?, filters, "cursor"?} -> {"session_id", "listing"}
+    POST /export         {"player_name", "format", filters} -> CSV or Parquet, chunked as it is written
+    POST /cancel         {"session_id"} -> {"cancelled"}
+    GET  /health, /metrics
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+# Add the project root to the Python path when run as a script
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from config.settings import settings
+from src.ai.claude_agent import TennisAnalysisAgent
+from src.ai.llm_scheduler import INTERACTIVE, PRIORITY_NAMES
+from src.backend.protocol import (EXPORT_CONTENT_TYPES, STREAM_CONTENT_TYPE, encode_event, encode_listing,
+                                  encode_response)
+
+LISTING_FILTERS = ('opponent', 'year_start', 'year_end', 'surface')
+EXPORT_CHUNK_BYTES = 64 * 1024
+
+class BackendBusy(Exception):
+    """The worker pool and its queue are full."""
+
+class AgentBackend:
+    """One agent per client session, all sharing a worker pool and the process-wide caches."""
+    
+    def __init__(self, workers: int, max_queue: int, session_ttl_seconds: float):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.session_ttl_seconds = session_ttl_seconds
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="backend-worker")
+        self._lock = threading.Lock()
+        self._sessions: Dict[str, Tuple[TennisAnalysisAgent, float]] = {}
+        self._active = 0
+        self._counts = {'queries': 0, 'streams': 0, 'listings': 0, 'exports': 0, 'rejected': 0, 'cancelled': 0}
+    
+    def agent_for(self, session_id: Optional[str]) -> Tuple[str, TennisAnalysisAgent]:
+        """The session's agent, created on first use; idle sessions are dropped."""
+        now = time.monotonic()
+        with self._lock:
+            expired = [sid for sid, (_, used) in self._sessions.items() if now - used > self.session_ttl_seconds]
+            for sid in expired:
+                del self._sessions[sid]
+            
+            session_id = session_id or uuid.uuid4().hex
+            agent = self._sessions[session_id][0] if session_id in self._sessions else TennisAnalysisAgent()
+            self._sessions[session_id] = (agent, now)
+        return session_id, agent
+    
+    def _admit(self, kind: str):
+        with self._lock:
+            if self._active >= self.workers + self.max_queue:
+                self._counts['rejected'] += 1
+                raise BackendBusy(f"{self._active} requests in progress")
+            self._active += 1
+            self._counts[kind] += 1
+    
+    def _release(self):
+        with self._lock:
+            self._active -= 1
+    
+    def query(self, agent: TennisAnalysisAgent, message: str, priority: int) -> Dict[str, Any]:
+        self._admit('queries')
+        try:
+            return self.pool.submit(agent.process_query, message, priority).result()
+        finally:
+            self._release()
+    
+    def stream(self, agent: TennisAnalysisAgent, message: str, priority: int) -> Iterator[Dict[str, Any]]:
+        self._admit('streams')
+        try:
+            yield from agent.process_query_stream(message, priority, executor=self.pool)
+        finally:
+            self._release()
+    
+    def run(self, kind: str, function, *args, **kwargs) -> Any:
+        """Run other agent work (listings, exports) on the pool under the same admission limit."""
+        self._admit(kind)
+        try:
+            return self.pool.submit(function, *args, **kwargs).result()
+        finally:
+            self._release()
+    
+    def cancel(self, session_id: str) -> int:
+        with self._lock:
+            entry = self._sessions.get(session_id)
+        if entry is None:
+            return 0
+        cancelled = entry[0].cancel_active_queries()
+        with self._lock:
+            self._counts['cancelled'] += cancelled
+        return cancelled
+    
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self._counts, workers=self.workers, max_queue=self.max_queue,
+                        active=self._active, sessions=len(self._sessions))
+
+def _parse_priority(value: Any) -> int:
+    """Accept a scheduler priority by number or name ('interactive', 'batch')."""
+    if value is None:
+        return INTERACTIVE
+    names = {name: number for number, name in PRIORITY_NAMES.items()}
+    if value in names:
+        return names[value]
+    if value in PRIORITY_NAMES:
+        return value
+    raise ValueError(f"Unknown priority: {value}")
+
+class _ChunkedBody:
+    """Write-only file over an HTTP response using chunked transfer encoding.
+    
+    Headers go out with the first chunk, so an export that fails before
+    writing anything can still get an error status. A failure later leaves
+    the body without its terminating chunk, which clients see as a truncated
+    transfer rather than a complete file.
+    """
+    
+    def __init__(self, handler: BaseHTTPRequestHandler, content_type: str):
+        self.handler = handler
+        self.content_type = content_type
+        self.started = False
+        self.closed = False
+        self._buffer = bytearray()
+        self._position = 0
+    
+    def write(self, data) -> int:
+        self._buffer += data
+        self._position += len(data)
+        if len(self._buffer) >= EXPORT_CHUNK_BYTES:
+            self._flush_chunk()
+        return len(data)
+    
+    def tell(self) -> int:
+        return self._position
+    
+    def flush(self):
+        pass
+    
+    def _flush_chunk(self):
+        if not self.started:
+            self.started = True
+            self.handler.protocol_version = 'HTTP/1.1'
+            self.handler.send_response(200)
+            self.handler.send_header('content-type', self.content_type)
+            self.handler.send_header('transfer-encoding', 'chunked')
+            self.handler.send_header('connection', 'close')
+            self.handler.end_headers()
+            self.handler.close_connection = True
+        if self._buffer:
+            self.handler.wfile.write(b"%x\r\n" % len(self._buffer) + bytes(self._buffer) + b"\r\n")
+            self._buffer.clear()
+    
+    def finish(self):
+        """Send what is left and the terminating chunk."""
+        self._flush_chunk()
+        self.handler.wfile.write(b"0\r\n\r\n")
+        self.closed = True
+
+def make_handler(backend: AgentBackend):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path == '/health':
+                return self._send(200, dict(backend.stats(), status='ok'))
+            if self.path == '/metrics':
+                return self._send(200, dict(TennisAnalysisAgent.get_metrics(), backend=backend.stats()))
+            self._send(404, {'error': f"Unknown path: {self.path}"})
+        
+        def do_POST(self):
+            try:
+                body = json.loads(self.rfile.read(int(self.headers.get('content-length', 0))) or b'{}')
+            except ValueError:
+                return self._send(400, {'error': "Request body is not valid JSON"})
+            
+            if self.path == '/cancel':
+                return self._send(200, {'cancelled': backend.cancel(body.get('session_id', ''))})
+            if self.path in ('/matches', '/export'):
+                return self._matches(body)
+            if self.path not in ('/query', '/query/stream'):
+                return self._send(404, {'error': f"Unknown path: {self.path}"})
+            
+            message = body.get('message')
+            if not message:
+                return self._send(400, {'error': "'message' is required"})
+            try:
+                priority = _parse_priority(body.get('priority'))
+            except ValueError as e:
+                return self._send(400, {'error': str(e)})
+            session_id, agent = backend.agent_for(body.get('session_id'))
+            
+            try:
+                if self.path == '/query':
+                    response = backend.query(agent, message, priority)
+                    return self._send(200, {'session_id': session_id, 'response': encode_response(response)})
+                self._stream(backend.stream(agent, message, priority), session_id)
+            except BackendBusy as e:
+                print(f"BE - Rejected request: {str(e)}")
+                self._send(503, {'error': "Backend busy"}, {'retry-after': '1'})
+        
+        def _matches(self, body: Dict[str, Any]):
+            player_name = body.get('player_name')
+            if not player_name:
+                return self._send(400, {'error': "'player_name' is required"})
+            filters = {name: body[name] for name in LISTING_FILTERS if body.get(name) is not None}
+            session_id, agent = backend.agent_for(body.get('session_id'))
+            
+            try:
+                if self.path == '/matches':
+                    listing = backend.run('listings', agent.list_matches, player_name, cursor=body.get('cursor'),
+                                          page_size=body.get('page_size'), **filters)
+                    return self._send(200, {'session_id': session_id, 'listing': encode_listing(listing)})
+                
+                file_format = body.get('format', 'csv')
+                if file_format not in EXPORT_CONTENT_TYPES:
+                    return self._send(400, {'error': f"Unsupported export format: {file_format}"})
+                out = _ChunkedBody(self, EXPORT_CONTENT_TYPES[file_format])
+                try:
+                    rows = backend.run('exports', agent.export_matches, out, file_format, player_name, **filters)
+                    out.finish()
+                    print(f"BE - Exported {rows} matches for {player_name} as {file_format}")
+                except (BrokenPipeError, ConnectionResetError):
+                    print(f"BE - Client disconnected from export for session {session_id}")
+                    agent.cancel_active_queries()
+                except BackendBusy:
+                    raise
+                except Exception as e:
+                    print(f"BE - Export failed: {str(e)}")
+                    if not out.started:
+                        self._send(500, {'error': str(e)})
+            except BackendBusy as e:
+                print(f"BE - Rejected request: {str(e)}")
+                self._send(503, {'error': "Backend busy"}, {'retry-after': '1'})
+        
+        def _stream(self, events: Iterator[Dict[str, Any]], session_id: str):
+            """Write events as NDJSON; a client that goes away cancels its session's queries."""
+            # Admission happens on the first event, before any headers are sent
+            try:
+                first = next(events)
+            except BackendBusy:
+                raise
+            except StopIteration:
+                print(f"BE - Agent stream ended without events for session {session_id}")
+                return self._send(500, {'error': "Agent returned no response"})
+            except Exception as e:
+                print(f"BE - Query failed: {str(e)}")
+                return self._send(500, {'error': str(e)})
+            
+            self.send_response(200)
+            self.send_header('content-type', STREAM_CONTENT_TYPE)
+            self.send_header('cache-control', 'no-cache')
+            self.end_headers()
+            try:
+                self.wfile.write(encode_event({'type': 'session', 'session_id': session_id}))
+                self.wfile.write(encode_event(first))
+                self.wfile.flush()
+                for event in events:
+                    self.wfile.write(encode_event(event))
+                    self.wfile.flush()
+            except (BrokenPipeError, ConnectionResetError):
+                print(f"BE - Client disconnected from session {session_id}")
+            finally:
+                # Closing early runs the agent's cancellation
+                events.close()
+        
+        def _send(self, status: int, payload: Dict[str, Any], headers: Optional[Dict[str, str]] = None):
+            data = json.dumps(payload, default=str).encode('utf-8')
+            self.send_response(status)
+            self.send_header('content-type', 'application/json')
+            self.send_header('content-length', str(len(data)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(data)
+        
+        def log_message(self, format, *args):
+            pass
+    
+    return Handler
+
+def serve(host: str, port: int, workers: int) -> ThreadingHTTPServer:
+    """Start the backend in a background thread and return the server."""
+    backend = AgentBackend(workers, settings.BACKEND_MAX_QUEUE, settings.BACKEND_SESSION_TTL_SECONDS)
+    server = ThreadingHTTPServer((host, port), make_handler(backend))
+    server.daemon_threads = True
+    server.backend = backend
+    threading.Thread(target=server.serve_forever, name="backend-http", daemon=True).start()
+    return server
+
+def main():
+    parser = argparse.ArgumentParser(description="Tennis Analytics agent backend")
+    parser.add_argument('--host', default=settings.BACKEND_HOST)
+    parser.add_argument('--port', type=int, default=settings.BACKEND_PORT)
+    parser.add_argument('--workers', type=int, default=settings.BACKEND_WORKERS)
+    args = parser.parse_args()
+    
+    settings.validate()
+    if settings.INGEST_ENABLED:
+        # Events must reach this process's caches, so the watcher runs here, not in the UI
+        from src.ingestion.pipeline import start_watcher
+        start_watcher()
+    if settings.WARMUP_ENABLED:
+        from src.ai.warmup import start_warmup_scheduler
+        start_warmup_scheduler()
+    
+    server = serve(args.host, args.port, args.workers)
+    print(f"BE - Agent backend on http://{args.host}:{args.port} ({args.workers} workers)")
+    try:
+        while True:
+            time.sleep(60)
+            print(f"BE - {server.backend.stats()}")
+    except KeyboardInterrupt:
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,359 @@
+# -*- coding: utf-8 -*-
+"""
+Precomputed player career and season answers for Tennis Analytics.
+
+The build job (scripts/build_answer_store.py, run after dbt) writes
+per-player, per-year prefix sums into one memory-mapped file with a sorted
+name index. Any year_start-year_end question is then two array reads and a
+subtraction with no warehouse call. Readers map the file read-only, so every
+app process shares the same pages through the OS page cache.
+
+File layout: magic, header length, JSON header, then 64-byte aligned arrays
+described in the header. The header records the LAST_ALTERED version of the
+source mart. The reader compares it with the warehouse when it maps a file,
+every few minutes and after warehouse refreshes; once the mart has changed,
+the store is skipped (answers come from the warehouse) until it is rebuilt.
+"""
+from __future__ import annotations
+
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+from typing import TYPE_CHECKING, Any, Callable, Dict, Optional, Tuple
+
+from config.settings import settings
+from .events import DataChangeEvent, data_events
+from .repositories import MetadataRepository
+
+if TYPE_CHECKING:
+    import numpy as np
+    import pyarrow as pa
+
+MAGIC = b"TNSANS02"
+ALIGNMENT = 64
+
+# The mart the store is built from
+SOURCE_TABLE = 'FCT_PLAYER_TOURNAMENT_SUMMARY'
+
+# Summed fields, in prefix-sum order; AVG rank is RANK_SUM / RANK_COUNT
+SUM_FIELDS = [
+    'TOURNAMENTS',
+    'MATCHES_WON',
+    'MATCHES_LOST',
+    'SETS_WON',
+    'SETS_LOST',
+    'GAMES_WON',
+    'GAMES_LOST',
+    'TIEBREAKS_WON',
+    'TIEBREAKS_LOST',
+    'RANK_SUM',
+    'RANK_COUNT',
+]
+
+def _numbers(table: pa.Table, column: str) -> np.ndarray:
+    """A numeric column (NUMBER arrives as decimal) as float64, nulls as NaN."""
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    return pc.cast(table.column(column), pa.float64()).to_numpy(zero_copy_only=False)
+
+def build_answer_store(totals: pa.Table, path: str, data_version: Optional[str] = None) -> int:
+    """Write the store from per-player-year totals; returns the number of players.
+
+    `totals` has PLAYER, MATCH_YEAR, GOVERNING_BODY, MAX_POINTS and the SUM_FIELDS
+    columns, one row per player and year. `data_version` is SOURCE_TABLE's
+    LAST_ALTERED when the totals were read.
+    """
+    import numpy as np
+    names = np.array(totals.column('PLAYER').to_pylist(), dtype=object)
+    years = _numbers(totals, 'MATCH_YEAR').astype(np.int64)
+    first_year, last_year = int(years.min()), int(years.max())
+
+    # Sorted unique names define the player codes
+    players, codes = np.unique(names.astype(str), return_inverse=True)
+    year_index = years - first_year
+    n_players, n_years = len(players), last_year - first_year + 1
+
+    values = np.zeros((n_players, n_years, len(SUM_FIELDS)), dtype=np.float64)
+    for f, field in enumerate(SUM_FIELDS):
+        np.add.at(values[:, :, f], (codes, year_index), np.nan_to_num(_numbers(totals, field)))
+    prefix = np.zeros((n_players, n_years + 1, len(SUM_FIELDS)), dtype=np.float64)
+    np.cumsum(values, axis=1, out=prefix[:, 1:, :])
+
+    max_points = np.full((n_players, n_years), np.nan, dtype=np.float64)
+    np.fmax.at(max_points, (codes, year_index), _numbers(totals, 'MAX_POINTS'))
+
+    # Tour code 0 is reserved for players without a governing body
+    tours = sorted({tour for tour in totals.column('GOVERNING_BODY').to_pylist() if tour})
+    tour_codes = np.zeros(n_players, dtype=np.uint8)
+    tour_lookup = {tour: code + 1 for code, tour in enumerate(tours)}
+    for code, tour in zip(codes, totals.column('GOVERNING_BODY').to_pylist()):
+        if tour:
+            tour_codes[code] = max(tour_codes[code], tour_lookup[tour])
+
+    encoded = [player.encode('utf-8') for player in players]
+    name_offsets = np.zeros(n_players + 1, dtype=np.int64)
+    np.cumsum([len(name) for name in encoded], out=name_offsets[1:])
+    name_bytes = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+
+    arrays = {
+        'name_offsets': name_offsets,
+        'name_bytes': name_bytes,
+        'prefix': prefix,
+        'max_points': max_points,
+        'tours': tour_codes,
+    }
+    _write(path, arrays, {
+        'first_year': first_year,
+        'last_year': last_year,
+        'fields': SUM_FIELDS,
+        'tours': tours,
+        'players': n_players,
+        'data_version': data_version,
+        'built_at': time.strftime("%Y-%m-%dT%H:%M:%S"),
+    })
+    return n_players
+
+def _write(path: str, arrays: Dict[str, np.ndarray], meta: Dict[str, Any]):
+    """Write arrays at aligned offsets after a JSON header, atomically replacing `path`."""
+    import numpy as np
+    layout, offset = {}, 0
+    for name, array in arrays.items():
+        layout[name] = {'offset': offset, 'dtype': array.dtype.str, 'shape': list(array.shape)}
+        offset += -(-array.nbytes // ALIGNMENT) * ALIGNMENT
+    header = json.dumps(dict(meta, arrays=layout)).encode('utf-8')
+    data_start = -(-(len(MAGIC) + 8 + len(header)) // ALIGNMENT) * ALIGNMENT
+
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    temporary = f"{path}.tmp-{os.getpid()}"
+    with open(temporary, "wb") as store:
+        store.write(MAGIC + struct.pack("<Q", len(header)) + header)
+        for name, array in arrays.items():
+            store.seek(data_start + layout[name]['offset'])
+            store.write(np.ascontiguousarray(array).tobytes())
+        store.truncate(data_start + offset)
+    # Readers keep their mapping of the old file until they notice the new one
+    os.replace(temporary, path)
+
+class _Mapping:
+    """Read-only view of one version of the store file."""
+
+    def __init__(self, path: str):
+        import numpy as np
+        with open(path, "rb") as store:
+            prefix = store.read(len(MAGIC) + 8)
+            if prefix[:len(MAGIC)] != MAGIC:
+                raise ValueError(f"Not an answer store: {path}")
+            header_length = struct.unpack("<Q", prefix[len(MAGIC):])[0]
+            self.meta = json.loads(store.read(header_length))
+            stat = os.fstat(store.fileno())
+            # Shared, read-only pages: every process mapping the file uses the same page cache
+            self.buffer = mmap.mmap(store.fileno(), 0, access=mmap.ACCESS_READ)
+        self.identity = (stat.st_ino, stat.st_mtime_ns)
+
+        data_start = -(-(len(MAGIC) + 8 + header_length) // ALIGNMENT) * ALIGNMENT
+        self.offsets = {name: data_start + spec['offset'] for name, spec in self.meta['arrays'].items()}
+        self.arrays = {}
+        for name, spec in self.meta['arrays'].items():
+            dtype, shape = np.dtype(spec['dtype']), tuple(spec['shape'])
+            count = int(np.prod(shape))
+            self.arrays[name] = np.frombuffer(self.buffer, dtype=dtype, count=count,
+                                              offset=self.offsets[name]).reshape(shape)
+        self.first_year = self.meta['first_year']
+        self.last_year = self.meta['last_year']
+        self.fields = {field: i for i, field in enumerate(self.meta['fields'])}
+
+    def name(self, code: int) -> str:
+        offsets = self.arrays['name_offsets']
+        start = self.offsets['name_bytes']
+        return self.buffer[start + int(offsets[code]):start + int(offsets[code + 1])].decode('utf-8')
+
+    def find(self, player: str) -> Optional[int]:
+        """Binary search the sorted name index; only O(log n) names are decoded."""
+        low, high = 0, self.meta['players']
+        while low < high:
+            middle = (low + high) // 2
+            if self.name(middle) < player:
+                low = middle + 1
+            else:
+                high = middle
+        if low < self.meta['players'] and self.name(low) == player:
+            return low
+        return None
+
+class AnswerStore:
+    """Reader for the precomputed player answers; reopens the file when it is rebuilt.
+
+    With a `version_loader`, a newly mapped file is checked against the
+    warehouse before it answers, and again every ANSWER_STORE_CHECK_SECONDS,
+    so a store left behind by a dbt run is skipped even without warm-up.
+    """
+
+    def __init__(self, path: str, version_loader: Optional[Callable[[], Optional[str]]] = None):
+        self.path = path
+        self._version_loader = version_loader
+        self._lock = threading.Lock()
+        self._mapping: Optional[_Mapping] = None
+        # Identity of a mapped file found stale after a warehouse refresh
+        self._stale_identity: Optional[Tuple[int, int]] = None
+        self._check_lock = threading.Lock()
+        self._checked_identity: Optional[Tuple[int, int]] = None
+        self._checked_at = 0.0
+        self._stats_lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def _mapped(self) -> Optional[_Mapping]:
+        """The mapping of the current file, remapped when the file was replaced."""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+
+        mapping = self._mapping
+        if mapping is None or mapping.identity != (stat.st_ino, stat.st_mtime_ns):
+            with self._lock:
+                if self._mapping is None or self._mapping.identity != (stat.st_ino, stat.st_mtime_ns):
+                    try:
+                        self._mapping = _Mapping(self.path)
+                        print(f"AS - Mapped answer store {self.path} ({self._mapping.meta['players']} players)")
+                    except Exception as e:
+                        print(f"AS - Error opening answer store: {str(e)}")
+                        return None
+                mapping = self._mapping
+        return mapping
+
+    def _current(self) -> Optional[_Mapping]:
+        """The mapping to answer from, or None when there is no file or it is stale."""
+        mapping = self._mapped()
+        if mapping is None:
+            return None
+        self._verify(mapping)
+        if mapping.identity == self._stale_identity:
+            return None
+        return mapping
+
+    def _verify(self, mapping: _Mapping):
+        """Check the data version of a newly mapped file, and of the current one periodically."""
+        if self._version_loader is None or mapping.identity == self._stale_identity:
+            return
+        is_new = mapping.identity != self._checked_identity
+        if not is_new and time.monotonic() - self._checked_at < settings.ANSWER_STORE_CHECK_SECONDS:
+            return
+        # A new file waits for its first check; periodic re-checks never block lookups
+        if not self._check_lock.acquire(blocking=is_new):
+            return
+        try:
+            if mapping.identity != self._checked_identity or \
+                    time.monotonic() - self._checked_at >= settings.ANSWER_STORE_CHECK_SECONDS:
+                self._check(mapping, self._version_loader())
+                self._checked_identity = mapping.identity
+                self._checked_at = time.monotonic()
+        finally:
+            self._check_lock.release()
+
+    def _check(self, mapping: _Mapping, current_version: Optional[str]) -> bool:
+        if current_version is None:
+            # Unknown (the warehouse could not be asked); keep the current decision
+            return mapping.identity != self._stale_identity
+        if mapping.meta.get('data_version') == current_version:
+            return True
+        self._stale_identity = mapping.identity
+        print(f"AS - Answer store built at {mapping.meta.get('built_at')} is stale "
+              f"({mapping.meta.get('data_version')} vs {current_version}); using the warehouse until it is rebuilt")
+        return False
+
+    def check_data_version(self, current_version: Optional[str]) -> bool:
+        """Skip the mapped file from now on unless it was built from `current_version`; True if still fresh."""
+        mapping = self._mapped()
+        if mapping is None:
+            return False
+        return self._check(mapping, current_version)
+
+    def _record(self, hit: bool):
+        with self._stats_lock:
+            if hit:
+                self._hits += 1
+            else:
+                self._misses += 1
+
+    def get_player_tournament_stats(self, player_name: str, year_start: Optional[int] = None,
+                                    year_end: Optional[int] = None) -> Optional[Tuple]:
+        """Same tuple as PlayerRepository.get_player_tournament_stats, or None if the store can't answer."""
+        import numpy as np
+        mapping = self._current()
+        code = mapping.find(player_name) if mapping is not None and player_name else None
+        if code is None:
+            self._record(hit=False)
+            return None
+        self._record(hit=True)
+
+        # Clamp to the stored years; prefix row i holds the totals before year first_year + i
+        start = min(max((year_start or mapping.first_year) - mapping.first_year, 0), mapping.last_year - mapping.first_year + 1)
+        end = min(max((year_end or mapping.last_year) - mapping.first_year + 1, 0), mapping.last_year - mapping.first_year + 1)
+        end = max(end, start)
+
+        prefix = mapping.arrays['prefix']
+        totals = prefix[code, end] - prefix[code, start]
+        f = mapping.fields
+
+        points = mapping.arrays['max_points'][code, start:end]
+        max_points = float(np.nanmax(points)) if points.size and not np.isnan(points).all() else None
+        average_rank = totals[f['RANK_SUM']] / totals[f['RANK_COUNT']] if totals[f['RANK_COUNT']] else None
+        tour_code = int(mapping.arrays['tours'][code])
+        governing_body = mapping.meta['tours'][tour_code - 1] if tour_code else None
+
+        return (
+            int(totals[f['TOURNAMENTS']]),
+            int(totals[f['MATCHES_WON']]),
+            int(totals[f['MATCHES_LOST']]),
+            int(totals[f['SETS_WON']]),
+            int(totals[f['SETS_LOST']]),
+            int(totals[f['GAMES_WON']]),
+            int(totals[f['GAMES_LOST']]),
+            int(totals[f['TIEBREAKS_WON']]),
+            int(totals[f['TIEBREAKS_LOST']]),
+            average_rank,
+            max_points,
+            governing_body
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        mapping = self._mapping
+        with self._stats_lock:
+            hits, misses = self._hits, self._misses
+        return {
+            'available': mapping is not None and mapping.identity != self._stale_identity,
+            'players': mapping.meta['players'] if mapping else 0,
+            'built_at': mapping.meta.get('built_at') if mapping else None,
+            'data_version': mapping.meta.get('data_version') if mapping else None,
+            'hits': hits,
+            'misses': misses
+        }
+
+_player_answer_store: Optional[AnswerStore] = None
+_player_answer_store_lock = threading.Lock()
+
+def get_player_answer_store() -> AnswerStore:
+    """Shared reader, created on first use; every process maps the same file."""
+    global _player_answer_store
+    if _player_answer_store is None:
+        with _player_answer_store_lock:
+            if _player_answer_store is None:
+                _player_answer_store = AnswerStore(
+                    settings.ANSWER_STORE_PATH,
+                    version_loader=lambda: MetadataRepository().get_tables_last_altered([SOURCE_TABLE])
+                )
+    return _player_answer_store
+
+def _check_answer_store(event: DataChangeEvent):
+    """After a warehouse refresh seen by warm-up, stop serving a store built from the previous data at once."""
+    if not event.is_warehouse_refresh:
+        return
+    get_player_answer_store().check_data_version(MetadataRepository().get_tables_last_altered([SOURCE_TABLE]))
+
+data_events.subscribe(_check_answer_store)
\ No newline at end of file
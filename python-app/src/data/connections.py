@@ -5,21 +5,56 @@ Created on Mon Aug 11 22:21:43 2025
 @author: pedro
 
 Database connection management for Tennis Analytics.
+
+The connector, pyarrow and the private key are loaded on first connection,
+not at import, so pages that never query don't pay for them.
+Connections are pooled: one whose query completed goes back to an idle
+list for the next query instead of being closed.
 """
-import snowflake.connector
-from cryptography.hazmat.primitives import serialization
-from typing import Optional
+from __future__ import annotations
+
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Any, Callable, Dict, Hashable, Iterator, List, Optional, Tuple, Union
 from config.settings import settings
+from .single_flight import query_flights, query_key
+from .query_builder import CanonicalQuery, result_reuse_tracker
+from .query_guard import (QueryBudgetExceeded, QueryCancelled, QueryInterrupted, QueryScope,
+                          current_scope, estimate_credits, query_guard)
+
+if TYPE_CHECKING:
+    import pandas as pd
+    import pyarrow as pa
+    import snowflake.connector
+
+MAX_CACHED_ESTIMATES = 512
 
 class SnowflakeConnection:
     """Manages Snowflake database connections."""
     
     def __init__(self):
-        self._connection: Optional[snowflake.connector.SnowflakeConnection] = None
-        self._private_key = self._load_private_key()
+        self._idle: List[Tuple[snowflake.connector.SnowflakeConnection, float]] = []
+        self._pool_lock = threading.Lock()
+        self._private_key = None
+        self._private_key_lock = threading.Lock()
+        self._estimates: 'OrderedDict[Hashable, int]' = OrderedDict()
+        self._estimates_lock = threading.Lock()
+        self._reuse_refresh_lock = threading.Lock()
+        self._reuse_refreshed_at: Optional[float] = None
+    
+    def _get_private_key(self):
+        """Private key for Snowflake authentication, loaded on first use."""
+        if self._private_key is None:
+            with self._private_key_lock:
+                if self._private_key is None:
+                    self._private_key = self._load_private_key()
+        return self._private_key
     
     def _load_private_key(self):
         """Load private key for Snowflake authentication."""
+        from cryptography.hazmat.primitives import serialization
         try:
             with open(settings.SNOWFLAKE_PRIVATE_KEY_PATH, "rb") as key_file:
                 private_key = serialization.load_pem_private_key(
@@ -36,15 +71,18 @@ class SnowflakeConnection:
         """Create and return a Snowflake connection."""
         try:
             print("DLC - Attempting Snowflake connection...")
+            import snowflake.connector
             
             connection = snowflake.connector.connect(
                 account=settings.SNOWFLAKE_ACCOUNT,
                 user=settings.SNOWFLAKE_USER,
-                private_key=self._private_key,
+                private_key=self._get_private_key(),
                 role=settings.SNOWFLAKE_ROLE,
                 warehouse=settings.SNOWFLAKE_WAREHOUSE,
                 database=settings.SNOWFLAKE_DATABASE,
-                schema=settings.SNOWFLAKE_SCHEMA
+                schema=settings.SNOWFLAKE_SCHEMA,
+                # Server-side backstop: runaway statements are cancelled by Snowflake
+                session_parameters={'STATEMENT_TIMEOUT_IN_SECONDS': settings.QUERY_TIMEOUT_SECONDS}
             )
             
             print("DLC - Snowflake connection successful")
@@ -55,53 +93,256 @@ class SnowflakeConnection:
             raise Exception(f"DLC - Failed to connect to Snowflake: {str(e)}")
     
     def get_cursor(self):
-        """Get a cursor for executing queries."""
-        connection = self.connect()
+        """Get a cursor on a pooled connection, opening a new one when none is idle."""
+        connection = None
+        now = time.monotonic()
+        with self._pool_lock:
+            while self._idle and connection is None:
+                candidate, returned_at = self._idle.pop()
+                if now - returned_at <= settings.SNOWFLAKE_POOL_IDLE_SECONDS and not candidate.is_closed():
+                    connection = candidate
+                else:
+                    self._close(candidate)
+        if connection is None:
+            connection = self.connect()
         return connection.cursor(), connection
     
-    def execute_query(self, query: str, params: list = None):
-        """Execute a query and return results."""
-        cursor, connection = None, None
+    def _release(self, cursor, connection, reusable: bool):
+        """Close the cursor and return the connection to the pool, or close it if it can't be reused."""
+        if cursor:
+            cursor.close()
+        if not connection:
+            return
+        with self._pool_lock:
+            if reusable and len(self._idle) < settings.SNOWFLAKE_POOL_SIZE and not connection.is_closed():
+                self._idle.append((connection, time.monotonic()))
+                return
+        self._close(connection)
+    
+    @staticmethod
+    def _close(connection):
+        try:
+            connection.close()
+        except Exception as e:
+            print(f"DLC - Error closing connection: {str(e)}")
+    
+    def _execute(self, query: str, params: list, fetch, shape: Optional[str] = None,
+                 key: Hashable = None, scope: Optional[QueryScope] = None):
+        """Execute a query and return `fetch(cursor)`, always releasing the connection."""
+        cursor, connection, query_id, reusable = None, None, None, False
         try:
             cursor, connection = self.get_cursor()
+            self._preflight(cursor, query, params, scope)
+            query_id = self._submit(cursor, query, params, shape, key, scope)
+            cursor.get_results_from_sfqid(query_id)
+            result = fetch(cursor)
+            reusable = True
+            return result
             
-            if params:
-                cursor.execute(query, params)
-            else:
-                cursor.execute(query)
-            
-            return cursor.fetchall()
-            
+        except QueryInterrupted:
+            raise
         except Exception as e:
+            if scope is not None and scope.cancelled:
+                raise QueryCancelled(f"Query {query_id} was cancelled")
             print(f"DLC - Query execution error: {str(e)}")
             raise Exception(f"Query failed: {str(e)}")
         finally:
-            if cursor:
-                cursor.close()
-            if connection:
-                connection.close()
+            query_guard.finished(query_id)
+            # Only connections whose query ran to completion go back to the pool
+            self._release(cursor, connection, reusable)
+    
+    def _submit(self, cursor, query: str, params: list, shape: Optional[str], key: Hashable,
+                scope: Optional[QueryScope]) -> Optional[str]:
+        """Submit a query without waiting and register its id so it can be cancelled."""
+        if scope is not None:
+            scope.raise_if_cancelled()
+        
+        # Submitted asynchronously so the query id is known while it runs
+        cursor.execute_async(query, params or None)
+        query_id = cursor.sfqid
+        query_guard.started(query_id, key, scope)
+        result_reuse_tracker.record(shape, query_id)
+        return query_id
+    
+    def _execute_shared(self, kind: str, query: Union[str, CanonicalQuery], params: list, fetch):
+        """Execute a query, sharing the result with concurrent identical calls.
+        
+        Only the session that runs the shared query is budget-checked and charged for it.
+        """
+        query, params, shape = self._unpack(query, params)
+        key = query_key(kind, query, params)
+        scope = current_scope()
+        
+        query_guard.join_flight(key, scope)
+        try:
+            try:
+                return query_flights.do(key, lambda: self._execute(query, params, fetch, shape, key, scope))
+            except QueryBudgetExceeded as e:
+                if scope is not None and e.session_id == scope.session_id:
+                    raise
+                # The flight's leader was over its own budget, not this session: run it under ours
+                return self._execute(query, params, fetch, shape, key, scope)
+        finally:
+            query_guard.leave_flight(key, scope)
+    
+    def _preflight(self, cursor, query: str, params: list, scope: Optional[QueryScope]):
+        """Estimate a session query's cost on its own connection and reserve it from the session budget."""
+        if scope is None or not (settings.SESSION_BYTES_PER_MINUTE or settings.SESSION_CREDITS_PER_MINUTE):
+            return
+        scope.raise_if_cancelled()
+        
+        estimated_bytes = self.estimate_bytes(query, params, cursor)
+        query_guard.reserve(scope, estimated_bytes, estimate_credits(estimated_bytes))
     
-    def execute_query_pandas(self, query: str, params: list = None):
+    def estimate_bytes(self, query: str, params: list = None, cursor=None) -> int:
+        """Bytes the query would scan after pruning, from EXPLAIN (compiled, not run).
+        
+        With `cursor`, EXPLAIN runs on that cursor's connection instead of a new
+        one. Estimates are cached per SQL text and parameters; 0 when unavailable.
+        """
+        cache_key = (query, tuple(params or ()))
+        with self._estimates_lock:
+            if cache_key in self._estimates:
+                self._estimates.move_to_end(cache_key)
+                return self._estimates[cache_key]
+        
+        try:
+            explain = f"EXPLAIN USING JSON {query}"
+            if cursor is not None:
+                cursor.execute(explain, params or None)
+                rows = cursor.fetchall()
+            else:
+                rows = self._execute(explain, params, lambda cursor: cursor.fetchall())
+            plan = json.loads(rows[0][0]) if rows else {}
+            estimated = int(plan.get('GlobalStats', {}).get('bytesAssigned', 0))
+        except Exception as e:
+            # A failed estimate must not block the query itself
+            print(f"DLC - Pre-flight estimate failed: {str(e)}")
+            return 0
+        
+        with self._estimates_lock:
+            self._estimates[cache_key] = estimated
+            while len(self._estimates) > MAX_CACHED_ESTIMATES:
+                self._estimates.popitem(last=False)
+        return estimated
+    
+    def cancel_session_queries(self, session_id: str) -> int:
+        """Cancel the session's running queries by id; returns how many were cancelled."""
+        return self._cancel_queries(query_guard.cancel_session(session_id))
+    
+    def cancel_scope_queries(self, scope: QueryScope) -> int:
+        """Cancel the running queries of one scope of work; returns how many were cancelled."""
+        return self._cancel_queries(query_guard.cancel_scope(scope))
+    
+    def _cancel_queries(self, query_ids: List[str]) -> int:
+        cancelled = 0
+        for query_id in query_ids:
+            try:
+                self._execute("SELECT SYSTEM$CANCEL_QUERY(%s)", [query_id], lambda cursor: cursor.fetchall())
+                cancelled += 1
+                print(f"DLC - Cancelled query {query_id}")
+            except Exception as e:
+                print(f"DLC - Error cancelling query {query_id}: {str(e)}")
+        return cancelled
+    
+    @staticmethod
+    def _unpack(query: Union[str, CanonicalQuery], params: list) -> Tuple[str, list, Optional[str]]:
+        """Accept either raw SQL plus params or a CanonicalQuery from the query builder."""
+        if isinstance(query, CanonicalQuery):
+            return query.sql, list(query.params), query.shape
+        return query, params, None
+    
+    def execute_query(self, query: Union[str, CanonicalQuery], params: list = None):
+        """Execute a query and return results."""
+        return self._execute_shared('rows', query, params, lambda cursor: cursor.fetchall())
+    
+    def execute_query_pandas(self, query: Union[str, CanonicalQuery], params: list = None):
         """Execute a query and return results as pandas DataFrame."""
-        cursor, connection = None, None
+        return self._execute_shared('pandas', query, params, lambda cursor: cursor.fetch_pandas_all())
+    
+    def execute_query_arrow(self, query: Union[str, CanonicalQuery], params: list = None) -> pa.Table:
+        """Execute a query and return results as an Arrow table (no per-row Python objects)."""
+        return self._execute_shared('arrow', query, params, self._fetch_arrow_table)
+    
+    def iter_query_arrow_batches(self, query: Union[str, CanonicalQuery], params: list = None) -> Iterator[pa.Table]:
+        """Execute a query and yield its results as Arrow tables, one per result chunk."""
+        return self._iter_batches(query, params, 'arrow_batches', lambda cursor: cursor.fetch_arrow_batches())
+    
+    def iter_query_pandas_batches(self, query: Union[str, CanonicalQuery], params: list = None) -> Iterator[pd.DataFrame]:
+        """Execute a query and yield its results as DataFrames, one per result chunk.
+        
+        Only the current chunk is held in memory, unlike execute_query_pandas.
+        """
+        return self._iter_batches(query, params, 'pandas_batches', lambda cursor: cursor.fetch_pandas_batches())
+    
+    def _iter_batches(self, query: Union[str, CanonicalQuery], params: Optional[list], kind: str,
+                      fetch_batches: Callable) -> Iterator[Any]:
+        query, params, shape = self._unpack(query, params)
+        scope = current_scope()
+        cursor, connection, query_id, reusable = None, None, None, False
         try:
             cursor, connection = self.get_cursor()
+            self._preflight(cursor, query, params, scope)
+            query_id = self._submit(cursor, query, params, shape, query_key(kind, query, params), scope)
+            cursor.get_results_from_sfqid(query_id)
+            for batch in fetch_batches(cursor):
+                yield batch
+            reusable = True
             
-            if params:
-                cursor.execute(query, params)
-            else:
-                cursor.execute(query)
-            
-            return cursor.fetch_pandas_all()
-            
+        except QueryInterrupted:
+            raise
         except Exception as e:
+            if scope is not None and scope.cancelled:
+                raise QueryCancelled(f"Query {query_id} was cancelled")
             print(f"DLC - Query execution error: {str(e)}")
             raise Exception(f"Query failed: {str(e)}")
         finally:
-            if cursor:
-                cursor.close()
-            if connection:
-                connection.close()
+            query_guard.finished(query_id)
+            # Only connections whose query ran to completion go back to the pool
+            self._release(cursor, connection, reusable)
+    
+    def refresh_result_reuse_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Look up recorded query ids in query history and return per-shape reuse rates."""
+        query_ids = result_reuse_tracker.pending_query_ids()
+        for start in range(0, len(query_ids), 500):
+            chunk = query_ids[start:start + 500]
+            sql = (
+                "SELECT QUERY_ID, BYTES_SCANNED "
+                "FROM TABLE(INFORMATION_SCHEMA.QUERY_HISTORY_BY_USER(RESULT_LIMIT => 10000)) "
+                f"WHERE QUERY_ID IN ({', '.join(['%s'] * len(chunk))}) AND EXECUTION_STATUS = 'SUCCESS'"
+            )
+            try:
+                result_reuse_tracker.apply_history(self._execute(sql, chunk, lambda cursor: cursor.fetchall()))
+            except Exception as e:
+                print(f"DLC - Error reading query history: {str(e)}")
+                break
+        return result_reuse_tracker.stats()
+    
+    def result_reuse_stats(self, max_age_seconds: float) -> Dict[str, Dict[str, Any]]:
+        """Per-shape reuse rates, looking up query history at most every `max_age_seconds`.
+        
+        Callers that arrive while a lookup runs get the stats as they are.
+        """
+        if self._reuse_refresh_lock.acquire(blocking=False):
+            try:
+                now = time.monotonic()
+                due = self._reuse_refreshed_at is None or now - self._reuse_refreshed_at >= max_age_seconds
+                if due and result_reuse_tracker.pending_query_ids():
+                    self._reuse_refreshed_at = now
+                    return self.refresh_result_reuse_stats()
+            finally:
+                self._reuse_refresh_lock.release()
+        return result_reuse_tracker.stats()
+    
+    @staticmethod
+    def _fetch_arrow_table(cursor) -> pa.Table:
+        """Fetch all results as Arrow; the connector returns None for empty results."""
+        table = cursor.fetch_arrow_all()
+        if table is None:
+            import pyarrow as pa
+            columns = [column[0] for column in cursor.description or []]
+            table = pa.table({column: pa.array([], type=pa.null()) for column in columns})
+        return table
 
 # Global connection instance
 snowflake_db = SnowflakeConnection()
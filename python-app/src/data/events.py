@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+"""
+Data change events for Tennis Analytics.
+
+Producers (the ingestion pipeline) publish a DataChangeEvent when match data
+changes; caches and indexes built from that data subscribe and invalidate
+themselves.
+"""
+import threading
+from dataclasses import dataclass
+from typing import Callable, List, Optional, Tuple
+
+# Source of the event published when the warehouse marts are rebuilt (a dbt run)
+WAREHOUSE_SOURCE = 'dbt'
+
+@dataclass(frozen=True)
+class DataChangeEvent:
+    """Which sources, tours, years and partitions changed in one ingestion run."""
+    sources: Tuple[str, ...]
+    tours: Tuple[str, ...]
+    years: Tuple[int, ...]
+    partitions: Tuple[str, ...]
+    earliest_date: Optional[str] = None
+
+    @property
+    def is_warehouse_refresh(self) -> bool:
+        """True when the warehouse changed; local ingestion only writes Parquet until it is loaded."""
+        return WAREHOUSE_SOURCE in self.sources
+
+class EventBus:
+    """Synchronous publish/subscribe; a failing subscriber does not stop the others."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers: List[Callable[[DataChangeEvent], None]] = []
+
+    def subscribe(self, handler: Callable[[DataChangeEvent], None]):
+        with self._lock:
+            if handler not in self._subscribers:
+                self._subscribers.append(handler)
+
+    def unsubscribe(self, handler: Callable[[DataChangeEvent], None]):
+        with self._lock:
+            if handler in self._subscribers:
+                self._subscribers.remove(handler)
+
+    def publish(self, event: DataChangeEvent) -> int:
+        """Deliver the event to every subscriber; returns how many handled it."""
+        with self._lock:
+            subscribers = list(self._subscribers)
+
+        handled = 0
+        for handler in subscribers:
+            try:
+                handler(event)
+                handled += 1
+            except Exception as e:
+                print(f"EV - Subscriber {getattr(handler, '__name__', handler)} failed: {str(e)}")
+        return handled
+
+# Process-wide bus for match data changes
+data_events = EventBus()
\ No newline at end of file
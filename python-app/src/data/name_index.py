@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+"""
+Name index for fuzzy resolution of player and tournament names.
+
+Built once from the distinct names in a mart and kept in memory, so that
+user inputs like "French Open" or "roland garros" resolve to the exact
+warehouse value without a LIKE scan.
+"""
+import difflib
+import re
+import unicodedata
+from typing import Dict, Iterable, List, Optional
+
+class NameIndex:
+    """In-memory index mapping normalized names to their canonical form."""
+
+    def __init__(self, names: Iterable[str], aliases: Optional[Dict[str, str]] = None):
+        # Names are expected in priority order (most relevant first); the
+        # first canonical name seen for a normalized key wins.
+        self._canonical: Dict[str, str] = {}
+        for name in names:
+            if not name:
+                continue
+            key = self.normalize(name)
+            if key and key not in self._canonical:
+                self._canonical[key] = name
+
+        self._keys: List[str] = list(self._canonical.keys())
+        self._aliases: Dict[str, str] = {}
+        for alias, target in (aliases or {}).items():
+            target_key = self.normalize(target)
+            if target_key in self._canonical:
+                self._aliases[self.normalize(alias)] = self._canonical[target_key]
+
+    @staticmethod
+    def normalize(name: str) -> str:
+        """Lowercase, strip accents and punctuation, collapse whitespace."""
+        text = unicodedata.normalize("NFKD", str(name))
+        text = "".join(ch for ch in text if not unicodedata.combining(ch))
+        text = re.sub(r"[^a-z0-9]+", " ", text.lower())
+        return text.strip()
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __contains__(self, name: str) -> bool:
+        return self.normalize(name) in self._canonical
+
+    def names(self) -> List[str]:
+        """Return all canonical names in priority order."""
+        return list(self._canonical.values())
+
+    def match_exact(self, text: str) -> Optional[str]:
+        """Return the canonical name for an exact (normalized) name or alias match."""
+        key = self.normalize(text or "")
+        return self._canonical.get(key) or self._aliases.get(key)
+
+    def resolve(self, query: str) -> Optional[str]:
+        """Resolve a user-provided name to its canonical form, or None."""
+        if not query:
+            return None
+
+        key = self.normalize(query)
+        if not key:
+            return None
+
+        # 1. Exact and alias matches
+        exact = self.match_exact(key)
+        if exact:
+            return exact
+
+        # Too short to fuzzy-match meaningfully (e.g. "a")
+        if len(key) < 3:
+            return None
+
+        # 2. All query tokens contained in a name (e.g. "indian wells")
+        tokens = key.split()
+        for candidate in self._keys:
+            candidate_tokens = candidate.split()
+            if all(any(ct.startswith(t) for ct in candidate_tokens) for t in tokens):
+                return self._canonical[candidate]
+
+        # 3. Close spelling matches (e.g. "Wimbeldon")
+        close = difflib.get_close_matches(key, self._keys + list(self._aliases), n=1, cutoff=0.8)
+        if close:
+            return self._canonical.get(close[0]) or self._aliases.get(close[0])
+
+        return None
+
+    def suggestions(self, query: str, limit: int = 5) -> List[str]:
+        """Return canonical names that look similar to the query."""
+        key = self.normalize(query or "")
+        if not key:
+            return []
+        close = difflib.get_close_matches(key, self._keys, n=limit, cutoff=0.5)
+        return [self._canonical[match] for match in close]
\ No newline at end of file
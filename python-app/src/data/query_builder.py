@@ -0,0 +1,252 @@
+# -*- coding: utf-8 -*-
+"""
+Canonical SQL builder for Tennis Analytics.
+
+Every logical query shape renders to one stable SQL text: filters are
+ordered by column, IN lists are sorted, whitespace and keyword casing are
+fixed and LIMITs are validated literals. Identical questions therefore
+produce byte-identical SQL and bound parameters, which is what
+Snowflake's persisted result cache keys on.
+"""
+import datetime
+import threading
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+ALLOWED_OPERATORS = ('=', '>=', '<=', '>', '<', 'IN', 'LIKE', 'NOT LIKE')
+ALLOWED_PARAM_TYPES = (str, int, float, datetime.date)
+MAX_LIMIT = 10000
+MAX_PENDING_QUERY_IDS = 10000
+
+@dataclass(frozen=True)
+class CanonicalQuery:
+    """Rendered SQL text and bound parameters for one query shape."""
+    shape: str
+    sql: str
+    params: Tuple[Any, ...]
+
+@dataclass(frozen=True)
+class _Filter:
+    column: str
+    operator: str
+    placeholder: str
+    arity: int
+    any_of: Tuple[str, ...] = ()
+
+@dataclass(frozen=True)
+class _Keyset:
+    columns: Tuple[str, ...]
+    operator: str
+    placeholder: str
+
+class SelectQuery:
+    """Small typed builder for the SELECT statements used by the repositories."""
+
+    def __init__(self, shape: str, table: str, columns: List[str]):
+        self.shape = shape
+        self._table = table
+        self._columns = tuple(columns)
+        self._filters: List[Tuple[_Filter, Tuple[Any, ...]]] = []
+        self._group_by: Tuple[str, ...] = ()
+        self._order_by: Tuple[str, ...] = ()
+        self._limit: Optional[int] = None
+        self._keyset: Optional[_Keyset] = None
+        self._keyset_values: Tuple[Any, ...] = ()
+        self._having: List[Tuple[_Filter, Tuple[Any, ...]]] = []
+
+    def where(self, column: str, operator: str, value: Any, placeholder: str = "%s") -> 'SelectQuery':
+        """Add a filter. IN filters take a sequence and are order-insensitive."""
+        operator = operator.upper()
+        if operator not in ALLOWED_OPERATORS:
+            raise ValueError(f"Unsupported operator: {operator}")
+
+        if operator == 'IN':
+            values = tuple(sorted(set(value), key=str))
+            if not values:
+                raise ValueError(f"Empty IN list for {column}")
+        else:
+            values = (value,)
+
+        for item in values:
+            self._validate_param(column, item)
+
+        self._filters.append((_Filter(column, operator, placeholder, len(values)), values))
+        return self
+
+    def where_optional(self, column: str, operator: str, value: Any, placeholder: str = "%s") -> 'SelectQuery':
+        """Add a filter only when a value is given (None and '' are skipped)."""
+        if value is None or value == '':
+            return self
+        return self.where(column, operator, value, placeholder)
+
+    def where_any(self, columns: Sequence[str], operator: str, value: Any, placeholder: str = "%s") -> 'SelectQuery':
+        """Add a filter matching when any of the columns does, e.g. a player as winner or loser."""
+        operator = operator.upper()
+        if operator not in ALLOWED_OPERATORS or operator == 'IN':
+            raise ValueError(f"Unsupported operator for where_any: {operator}")
+        columns = tuple(sorted(columns))
+        for column in columns:
+            self._validate_param(column, value)
+
+        self._filters.append((_Filter(" OR ".join(columns), operator, placeholder, 1, columns), (value,) * len(columns)))
+        return self
+
+    def after(self, columns: Sequence[str], values: Sequence[Any], descending: bool = False,
+              placeholder: str = "%s") -> 'SelectQuery':
+        """Keyset pagination: rows strictly after `values` in (columns) order.
+
+        Use with an ORDER BY on the same columns in the same direction.
+        """
+        if len(columns) != len(values) or not columns:
+            raise ValueError("Keyset columns and values must be non-empty and the same length")
+        for column, value in zip(columns, values):
+            self._validate_param(column, value)
+        self._keyset = _Keyset(tuple(columns), '<' if descending else '>', placeholder)
+        self._keyset_values = tuple(values)
+        return self
+
+    def having(self, expression: str, operator: str, value: Any, placeholder: str = "%s") -> 'SelectQuery':
+        """Filter groups on an aggregate, e.g. having('COUNT(*)', '>=', 5)."""
+        operator = operator.upper()
+        if operator not in ALLOWED_OPERATORS or operator == 'IN':
+            raise ValueError(f"Unsupported operator for having: {operator}")
+        self._validate_param(expression, value)
+        self._having.append((_Filter(expression, operator, placeholder, 1), (value,)))
+        return self
+
+    def having_optional(self, expression: str, operator: str, value: Any, placeholder: str = "%s") -> 'SelectQuery':
+        """Add a group filter only when a value is given."""
+        if value is None:
+            return self
+        return self.having(expression, operator, value, placeholder)
+
+    def group_by(self, *columns: str) -> 'SelectQuery':
+        self._group_by = tuple(columns)
+        return self
+
+    def order_by(self, *expressions: str) -> 'SelectQuery':
+        self._order_by = tuple(expressions)
+        return self
+
+    def limit(self, limit: int) -> 'SelectQuery':
+        if isinstance(limit, bool) or not isinstance(limit, int) or not 0 < limit <= MAX_LIMIT:
+            raise ValueError(f"LIMIT must be an integer between 1 and {MAX_LIMIT}, got {limit!r}")
+        self._limit = limit
+        return self
+
+    @staticmethod
+    def _validate_param(column: str, value: Any):
+        if isinstance(value, bool) or not isinstance(value, ALLOWED_PARAM_TYPES):
+            raise ValueError(f"Unsupported parameter for {column}: {value!r}")
+
+    def build(self) -> CanonicalQuery:
+        """Render canonical SQL; filter order of the calls does not matter."""
+        ordered = sorted(self._filters, key=lambda item: (item[0].column, item[0].operator, repr(item[1])))
+        filters = tuple(f for f, _ in ordered)
+        params = tuple(value for _, values in ordered for value in values)
+        if self._keyset is not None:
+            # Matches the nesting rendered by _keyset_condition
+            params += tuple(value for value in self._keyset_values[:-1] for _ in range(2)) + self._keyset_values[-1:]
+        having = sorted(self._having, key=lambda item: (item[0].column, item[0].operator, repr(item[1])))
+        params += tuple(value for _, values in having for value in values)
+        sql = _render(self._table, self._columns, filters, self._keyset, self._group_by,
+                      tuple(f for f, _ in having), self._order_by, self._limit)
+        return CanonicalQuery(self.shape, sql, params)
+
+def _keyset_condition(keyset: _Keyset) -> str:
+    """(a, b, c) > (?, ?, ?) spelled out as nested comparisons."""
+    first, rest = keyset.columns[0], keyset.columns[1:]
+    condition = f"{first} {keyset.operator} {keyset.placeholder}"
+    if rest:
+        inner = _keyset_condition(_Keyset(rest, keyset.operator, keyset.placeholder))
+        condition = f"({condition} OR ({first} = {keyset.placeholder} AND {inner}))"
+    return condition
+
+@lru_cache(maxsize=256)
+def _render(table: str, columns: Tuple[str, ...], filters: Tuple[_Filter, ...], keyset: Optional[_Keyset],
+            group_by: Tuple[str, ...], having: Tuple[_Filter, ...], order_by: Tuple[str, ...],
+            limit: Optional[int]) -> str:
+    """Render (and memoize) the SQL template for a query shape."""
+    sql = f"SELECT {', '.join(columns)} FROM {table}"
+
+    conditions = []
+    for f in filters:
+        if f.any_of:
+            conditions.append("(" + " OR ".join(f"{column} {f.operator} {f.placeholder}" for column in f.any_of) + ")")
+        elif f.operator == 'IN':
+            conditions.append(f"{f.column} IN ({', '.join([f.placeholder] * f.arity)})")
+        else:
+            conditions.append(f"{f.column} {f.operator} {f.placeholder}")
+    if keyset is not None:
+        conditions.append(_keyset_condition(keyset))
+    if conditions:
+        sql += " WHERE " + " AND ".join(conditions)
+    if group_by:
+        sql += " GROUP BY " + ", ".join(group_by)
+    if having:
+        sql += " HAVING " + " AND ".join(f"{f.column} {f.operator} {f.placeholder}" for f in having)
+    if order_by:
+        sql += " ORDER BY " + ", ".join(order_by)
+    if limit is not None:
+        sql += f" LIMIT {limit}"
+    return sql
+
+class ResultReuseTracker:
+    """Tracks how often each query shape is served from Snowflake's result cache.
+
+    Query ids are recorded as queries run and later looked up in the user's
+    query history (see SnowflakeConnection.refresh_result_reuse_stats),
+    where a persisted-result hit shows up as a query that scanned no bytes.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending: Dict[str, str] = {}
+        self._executed: Dict[str, int] = {}
+        self._reused: Dict[str, int] = {}
+        self._checked: Dict[str, int] = {}
+
+    def record(self, shape: Optional[str], query_id: Optional[str]):
+        if not shape:
+            return
+        with self._lock:
+            self._executed[shape] = self._executed.get(shape, 0) + 1
+            if query_id:
+                self._pending[query_id] = shape
+                # Bound memory if history is never refreshed: drop the oldest ids
+                while len(self._pending) > MAX_PENDING_QUERY_IDS:
+                    self._pending.pop(next(iter(self._pending)))
+
+    def pending_query_ids(self) -> List[str]:
+        with self._lock:
+            return list(self._pending)
+
+    def apply_history(self, history: List[Tuple[str, int]]):
+        """Apply (query_id, bytes_scanned) rows from the query history."""
+        with self._lock:
+            for query_id, bytes_scanned in history:
+                shape = self._pending.pop(query_id, None)
+                if shape is None:
+                    continue
+                self._checked[shape] = self._checked.get(shape, 0) + 1
+                if not bytes_scanned:
+                    self._reused[shape] = self._reused.get(shape, 0) + 1
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Per-shape executions and server-side result reuse rate."""
+        with self._lock:
+            report = {}
+            for shape, executed in sorted(self._executed.items()):
+                checked = self._checked.get(shape, 0)
+                reused = self._reused.get(shape, 0)
+                report[shape] = {
+                    'executed': executed,
+                    'checked': checked,
+                    'reused': reused,
+                    'reuse_pct': round(reused / checked * 100, 1) if checked else None
+                }
+            return report
+
+# Global tracker shared by all connections
+result_reuse_tracker = ResultReuseTracker()
\ No newline at end of file
@@ -0,0 +1,216 @@
+# -*- coding: utf-8 -*-
+"""
+Query guard for Tennis Analytics.
+
+Keeps track of the warehouse queries each user session has running, so they
+can be cancelled by query id when the user moves on, and enforces a
+per-session, per-minute budget on scanned bytes and credits using the
+pre-flight estimates taken by the connection layer.
+"""
+import contextvars
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, Deque, Dict, Hashable, Iterator, List, Optional, Set, Tuple
+
+from config.settings import settings
+
+class QueryInterrupted(Exception):
+    """A query stopped by the guard rather than failed by the warehouse."""
+
+class QueryCancelled(QueryInterrupted):
+    """The session's work was cancelled (new message or page closed)."""
+
+class QueryBudgetExceeded(QueryInterrupted):
+    """A query's pre-flight estimate does not fit in the session's budget."""
+
+    def __init__(self, estimated_bytes: int, estimated_credits: float,
+                 remaining_bytes: int, remaining_credits: float, session_id: Optional[str] = None):
+        self.session_id = session_id
+        self.estimated_bytes = estimated_bytes
+        self.estimated_credits = estimated_credits
+        self.remaining_bytes = remaining_bytes
+        self.remaining_credits = remaining_credits
+        super().__init__(
+            f"Query would scan {format_bytes(estimated_bytes)} (~{estimated_credits:.4f} credits); "
+            f"{format_bytes(remaining_bytes)} and {remaining_credits:.4f} credits left this minute"
+        )
+
+class QueryScope:
+    """One unit of session work (a user message); cancelled as a whole."""
+
+    def __init__(self, session_id: str):
+        self.session_id = session_id
+        self.cancelled = False
+
+    def raise_if_cancelled(self):
+        if self.cancelled:
+            raise QueryCancelled(f"Session {self.session_id} cancelled its queries")
+
+_current_scope: contextvars.ContextVar = contextvars.ContextVar('query_scope', default=None)
+
+def current_scope() -> Optional[QueryScope]:
+    """The scope of the work running in this context, if any."""
+    return _current_scope.get()
+
+@contextmanager
+def session_scope(session_id: str) -> Iterator[QueryScope]:
+    """Run the enclosed work (and the queries it issues) on behalf of a session."""
+    scope = QueryScope(session_id)
+    query_guard.enter(scope)
+    token = _current_scope.set(scope)
+    try:
+        yield scope
+    finally:
+        _current_scope.reset(token)
+        query_guard.exit(scope)
+
+def estimate_credits(bytes_scanned: int) -> float:
+    """Rough credit cost of scanning `bytes_scanned` on the configured warehouse."""
+    seconds = bytes_scanned / settings.WAREHOUSE_SCAN_BYTES_PER_SECOND
+    return seconds / 3600 * settings.WAREHOUSE_CREDITS_PER_HOUR
+
+def format_bytes(value: int) -> str:
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if value < 1024:
+            return f"{value:.0f} {unit}" if unit == 'B' else f"{value:.1f} {unit}"
+        value /= 1024
+    return f"{value:.1f} TB"
+
+class _MinuteWindow:
+    """Bytes and credits charged to a session over the last 60 seconds."""
+
+    def __init__(self):
+        self._charges: Deque[Tuple[float, int, float]] = deque()
+
+    def totals(self, now: float) -> Tuple[int, float]:
+        while self._charges and now - self._charges[0][0] > 60:
+            self._charges.popleft()
+        return sum(c[1] for c in self._charges), sum(c[2] for c in self._charges)
+
+    def add(self, now: float, bytes_scanned: int, credits: float):
+        self._charges.append((now, bytes_scanned, credits))
+
+    def is_empty(self) -> bool:
+        return not self._charges
+
+class QueryGuard:
+    """Registry of running queries per session and their per-minute budgets."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._scopes: Dict[str, Set[QueryScope]] = {}
+        self._running: Dict[str, Tuple[Optional[QueryScope], Hashable]] = {}
+        self._interest: Dict[Hashable, Dict[str, int]] = {}
+        self._windows: Dict[str, _MinuteWindow] = {}
+        self._counters = {'cancel_requests': 0, 'queries_cancelled': 0, 'shared_not_cancelled': 0,
+                          'budget_rejections': 0}
+
+    def enter(self, scope: QueryScope):
+        with self._lock:
+            self._scopes.setdefault(scope.session_id, set()).add(scope)
+
+    def exit(self, scope: QueryScope):
+        with self._lock:
+            scopes = self._scopes.get(scope.session_id)
+            if scopes is not None:
+                scopes.discard(scope)
+                if not scopes:
+                    del self._scopes[scope.session_id]
+            # Drop budget windows once their charges have aged out
+            window = self._windows.get(scope.session_id)
+            if window is not None:
+                window.totals(time.monotonic())
+                if window.is_empty():
+                    del self._windows[scope.session_id]
+
+    def join_flight(self, key: Hashable, scope: Optional[QueryScope]):
+        """Record that a session is waiting on the (possibly shared) flight for `key`."""
+        if scope is None:
+            return
+        with self._lock:
+            sessions = self._interest.setdefault(key, {})
+            sessions[scope.session_id] = sessions.get(scope.session_id, 0) + 1
+
+    def leave_flight(self, key: Hashable, scope: Optional[QueryScope]):
+        if scope is None:
+            return
+        with self._lock:
+            sessions = self._interest.get(key, {})
+            sessions[scope.session_id] = sessions.get(scope.session_id, 1) - 1
+            if sessions[scope.session_id] <= 0:
+                del sessions[scope.session_id]
+            if not sessions:
+                self._interest.pop(key, None)
+
+    def started(self, query_id: Optional[str], key: Hashable, scope: Optional[QueryScope]):
+        if query_id:
+            with self._lock:
+                self._running[query_id] = (scope, key)
+
+    def finished(self, query_id: Optional[str]):
+        if query_id:
+            with self._lock:
+                self._running.pop(query_id, None)
+
+    def reserve(self, scope: Optional[QueryScope], estimated_bytes: int, estimated_credits: float):
+        """Charge the estimate to the session's minute budget, or raise QueryBudgetExceeded if it does not fit.
+
+        Checking and charging under one lock keeps concurrent queries of a
+        session from all passing the check and overshooting the budget.
+        """
+        if scope is None:
+            return
+        with self._lock:
+            now = time.monotonic()
+            window = self._windows.get(scope.session_id)
+            used_bytes, used_credits = window.totals(now) if window else (0, 0.0)
+            remaining_bytes = max(0, settings.SESSION_BYTES_PER_MINUTE - used_bytes)
+            remaining_credits = max(0.0, settings.SESSION_CREDITS_PER_MINUTE - used_credits)
+            over_bytes = settings.SESSION_BYTES_PER_MINUTE and estimated_bytes > remaining_bytes
+            over_credits = settings.SESSION_CREDITS_PER_MINUTE and estimated_credits > remaining_credits
+            if over_bytes or over_credits:
+                self._counters['budget_rejections'] += 1
+                raise QueryBudgetExceeded(estimated_bytes, estimated_credits, remaining_bytes, remaining_credits,
+                                          scope.session_id)
+            self._windows.setdefault(scope.session_id, _MinuteWindow()).add(now, estimated_bytes, estimated_credits)
+
+    def cancel_session(self, session_id: str) -> List[str]:
+        """Mark the session's work cancelled and return the query ids safe to cancel.
+
+        Queries whose flight is shared with other sessions keep running for
+        them; the session's own later queries are refused.
+        """
+        with self._lock:
+            self._counters['cancel_requests'] += 1
+            for scope in self._scopes.get(session_id, ()):
+                scope.cancelled = True
+            return self._cancellable(session_id, lambda scope: scope.session_id == session_id)
+
+    def cancel_scope(self, scope: QueryScope) -> List[str]:
+        """Like cancel_session, for one unit of work only (e.g. a speculated call)."""
+        with self._lock:
+            self._counters['cancel_requests'] += 1
+            scope.cancelled = True
+            return self._cancellable(scope.session_id, lambda running: running is scope)
+
+    def _cancellable(self, session_id: str, owned: Callable[[QueryScope], bool]) -> List[str]:
+        """Running query ids owned by the cancelled work and not shared with other sessions."""
+        query_ids = []
+        for query_id, (scope, key) in self._running.items():
+            if scope is None or not owned(scope):
+                continue
+            if set(self._interest.get(key, {})) - {session_id}:
+                self._counters['shared_not_cancelled'] += 1
+                continue
+            query_ids.append(query_id)
+        self._counters['queries_cancelled'] += len(query_ids)
+        return query_ids
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self._counters, running=len(self._running), active_sessions=len(self._scopes))
+
+# Process-wide guard shared by every session
+query_guard = QueryGuard()
\ No newline at end of file
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+"""
+Data refresh detection for Tennis Analytics.
+
+dbt rebuilds the marts in the warehouse without going through the ingestion
+pipeline, so no DataChangeEvent is published for it. The detector notices a
+refresh from the run results dbt writes locally (when dbt runs on this
+host) or from the marts' LAST_ALTERED timestamps in the warehouse.
+"""
+import json
+import os
+from typing import Optional, Sequence, Tuple
+
+from config.settings import settings
+from .repositories import MetadataRepository
+
+# The marts and staging models the repositories read
+WATCHED_TABLES = (
+    'FCT_PLAYER_MATCHES',
+    'FCT_PLAYER_SERVE_STATS',
+    'FCT_PLAYER_TOURNAMENT_SUMMARY',
+    'FCT_PLAYER_YEAR_LEADERBOARD',
+    'FCT_TOURNAMENT_SUMMARY',
+    'STG_ALL_MATCHES_SIMPLE',
+)
+
+class RefreshDetector:
+    """Compares a data version (dbt run time, warehouse LAST_ALTERED) between checks."""
+
+    def __init__(self, run_results_path: str, tables: Sequence[str] = WATCHED_TABLES,
+                 check_warehouse: bool = True):
+        self.run_results_path = run_results_path
+        self.tables = list(tables)
+        self.check_warehouse = check_warehouse
+        self.metadata_repo = MetadataRepository()
+        self._version: Optional[Tuple[Optional[str], Optional[str]]] = None
+        self._run_results_mtime: Optional[int] = None
+        self._run_results_version: Optional[str] = None
+
+    def _dbt_version(self) -> Optional[str]:
+        """generated_at of the last dbt run results; the file is only re-read when it changes."""
+        try:
+            mtime = os.stat(self.run_results_path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+        if mtime != self._run_results_mtime:
+            try:
+                with open(self.run_results_path, "r", encoding="utf-8") as results_file:
+                    metadata = json.load(results_file).get('metadata', {})
+                self._run_results_version = metadata.get('generated_at') or str(mtime)
+            except (OSError, ValueError) as e:
+                print(f"RD - Error reading {self.run_results_path}: {str(e)}")
+                self._run_results_version = str(mtime)
+            self._run_results_mtime = mtime
+        return self._run_results_version
+
+    def version(self) -> Tuple[Optional[str], Optional[str]]:
+        warehouse = self.metadata_repo.get_tables_last_altered(self.tables) if self.check_warehouse else None
+        return self._dbt_version(), warehouse
+
+    def check(self) -> bool:
+        """True when the data changed since the previous check; the first check sets the baseline.
+
+        A source that can't be read (None) keeps its last known value, and one
+        seen for the first time only sets its baseline.
+        """
+        current = self.version()
+        previous = self._version
+        if previous is None:
+            self._version = current
+            print(f"RD - Baseline data version {current}")
+            return False
+
+        self._version = tuple(now if now is not None else before for now, before in zip(current, previous))
+        changed = any(now is not None and before is not None and now != before
+                      for now, before in zip(current, previous))
+        if changed:
+            print(f"RD - Data refresh detected: {previous} -> {self._version}")
+        return changed
+
+def default_detector() -> RefreshDetector:
+    return RefreshDetector(settings.DBT_RUN_RESULTS_PATH, check_warehouse=settings.WARMUP_CHECK_WAREHOUSE)
\ No newline at end of file
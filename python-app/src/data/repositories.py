@@ -7,109 +7,264 @@ Created on Mon Aug 11 21:51:52 2025
 Data repositories for Tennis Analytics.
 Contains all database queries and data access logic.
 """
-import pandas as pd
-from typing import List, Dict, Any, Optional, Tuple
+from __future__ import annotations
+
+import threading
+from typing import TYPE_CHECKING, List, Dict, Any, Iterator, Optional, Tuple
 from .connections import snowflake_db
+from .name_index import NameIndex
+from .query_builder import SelectQuery
+from .query_guard import QueryInterrupted
+from .events import DataChangeEvent, data_events
 from config.settings import settings
 
+if TYPE_CHECKING:
+    import pandas as pd
+    import pyarrow as pa
+
 class PlayerRepository:
     """Repository for player-related data operations."""
     
+    # Shared across repository instances (one per session); rebuilt on invalidation
+    _name_index: Optional[NameIndex] = None
+    _name_index_lock = threading.Lock()
+    
     def __init__(self):
         self.db = snowflake_db
     
+    def get_player_name_index(self) -> NameIndex:
+        """Get the cached player name index (most active players first), loading it on first use."""
+        index = PlayerRepository._name_index
+        if index is not None:
+            return index
+        
+        with PlayerRepository._name_index_lock:
+            if PlayerRepository._name_index is None:
+                query = SelectQuery(
+                    'player_name_index', 'FCT_PLAYER_YEAR_LEADERBOARD',
+                    ['PLAYER', 'SUM(TOURNAMENTS) AS TOURNAMENT_COUNT']
+                ).group_by('PLAYER').order_by('TOURNAMENT_COUNT DESC', 'PLAYER').build()
+                try:
+                    results = self.db.execute_query(query)
+                except QueryInterrupted:
+                    raise
+                except Exception as e:
+                    print(f"DLR - Error loading player name index: {str(e)}")
+                    return NameIndex([])
+                
+                PlayerRepository._name_index = NameIndex([row[0] for row in results or []])
+                print(f"DLR - Loaded player name index ({len(PlayerRepository._name_index)} names)")
+            return PlayerRepository._name_index
+    
+    @classmethod
+    def invalidate_name_index(cls):
+        """Drop the cached player name index so it is reloaded on next use."""
+        with cls._name_index_lock:
+            cls._name_index = None
+    
     def get_player_tournament_stats(self, player_name: str, year_start: Optional[int] = None, 
                                   year_end: Optional[int] = None) -> Optional[Tuple]:
-        """Get tournament statistics for a specific player."""
-        sql = """
-        SELECT 
-            COUNT(*) as total_tournaments,
-            SUM(GAMES_WON) as total_games_won,
-            SUM(GAMES_LOST) as total_games_lost,
-            AVG(MIN_RANK) as avg_ranking,
-            MAX(MAX_POINTS) as max_points,
-            MAX(GOVERNING_BODY) as governing_body
-        FROM FCT_PLAYER_TOURNAMENT_SUMMARY 
-        WHERE PLAYER = %s
-        """
+        """Get tournament statistics for a specific player.
         
-        params = [player_name]
-        
-        if year_start:
-            sql += " AND MATCH_YEAR >= %s"
-            params.append(year_start)
-        if year_end:
-            sql += " AND MATCH_YEAR <= %s"
-            params.append(year_end)
+        Returns (tournaments, matches won/lost, sets won/lost, games won/lost,
+        tiebreaks won/lost, average ranking, max points, governing body).
+        """
+        query = SelectQuery('player_tournament_stats', 'FCT_PLAYER_TOURNAMENT_SUMMARY', [
+            'COUNT(*) AS TOTAL_TOURNAMENTS',
+            'SUM(MATCHES_WON) AS TOTAL_MATCHES_WON',
+            'SUM(MATCHES_LOST) AS TOTAL_MATCHES_LOST',
+            'SUM(SETS_WON) AS TOTAL_SETS_WON',
+            'SUM(SETS_LOST) AS TOTAL_SETS_LOST',
+            'SUM(GAMES_WON) AS TOTAL_GAMES_WON',
+            'SUM(GAMES_LOST) AS TOTAL_GAMES_LOST',
+            'SUM(TIEBREAKS_WON) AS TOTAL_TIEBREAKS_WON',
+            'SUM(TIEBREAKS_LOST) AS TOTAL_TIEBREAKS_LOST',
+            'AVG(MIN_RANK) AS AVG_RANKING',
+            'MAX(MAX_POINTS) AS MAX_POINTS',
+            'MAX(GOVERNING_BODY) AS GOVERNING_BODY'
+        ]).where('PLAYER', '=', player_name) \
+            .where_optional('MATCH_YEAR', '>=', year_start) \
+            .where_optional('MATCH_YEAR', '<=', year_end) \
+            .build()
         
-        print(f"DLR - Executing SQL: {sql}")
-        print(f"DLR - With parameters: {params}")
+        print(f"DLR - Executing SQL: {query.sql}")
+        print(f"DLR - With parameters: {query.params}")
         
         try:
-            results = self.db.execute_query(sql, params)
+            results = self.db.execute_query(query)
             return results[0] if results else None
+        except QueryInterrupted:
+            raise
         except Exception as e:
             print(f"DLR - Error getting player stats: {str(e)}")
             return None
     
+    def get_player_year_totals(self) -> Optional[pa.Table]:
+        """Get per-player, per-year tournament totals for the precomputed answer store."""
+        query = SelectQuery('player_year_totals', 'FCT_PLAYER_TOURNAMENT_SUMMARY', [
+            'PLAYER',
+            'MATCH_YEAR',
+            'COUNT(*) AS TOURNAMENTS',
+            'SUM(MATCHES_WON) AS MATCHES_WON',
+            'SUM(MATCHES_LOST) AS MATCHES_LOST',
+            'SUM(SETS_WON) AS SETS_WON',
+            'SUM(SETS_LOST) AS SETS_LOST',
+            'SUM(GAMES_WON) AS GAMES_WON',
+            'SUM(GAMES_LOST) AS GAMES_LOST',
+            'SUM(TIEBREAKS_WON) AS TIEBREAKS_WON',
+            'SUM(TIEBREAKS_LOST) AS TIEBREAKS_LOST',
+            'SUM(MIN_RANK) AS RANK_SUM',
+            'COUNT(MIN_RANK) AS RANK_COUNT',
+            'MAX(MAX_POINTS) AS MAX_POINTS',
+            'MAX(GOVERNING_BODY) AS GOVERNING_BODY'
+        ]).group_by('PLAYER', 'MATCH_YEAR').order_by('PLAYER', 'MATCH_YEAR').build()
+        
+        try:
+            return self.db.execute_query_arrow(query)
+        except QueryInterrupted:
+            raise
+        except Exception as e:
+            print(f"DLR - Error getting player year totals: {str(e)}")
+            return None
+    
     def find_similar_player_names(self, partial_name: str, limit: int = 5) -> List[str]:
         """Find players with names similar to the given partial name."""
-        sql = """
-        SELECT DISTINCT PLAYER 
-        FROM FCT_PLAYER_TOURNAMENT_SUMMARY 
-        WHERE UPPER(PLAYER) LIKE UPPER(%s)
-        LIMIT %s
-        """
-        
         search_term = f"%{partial_name.split()[0]}%"  # Search by first name
-        params = [search_term, limit]
+        query = SelectQuery('similar_player_names', 'FCT_PLAYER_YEAR_LEADERBOARD', ['PLAYER']) \
+            .where('UPPER(PLAYER)', 'LIKE', search_term, placeholder='UPPER(%s)') \
+            .group_by('PLAYER') \
+            .order_by('PLAYER') \
+            .limit(limit) \
+            .build()
         
         try:
-            results = self.db.execute_query(sql, params)
+            results = self.db.execute_query(query)
             return [row[0] for row in results] if results else []
+        except QueryInterrupted:
+            raise
         except Exception as e:
             print(f"Error finding similar players: {str(e)}")
             return []
     
-    def get_all_players(self, governing_body: str = 'All', year_start: Optional[int] = None, year_end: Optional[int] = None, limit: int = None) -> List[Tuple]:
-        """Get list of all players with their tournament counts."""
-        sql = """
-        SELECT 
-            PLAYER, 
-            COUNT(*) as tournament_count,
-            SUM(GAMES_WON + GAMES_LOST) as total_games
-        FROM FCT_PLAYER_TOURNAMENT_SUMMARY
-        """
+    def get_all_players(self, governing_body: str = 'All', year_start: Optional[int] = None,
+                        year_end: Optional[int] = None, limit: Optional[int] = None) -> pa.Table:
+        """Get the top players by tournament count from the player-year leaderboard.
         
-        params = []
-        if governing_body != 'All':
-            sql += " WHERE UPPER(GOVERNING_BODY) = UPPER(%s)"
-            params.append(governing_body)
-            if year_start:
-                sql += " AND MATCH_YEAR >= %s"
-                params.append(year_start)
-            if year_end:
-                sql += " AND MATCH_YEAR <= %s"
-                params.append(year_end)
-        
-        sql += """
-        GROUP BY PLAYER
-        ORDER BY tournament_count DESC
+        Returns an Arrow table with PLAYER, TOURNAMENT_COUNT and TOTAL_MATCHES columns.
         """
+        # Always bounded: the leaderboard is never returned in full
+        limit = min(int(limit or settings.DEFAULT_PLAYER_LIMIT), settings.MAX_PLAYER_LIMIT)
         
-        if limit:
-            sql += " LIMIT %s"
-            params.append(limit)
+        query = SelectQuery('player_leaderboard', 'FCT_PLAYER_YEAR_LEADERBOARD', [
+            'PLAYER',
+            'SUM(TOURNAMENTS) AS TOURNAMENT_COUNT',
+            'SUM(MATCHES_WON + MATCHES_LOST) AS TOTAL_MATCHES'
+        ])
+        if governing_body and governing_body != 'All':
+            # Stored lowercase; normalizing here keeps one SQL text for ATP/atp
+            query.where('GOVERNING_BODY', '=', governing_body.lower())
+        query = query.where_optional('MATCH_YEAR', '>=', year_start) \
+            .where_optional('MATCH_YEAR', '<=', year_end) \
+            .group_by('PLAYER') \
+            .order_by('TOURNAMENT_COUNT DESC', 'PLAYER') \
+            .limit(limit) \
+            .build()
+        
+        print(f"DLR - Executing SQL: {query.sql}")
+        print(f"DLR - With parameters: {query.params}")
         
         try:
-            return self.db.execute_query(sql, params)
+            return self.db.execute_query_arrow(query)
+        except QueryInterrupted:
+            raise
         except Exception as e:
             print(f"DLR - Error getting players list: {str(e)}")
-            return []
+            return None
+    
+    # Serve/return ratios re-derived from summed numerators and denominators,
+    # so rollups over several mart rows stay exact
+    SERVE_RATIOS = [
+        ('ace_pct', 'ACES', 'SERVICE_POINTS'),
+        ('double_fault_pct', 'DOUBLE_FAULTS', 'SERVICE_POINTS'),
+        ('first_serve_in_pct', 'FIRST_SERVES_IN', 'SERVICE_POINTS'),
+        ('first_serve_won_pct', 'FIRST_SERVES_WON', 'FIRST_SERVES_IN'),
+        ('second_serve_won_pct', 'SECOND_SERVES_WON', 'SECOND_SERVE_POINTS'),
+        ('break_points_saved_pct', 'BREAK_POINTS_SAVED', 'BREAK_POINTS_FACED'),
+        ('service_games_won_pct', 'SERVICE_GAMES - (BREAK_POINTS_FACED - BREAK_POINTS_SAVED)', 'SERVICE_GAMES'),
+        ('return_points_won_pct', 'RETURN_POINTS_WON', 'RETURN_POINTS'),
+        ('break_points_converted_pct', 'BREAK_POINTS_CONVERTED', 'BREAK_POINT_CHANCES'),
+        ('return_games_won_pct', 'BREAK_POINTS_CONVERTED', 'RETURN_GAMES'),
+    ]
+    
+    def get_player_serve_stats(self, player_name: str, year_start: Optional[int] = None,
+                               year_end: Optional[int] = None, surface: Optional[str] = None,
+                               by_year: bool = False, by_surface: bool = False) -> Tuple[List[str], List[Tuple]]:
+        """Get serve/return statistics for a player from the per-season mart.
+        
+        Returns the column names and the result rows, one row per requested grouping.
+        """
+        group_columns = []
+        if by_year:
+            group_columns.append('SEASON')
+        if by_surface:
+            group_columns.append('SURFACE')
+        
+        ratio_columns = [
+            f"ROUND(SUM({numerator}) / NULLIF(SUM({denominator}), 0) * 100, 1) AS {name.upper()}"
+            for name, numerator, denominator in self.SERVE_RATIOS
+        ]
+        select_columns = group_columns + [
+            'SUM(MATCHES) AS MATCHES',
+            'SUM(MATCHES_WON) AS MATCHES_WON',
+            'SUM(ACES) AS ACES',
+            'SUM(DOUBLE_FAULTS) AS DOUBLE_FAULTS',
+        ] + ratio_columns
+        
+        query = SelectQuery('player_serve_stats', 'FCT_PLAYER_SERVE_STATS', select_columns) \
+            .where('PLAYER', '=', player_name) \
+            .where_optional('SEASON', '>=', year_start) \
+            .where_optional('SEASON', '<=', year_end) \
+            .where_optional('SURFACE', '=', surface)
+        if group_columns:
+            query.group_by(*group_columns).order_by(*group_columns)
+        query = query.build()
+        
+        column_names = [column.split(' AS ')[-1].lower() for column in select_columns]
+        
+        print(f"DLR - Executing SQL: {query.sql}")
+        print(f"DLR - With parameters: {query.params}")
+        
+        try:
+            results = self.db.execute_query(query)
+            # Ungrouped aggregates always return one row; no matches means no data
+            results = [row for row in results or [] if row[len(group_columns)]]
+            return column_names, results
+        except QueryInterrupted:
+            raise
+        except Exception as e:
+            print(f"DLR - Error getting serve stats: {str(e)}")
+            return column_names, []
 
 class MatchRepository:
     """Repository for match-related data operations."""
     
+    MATCH_COLUMNS = [
+        'TOURNAMENT_NAME',
+        'TOURNAMENT_DATE',
+        'TOURNAMENT_LEVEL',
+        'WINNER_NAME',
+        'WINNER_RANK',
+        'WINNER_RANK_POINTS',
+        'LOSER_NAME',
+        'LOSER_RANK',
+        'LOSER_RANK_POINTS',
+        'ROUND_OF_MATCH',
+        'ROUND_OF_MATCH_NUMBER',
+        'SURFACE',
+        'BEST_OF',
+        'SCORE'
+    ]
+    
     def __init__(self):
         self.db = snowflake_db
     
@@ -117,70 +272,427 @@ class MatchRepository:
                                year_start: Optional[int] = None, year_end: Optional[int] = None,
                                tournament_name: Optional[str] = None, 
                                tournament_level: Optional[str] = None,
-                               surface: Optional[str] = None) -> pd.DataFrame:
-        """Get all matches between two specific players."""
-        sql = """
-        SELECT 
-            TOURNAMENT_NAME,
-            TOURNAMENT_DATE,
-            TOURNAMENT_LEVEL,
-            WINNER_NAME,
-            WINNER_RANK,
-            WINNER_RANK_POINTS,
-            LOSER_NAME,
-            LOSER_RANK,
-            LOSER_RANK_POINTS,
-            ROUND_OF_MATCH,
-            ROUND_OF_MATCH_NUMBER,
-            SURFACE,
-            BEST_OF,
-            SCORE
-        FROM STG_ALL_MATCHES_SIMPLE
-        WHERE
-            WINNER_NAME IN (%s, %s) AND
-            LOSER_NAME IN (%s, %s)
-        """
+                               surface: Optional[str] = None) -> Optional[pa.Table]:
+        """Get all matches between two specific players as an Arrow table."""
+        # IN lists are sorted by the builder, so A-vs-B and B-vs-A share one SQL text;
+        # tournament_name is expected to be the exact name resolved through the name index
+        query = SelectQuery('head_to_head_matches', 'STG_ALL_MATCHES_SIMPLE', self.MATCH_COLUMNS) \
+            .where('WINNER_NAME', 'IN', [player_one, player_two]) \
+            .where('LOSER_NAME', 'IN', [player_one, player_two]) \
+            .where_optional('YEAR(TOURNAMENT_DATE)', '>=', year_start) \
+            .where_optional('YEAR(TOURNAMENT_DATE)', '<=', year_end) \
+            .where_optional('TOURNAMENT_NAME', '=', tournament_name) \
+            .where_optional('TOURNAMENT_LEVEL', '=', tournament_level) \
+            .where_optional('SURFACE', '=', surface) \
+            .order_by('TOURNAMENT_DATE', 'ROUND_OF_MATCH_NUMBER DESC') \
+            .build()
         
-        params = [player_one, player_two, player_one, player_two]
-        
-        # Add optional filters
-        if year_start:
-            sql += " AND YEAR(TOURNAMENT_DATE) >= %s"
-            params.append(year_start)
-        if year_end:
-            sql += " AND YEAR(TOURNAMENT_DATE) <= %s"
-            params.append(year_end)
-        if tournament_name:
-            sql += " AND UPPER(TOURNAMENT_NAME) LIKE UPPER(%s)"
-            params.append(f"%{tournament_name}%")
-        if tournament_level:
-            sql += " AND TOURNAMENT_LEVEL = %s"
-            params.append(tournament_level)
-        if surface:
-            sql += " AND SURFACE = %s"
-            params.append(surface)
-        
-        print(f"DLR - Executing SQL: {sql}")
-        print(f"DLR - With parameters: {params}")
+        print(f"DLR - Executing SQL: {query.sql}")
+        print(f"DLR - With parameters: {query.params}")
         
         try:
-            return self.db.execute_query_pandas(sql, params)
+            return self.db.execute_query_arrow(query)
+        except QueryInterrupted:
+            raise
         except Exception as e:
             print(f"DLR - Error getting head-to-head matches: {str(e)}")
+            return None
+
+    # Match listings, newest first; the key is unique per match and drives keyset paging
+    LISTING_COLUMNS = [
+        'TOURNAMENT_DATE',
+        'TOURNAMENT_ID',
+        'MATCH_NUM',
+        'TOURNAMENT_NAME',
+        'TOURNAMENT_LEVEL',
+        'SURFACE',
+        'ROUND_OF_MATCH',
+        'WINNER_NAME',
+        'WINNER_RANK',
+        'LOSER_NAME',
+        'LOSER_RANK',
+        'SCORE'
+    ]
+    LISTING_KEY = ('TOURNAMENT_DATE', 'TOURNAMENT_ID', 'MATCH_NUM')
+    
+    @classmethod
+    def listing_schema(cls) -> pa.Schema:
+        """Arrow schema of LISTING_COLUMNS, for exports that return no rows."""
+        import pyarrow as pa
+        types = {'TOURNAMENT_DATE': pa.date32(), 'MATCH_NUM': pa.int64(),
+                 'WINNER_RANK': pa.int64(), 'LOSER_RANK': pa.int64()}
+        return pa.schema([(column, types.get(column, pa.string())) for column in cls.LISTING_COLUMNS])
+    
+    def _player_matches_query(self, shape: str, player_name: str, opponent: Optional[str] = None,
+                              year_start: Optional[int] = None, year_end: Optional[int] = None,
+                              surface: Optional[str] = None) -> SelectQuery:
+        query = SelectQuery(shape, 'STG_ALL_MATCHES_SIMPLE', self.LISTING_COLUMNS)
+        if opponent:
+            query.where('WINNER_NAME', 'IN', [player_name, opponent]) \
+                .where('LOSER_NAME', 'IN', [player_name, opponent])
+        else:
+            query.where_any(['WINNER_NAME', 'LOSER_NAME'], '=', player_name)
+        return query.where_optional('YEAR(TOURNAMENT_DATE)', '>=', year_start) \
+            .where_optional('YEAR(TOURNAMENT_DATE)', '<=', year_end) \
+            .where_optional('SURFACE', '=', surface) \
+            .order_by(*(f"{column} DESC" for column in self.LISTING_KEY))
+    
+    def get_player_matches_page(self, player_name: str, opponent: Optional[str] = None,
+                                year_start: Optional[int] = None, year_end: Optional[int] = None,
+                                surface: Optional[str] = None, after: Optional[Tuple] = None,
+                                limit: int = 50) -> Optional[pa.Table]:
+        """Get up to `limit` of a player's matches, newest first, strictly after the `after` key.
+        
+        `after` is the LISTING_KEY values of the last row of the previous page; the
+        warehouse seeks past it instead of scanning and discarding an OFFSET.
+        """
+        query = self._player_matches_query('player_matches_page', player_name, opponent,
+                                           year_start, year_end, surface)
+        if after is not None:
+            query.after(self.LISTING_KEY, after, descending=True)
+        query = query.limit(limit).build()
+        
+        try:
+            return self.db.execute_query_arrow(query)
+        except QueryInterrupted:
+            raise
+        except Exception as e:
+            print(f"DLR - Error getting player matches page: {str(e)}")
+            return None
+    
+    def iter_player_matches(self, player_name: str, opponent: Optional[str] = None,
+                            year_start: Optional[int] = None, year_end: Optional[int] = None,
+                            surface: Optional[str] = None, arrow: bool = False) -> Iterator[Any]:
+        """Stream a player's full match listing as DataFrame (or Arrow) batches for export.
+        
+        Errors are raised rather than swallowed, since part of the output may already be written.
+        """
+        query = self._player_matches_query('player_matches_export', player_name, opponent,
+                                           year_start, year_end, surface).build()
+        if arrow:
+            return self.db.iter_query_arrow_batches(query)
+        return self.db.iter_query_pandas_batches(query)
+
+    # Player-vs-field groupings over FCT_PLAYER_MATCHES (one row per player per match):
+    # the grouped column, plus the column giving its natural order when it has one
+    FIELD_GROUPS = {
+        'opponent': ('OPPONENT', None),
+        'opponent_rank': ('OPPONENT_RANK_BUCKET', 'OPPONENT_RANK_BUCKET_ORDER'),
+        'surface': ('SURFACE', None),
+        'round': ('ROUND_OF_MATCH', 'ROUND_OF_MATCH_NUMBER'),
+        'tournament_level': ('TOURNAMENT_LEVEL', None),
+        'year': ('MATCH_YEAR', 'MATCH_YEAR'),
+    }
+    # One group per distinct opponent; every other grouping has a few dozen groups at most
+    OPEN_FIELD_GROUPS = ('opponent',)
+    FIELD_SORTS = {
+        'matches': 'MATCHES DESC',
+        'wins': 'WINS DESC',
+        'losses': 'LOSSES DESC',
+        'win_pct': 'WIN_PCT DESC',
+    }
+    
+    def get_player_vs_field(self, player_name: str, group_by: str = 'opponent',
+                            year_start: Optional[int] = None, year_end: Optional[int] = None,
+                            surface: Optional[str] = None, tournament_level: Optional[str] = None,
+                            max_opponent_rank: Optional[int] = None, min_matches: Optional[int] = None,
+                            sort_by: Optional[str] = None, limit: Optional[int] = None) -> Optional[pa.Table]:
+        """A player's record against the field, grouped by opponent, rank bucket, surface, round, level or year.
+        
+        One grouped query returns GROUP_VALUE, MATCHES, WINS, LOSSES, WIN_PCT,
+        FIRST_MATCH and LAST_MATCH per group, plus TOTAL_MATCHES, TOTAL_WINS and
+        GROUPS over every group that passes `min_matches` (before the limit).
+        Without `sort_by`, ordered groupings (rank bucket, round, year) keep their
+        natural order and the others are sorted by matches.
+        """
+        column, natural_order = self.FIELD_GROUPS[group_by]
+        group_columns = [column] + ([natural_order] if natural_order and natural_order != column else [])
+        if sort_by:
+            order = [self.FIELD_SORTS[sort_by], 'MATCHES DESC']
+        elif natural_order:
+            order = [natural_order + (' DESC' if group_by == 'round' else '')]
+        else:
+            order = ['MATCHES DESC']
+        
+        query = SelectQuery(f'player_vs_field_{group_by}', 'FCT_PLAYER_MATCHES', [
+            f'{column} AS GROUP_VALUE',
+            'COUNT(*) AS MATCHES',
+            'SUM(WON) AS WINS',
+            'COUNT(*) - SUM(WON) AS LOSSES',
+            'ROUND(100 * SUM(WON) / COUNT(*), 1) AS WIN_PCT',
+            'MIN(TOURNAMENT_DATE) AS FIRST_MATCH',
+            'MAX(TOURNAMENT_DATE) AS LAST_MATCH',
+            # Window totals are computed after HAVING and before LIMIT
+            'SUM(COUNT(*)) OVER () AS TOTAL_MATCHES',
+            'SUM(SUM(WON)) OVER () AS TOTAL_WINS',
+            'COUNT(*) OVER () AS GROUPS'
+        ]).where('PLAYER', '=', player_name) \
+            .where_optional('MATCH_YEAR', '>=', year_start) \
+            .where_optional('MATCH_YEAR', '<=', year_end) \
+            .where_optional('SURFACE', '=', surface) \
+            .where_optional('TOURNAMENT_LEVEL', '=', tournament_level) \
+            .where_optional('OPPONENT_RANK', '<=', max_opponent_rank) \
+            .group_by(*group_columns) \
+            .having_optional('COUNT(*)', '>=', min_matches) \
+            .order_by(*order, 'GROUP_VALUE')
+        if limit:
+            query.limit(limit)
+        query = query.build()
+        
+        print(f"DLR - Executing SQL: {query.sql}")
+        print(f"DLR - With parameters: {query.params}")
+        
+        try:
+            return self.db.execute_query_arrow(query)
+        except QueryInterrupted:
+            raise
+        except Exception as e:
+            print(f"DLR - Error getting player vs field: {str(e)}")
+            return None
+    
+    def get_rivalry_network(self, players: List[str], year_start: Optional[int] = None,
+                            year_end: Optional[int] = None, surface: Optional[str] = None,
+                            tournament_level: Optional[str] = None) -> Optional[pa.Table]:
+        """Head-to-head records among a set of players in one grouped query.
+        
+        Returns PLAYER, OPPONENT, MATCHES, WINS and LAST_MATCH for every pair that
+        met, once from each side.
+        """
+        query = SelectQuery('rivalry_network', 'FCT_PLAYER_MATCHES', [
+            'PLAYER',
+            'OPPONENT',
+            'COUNT(*) AS MATCHES',
+            'SUM(WON) AS WINS',
+            'MAX(TOURNAMENT_DATE) AS LAST_MATCH'
+        ]).where('PLAYER', 'IN', players) \
+            .where('OPPONENT', 'IN', players) \
+            .where_optional('MATCH_YEAR', '>=', year_start) \
+            .where_optional('MATCH_YEAR', '<=', year_end) \
+            .where_optional('SURFACE', '=', surface) \
+            .where_optional('TOURNAMENT_LEVEL', '=', tournament_level) \
+            .group_by('PLAYER', 'OPPONENT') \
+            .order_by('MATCHES DESC', 'PLAYER', 'OPPONENT') \
+            .build()
+        
+        print(f"DLR - Executing SQL: {query.sql}")
+        print(f"DLR - With parameters: {query.params}")
+        
+        try:
+            return self.db.execute_query_arrow(query)
+        except QueryInterrupted:
+            raise
+        except Exception as e:
+            print(f"DLR - Error getting rivalry network: {str(e)}")
+            return None
+    
+    def get_matches_for_ratings(self, since_date: Optional[str] = None) -> pd.DataFrame:
+        """Get completed matches in processing order for the rating engine, from `since_date` on."""
+        # Earlier rounds first within a tournament week
+        query = SelectQuery('rating_matches', 'STG_ALL_MATCHES_SIMPLE', [
+            'TOURNAMENT_DATE',
+            'GOVERNING_BODY',
+            'TOURNAMENT_ID',
+            'MATCH_NUM',
+            'ROUND_OF_MATCH_NUMBER',
+            'WINNER_ID',
+            'WINNER_NAME',
+            'LOSER_ID',
+            'LOSER_NAME',
+            'SURFACE'
+        ]).where("COALESCE(SCORE, '')", 'NOT LIKE', '%W/O%') \
+            .where_optional('TOURNAMENT_DATE', '>=', since_date) \
+            .order_by('TOURNAMENT_DATE', 'ROUND_OF_MATCH_NUMBER DESC', 'GOVERNING_BODY', 'TOURNAMENT_ID', 'MATCH_NUM') \
+            .build()
+        
+        try:
+            return self.db.execute_query_pandas(query)
+        except QueryInterrupted:
+            raise
+        except Exception as e:
+            print(f"DLR - Error getting matches for ratings: {str(e)}")
+            import pandas as pd
             return pd.DataFrame()
+    
+    def get_rating_matches_fingerprint(self, before_date: str) -> Optional[str]:
+        """Count and hash of the rating matches dated before `before_date`.
+        
+        A change means earlier matches were added or corrected after they were rated.
+        """
+        query = SelectQuery('rating_matches_fingerprint', 'STG_ALL_MATCHES_SIMPLE', [
+            'COUNT(*) AS MATCHES',
+            'HASH_AGG(GOVERNING_BODY, TOURNAMENT_ID, MATCH_NUM, TOURNAMENT_DATE, ROUND_OF_MATCH_NUMBER, '
+            'WINNER_ID, WINNER_NAME, LOSER_ID, LOSER_NAME, SURFACE) AS CHECKSUM'
+        ]).where("COALESCE(SCORE, '')", 'NOT LIKE', '%W/O%') \
+            .where('TOURNAMENT_DATE', '<', before_date) \
+            .build()
+        
+        try:
+            rows = self.db.execute_query(query)
+            return f"{rows[0][0]}:{rows[0][1]}" if rows else None
+        except QueryInterrupted:
+            raise
+        except Exception as e:
+            print(f"DLR - Error getting rating matches fingerprint: {str(e)}")
+            return None
 
 class TournamentRepository:
     """Repository for tournament-related data operations."""
     
+    # Common names users type that differ from the warehouse tournament names
+    TOURNAMENT_ALIASES = {
+        'French Open': 'Roland Garros',
+        'Roland-Garros': 'Roland Garros',
+        'The Championships': 'Wimbledon',
+        'US Open Championships': 'US Open',
+        'Australian Championships': 'Australian Open',
+        'Indian Wells': 'Indian Wells Masters',
+        'BNP Paribas Open': 'Indian Wells Masters',
+        'Miami Open': 'Miami Masters',
+        'Italian Open': 'Rome Masters',
+        'Internazionali BNL': 'Rome Masters',
+        'Madrid Open': 'Madrid Masters',
+        'Monte Carlo': 'Monte Carlo Masters',
+        'Canadian Open': 'Canada Masters',
+        'Rogers Cup': 'Canada Masters',
+        'Cincinnati Open': 'Cincinnati Masters',
+        'Western & Southern Open': 'Cincinnati Masters',
+        'Shanghai Open': 'Shanghai Masters',
+        'ATP Finals': 'Tour Finals',
+        'WTA Finals': 'Tour Finals',
+    }
+    
+    # Shared across repository instances (one per session); rebuilt on invalidation
+    _name_index: Optional[NameIndex] = None
+    _name_index_lock = threading.Lock()
+    
     def __init__(self):
         self.db = snowflake_db
     
-    def get_tournament_stats(self, tournament_name: str, year: Optional[int] = None) -> List[Tuple]:
-        """Get statistics for a specific tournament."""
-        # This method can be implemented when tournament analysis is needed
-        pass
+    def get_tournament_name_index(self) -> NameIndex:
+        """Get the cached tournament name index, loading it on first use."""
+        index = TournamentRepository._name_index
+        if index is not None:
+            return index
+        
+        with TournamentRepository._name_index_lock:
+            if TournamentRepository._name_index is None:
+                query = SelectQuery(
+                    'tournament_name_index', 'FCT_TOURNAMENT_SUMMARY',
+                    ['TOURNAMENT_NAME', 'COUNT(*) AS EDITIONS']
+                ).group_by('TOURNAMENT_NAME').order_by('EDITIONS DESC', 'TOURNAMENT_NAME').build()
+                try:
+                    results = self.db.execute_query(query)
+                except QueryInterrupted:
+                    raise
+                except Exception as e:
+                    print(f"DLR - Error loading tournament name index: {str(e)}")
+                    return NameIndex([])
+                
+                TournamentRepository._name_index = NameIndex(
+                    [row[0] for row in results or []], self.TOURNAMENT_ALIASES
+                )
+                print(f"DLR - Loaded tournament name index ({len(TournamentRepository._name_index)} names)")
+            return TournamentRepository._name_index
+    
+    @classmethod
+    def invalidate_name_index(cls):
+        """Drop the cached tournament name index so it is reloaded on next use."""
+        with cls._name_index_lock:
+            cls._name_index = None
+    
+    def resolve_tournament_name(self, tournament_name: str) -> Optional[str]:
+        """Resolve user input such as 'French Open' to the warehouse tournament name."""
+        return self.get_tournament_name_index().resolve(tournament_name)
+    
+    def get_tournament_stats(self, tournament_name: str, year: Optional[int] = None,
+                             governing_body: Optional[str] = None) -> List[Tuple]:
+        """Get edition summaries for a specific tournament (exact, resolved name)."""
+        query = SelectQuery('tournament_editions', 'FCT_TOURNAMENT_SUMMARY', [
+            'TOURNAMENT_NAME',
+            'MATCH_YEAR',
+            'GOVERNING_BODY',
+            'TOURNAMENT_LEVEL',
+            'SURFACE',
+            'DRAW_SIZE',
+            'CHAMPION',
+            'CHAMPION_SEED',
+            'FINALIST',
+            'FINALIST_SEED',
+            'FINAL_SCORE',
+            'TOTAL_MATCHES',
+            'UPSETS',
+            'UPSET_PCT',
+            'AVG_MATCH_MINUTES',
+            'SEEDS_ENTERED',
+            'SEEDS_REACHED_QF',
+            'SEEDS_REACHED_SF',
+            'TOP_SEED',
+            'TOP_SEED_BEST_ROUND'
+        ]).where('TOURNAMENT_NAME', '=', tournament_name) \
+            .where_optional('MATCH_YEAR', '=', year)
+        if governing_body and governing_body != 'All':
+            query.where('GOVERNING_BODY', '=', governing_body.lower())
+        query = query.order_by('MATCH_YEAR DESC', 'GOVERNING_BODY').build()
+        
+        print(f"DLR - Executing SQL: {query.sql}")
+        print(f"DLR - With parameters: {query.params}")
+        
+        try:
+            return self.db.execute_query(query)
+        except QueryInterrupted:
+            raise
+        except Exception as e:
+            print(f"DLR - Error getting tournament stats: {str(e)}")
+            return []
     
     def get_available_tournaments(self, year: Optional[int] = None) -> List[str]:
         """Get list of available tournaments."""
-        # This method can be implemented when tournament listing is needed
-        pass
\ No newline at end of file
+        if not year:
+            return self.get_tournament_name_index().names()
+        
+        query = SelectQuery('tournaments_by_year', 'FCT_TOURNAMENT_SUMMARY', ['TOURNAMENT_NAME']) \
+            .where('MATCH_YEAR', '=', year) \
+            .group_by('TOURNAMENT_NAME') \
+            .order_by('TOURNAMENT_NAME') \
+            .build()
+        
+        try:
+            results = self.db.execute_query(query)
+            return [row[0] for row in results] if results else []
+        except QueryInterrupted:
+            raise
+        except Exception as e:
+            print(f"DLR - Error getting tournaments list: {str(e)}")
+            return []
+
+class MetadataRepository:
+    """Repository for warehouse metadata (not match data)."""
+    
+    def __init__(self):
+        self.db = snowflake_db
+    
+    def get_tables_last_altered(self, tables: List[str]) -> Optional[str]:
+        """Latest LAST_ALTERED among the given tables in the app's schema, as text."""
+        query = SelectQuery('tables_last_altered', 'INFORMATION_SCHEMA.TABLES', ['MAX(LAST_ALTERED) AS LAST_ALTERED']) \
+            .where('TABLE_SCHEMA', '=', (settings.SNOWFLAKE_SCHEMA or '').upper()) \
+            .where('TABLE_NAME', 'IN', tables) \
+            .build()
+        
+        try:
+            rows = self.db.execute_query(query)
+            return str(rows[0][0]) if rows and rows[0][0] is not None else None
+        except QueryInterrupted:
+            raise
+        except Exception as e:
+            print(f"DLR - Error getting table timestamps: {str(e)}")
+            return None
+
+def _invalidate_name_indexes(event: DataChangeEvent):
+    """New or corrected matches can add players and tournaments; the indexes are read from the warehouse."""
+    if not event.is_warehouse_refresh:
+        return
+    PlayerRepository.invalidate_name_index()
+    TournamentRepository.invalidate_name_index()
+    print("DLR - Name indexes invalidated after a warehouse refresh")
+
+data_events.subscribe(_invalidate_name_indexes)
\ No newline at end of file
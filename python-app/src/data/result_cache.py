@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+"""
+Result cache for Tennis Analytics.
+
+A small thread-safe LRU of recent tool results with a time-to-live. It lets
+the agent fall back to a previous answer when a live query is over budget,
+and is cleared when the underlying data is refreshed.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+from config.settings import settings
+from .events import data_events
+
+class ResultCache:
+    """Thread-safe LRU cache with per-entry expiry."""
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._entries: 'OrderedDict[Hashable, Tuple[float, Any]]' = OrderedDict()
+        self._hits = 0
+        self._misses = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return the cached value, or None if missing or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time.monotonic() - entry[0] > self.ttl_seconds:
+                self._entries.pop(key, None)
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return entry[1]
+
+    def put(self, key: Hashable, value: Any):
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                'entries': len(self._entries),
+                'hits': self._hits,
+                'misses': self._misses,
+                'hit_rate_pct': round(self._hits / lookups * 100, 1) if lookups else 0.0
+            }
+
+# Recent agent tool results, shared by every session
+tool_result_cache = ResultCache(settings.TOOL_RESULT_CACHE_SIZE, settings.TOOL_RESULT_CACHE_TTL_SECONDS)
+data_events.subscribe(lambda event: tool_result_cache.clear())
\ No newline at end of file
@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+"""
+Request coalescing (single-flight) for Tennis Analytics.
+
+Concurrent callers asking for the same key share one in-flight execution
+and its result, so warehouse load grows with distinct questions rather
+than with the number of sessions asking them.
+"""
+import json
+import re
+import threading
+from typing import Any, Callable, Dict, Hashable, Optional
+
+class _Flight:
+    """A single in-flight call and the callers waiting on it."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.waiters = 0
+
+class SingleFlight:
+    """Coalesces concurrent calls with the same key into one execution."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._flights: Dict[Hashable, _Flight] = {}
+        self._executed = 0
+        self._coalesced = 0
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        """Run `fn` unless a call with the same key is already in flight, then share its result."""
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None:
+                flight.waiters += 1
+                self._coalesced += 1
+                leader = False
+            else:
+                flight = _Flight()
+                self._flights[key] = flight
+                self._executed += 1
+                leader = True
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            flight.result = fn()
+            return flight.result
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            # Later callers start a fresh execution; only concurrent ones share
+            with self._lock:
+                self._flights.pop(key, None)
+            flight.done.set()
+
+    def in_flight(self) -> int:
+        """Number of distinct keys currently executing."""
+        with self._lock:
+            return len(self._flights)
+
+    def stats(self) -> Dict[str, Any]:
+        """Executed vs coalesced call counts."""
+        with self._lock:
+            total = self._executed + self._coalesced
+            return {
+                'name': self.name,
+                'executed': self._executed,
+                'coalesced': self._coalesced,
+                'in_flight': len(self._flights),
+                'coalesced_pct': round(self._coalesced / total * 100, 1) if total else 0.0
+            }
+
+def normalize_sql(query: str) -> str:
+    """Collapse whitespace so formatting differences map to the same key."""
+    return re.sub(r"\s+", " ", query).strip()
+
+def query_key(kind: str, query: str, params: Optional[list] = None) -> Hashable:
+    """Coalescing key for a SQL query and its bound parameters."""
+    return (kind, normalize_sql(query), tuple(params or ()))
+
+def call_key(function_name: str, parameters: Optional[Dict[str, Any]] = None) -> Hashable:
+    """Coalescing key for a tool invocation, ignoring argument order and unset arguments."""
+    cleaned = {name: value for name, value in (parameters or {}).items() if value is not None}
+    return (function_name, json.dumps(cleaned, sort_keys=True, default=str))
+
+# Process-wide flight groups, shared by every Streamlit session
+query_flights = SingleFlight("warehouse_queries")
+tool_flights = SingleFlight("agent_tools")
\ No newline at end of file
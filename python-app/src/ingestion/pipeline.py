@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+"""
+Local file-drop ingestion for Tennis Analytics.
+
+Stands in for the GCS -> Pub/Sub -> Snowpipe path: a watched directory plays
+the bucket, polling plays the notification. New or changed Sackmann files are
+parsed in a process pool into (tour, year)-partitioned Parquet, a manifest of
+content hashes skips unchanged files, and a DataChangeEvent tells downstream
+caches and indexes what changed.
+
+    python -m src.ingestion.pipeline --once
+"""
+import argparse
+import datetime
+import json
+import multiprocessing
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Dict, List, Optional
+
+# Add the project root to the Python path when run as a script
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from config.settings import settings
+from src.data.events import DataChangeEvent, data_events
+from src.ingestion.sackmann import SOURCE_PATTERN, ingest_file
+
+MANIFEST_NAME = "_manifest.json"
+
+class IngestionService:
+    """Watches a directory and ingests new or changed match files."""
+
+    def __init__(self, watch_dir: str, output_dir: str, workers: Optional[int] = None):
+        self.watch_dir = watch_dir
+        self.output_dir = output_dir
+        self.workers = workers or os.cpu_count() or 1
+        self.manifest_path = os.path.join(output_dir, MANIFEST_NAME)
+        self.manifest: Dict[str, Dict[str, Any]] = self._load_manifest()
+
+    def _load_manifest(self) -> Dict[str, Dict[str, Any]]:
+        if not os.path.exists(self.manifest_path):
+            return {}
+        with open(self.manifest_path, "r", encoding="utf-8") as manifest_file:
+            return json.load(manifest_file).get('sources', {})
+
+    def _save_manifest(self):
+        os.makedirs(self.output_dir, exist_ok=True)
+        temporary = f"{self.manifest_path}.tmp"
+        with open(temporary, "w", encoding="utf-8") as manifest_file:
+            json.dump({'sources': self.manifest}, manifest_file, indent=2, sort_keys=True)
+        os.replace(temporary, self.manifest_path)
+
+    def pending_files(self) -> List[str]:
+        """Source files whose size or modification time differ from the manifest."""
+        if not os.path.isdir(self.watch_dir):
+            return []
+
+        pending = []
+        for name in sorted(os.listdir(self.watch_dir)):
+            if not SOURCE_PATTERN.match(name):
+                continue
+            stat = os.stat(os.path.join(self.watch_dir, name))
+            known = self.manifest.get(name)
+            if known and known['size'] == stat.st_size and known['mtime_ns'] == stat.st_mtime_ns:
+                continue
+            pending.append(name)
+        return pending
+
+    def run_once(self) -> Optional[DataChangeEvent]:
+        """Ingest pending files in parallel; returns the published event, if anything changed."""
+        pending = self.pending_files()
+        removed = [name for name in self.manifest if not os.path.exists(os.path.join(self.watch_dir, name))]
+        if not pending and not removed:
+            return None
+
+        started = time.perf_counter()
+        changed: Dict[str, Dict[str, Any]] = {}
+        stale_partitions: List[str] = []
+
+        if pending:
+            # Spawned workers: safe to start from a threaded process such as the app
+            with ProcessPoolExecutor(max_workers=min(self.workers, len(pending)),
+                                     mp_context=multiprocessing.get_context('spawn')) as pool:
+                futures = {
+                    pool.submit(ingest_file, os.path.join(self.watch_dir, name), self.output_dir,
+                                self.manifest.get(name, {}).get('sha256')): name
+                    for name in pending
+                }
+                for future in as_completed(futures):
+                    name = futures[future]
+                    try:
+                        entry = future.result()
+                    except Exception as e:
+                        # Left out of the manifest, so it is retried on the next scan
+                        print(f"ING - Failed to ingest {name}: {str(e)}")
+                        continue
+
+                    previous = self.manifest.get(name, {})
+                    if entry.pop('unchanged'):
+                        # Touched but identical: remember the new mtime, nothing to publish
+                        self.manifest[name] = dict(previous, size=entry['size'], mtime_ns=entry['mtime_ns'])
+                        continue
+
+                    entry['ingested_at'] = datetime.datetime.now().isoformat(timespec='seconds')
+                    stale_partitions += [p for p in previous.get('partitions', []) if p not in entry['partitions']]
+                    self.manifest[name] = entry
+                    changed[name] = entry
+
+        for name in removed:
+            entry = self.manifest.pop(name)
+            stale_partitions += entry.get('partitions', [])
+            changed[name] = dict(entry, partitions=[])
+
+        for relative in stale_partitions:
+            path = os.path.join(self.output_dir, relative)
+            if os.path.exists(path):
+                os.remove(path)
+        self._save_manifest()
+
+        if not changed:
+            return None
+
+        event = self._build_event(changed, stale_partitions)
+        print(f"ING - Ingested {len(changed)} files ({len(event.partitions)} partitions) "
+              f"in {time.perf_counter() - started:.1f}s")
+        data_events.publish(event)
+        return event
+
+    @staticmethod
+    def _build_event(changed: Dict[str, Dict[str, Any]], stale_partitions: List[str]) -> DataChangeEvent:
+        partitions = sorted({p for entry in changed.values() for p in entry.get('partitions', [])} |
+                            set(stale_partitions))
+        years = sorted({int(os.path.dirname(p).split("match_year=")[-1]) for p in partitions})
+        tours = sorted({SOURCE_PATTERN.match(name).group(1) for name in changed})
+        dates = [entry['min_date'] for entry in changed.values() if entry.get('min_date')]
+        return DataChangeEvent(
+            sources=tuple(sorted(changed)),
+            tours=tuple(tours),
+            years=tuple(years),
+            partitions=tuple(partitions),
+            earliest_date=min(dates) if dates else None
+        )
+
+    def run_forever(self, poll_seconds: float):
+        """Poll the watch directory until interrupted."""
+        print(f"ING - Watching {self.watch_dir} every {poll_seconds:.0f}s")
+        while True:
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"ING - Ingestion run failed: {str(e)}")
+            time.sleep(poll_seconds)
+
+_watcher: Optional[threading.Thread] = None
+_watcher_lock = threading.Lock()
+
+def start_watcher() -> threading.Thread:
+    """Start the watcher in a background thread of this process (once).
+    
+    Running in the app's process means its events reach the app's caches.
+    """
+    global _watcher
+    with _watcher_lock:
+        if _watcher is None:
+            service = IngestionService(settings.INGEST_WATCH_DIR, settings.INGEST_OUTPUT_DIR, settings.INGEST_WORKERS)
+            _watcher = threading.Thread(
+                target=service.run_forever, args=(settings.INGEST_POLL_SECONDS,),
+                name="ingestion-watcher", daemon=True
+            )
+            _watcher.start()
+        return _watcher
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingest Sackmann match files into partitioned Parquet")
+    parser.add_argument('--watch-dir', default=settings.INGEST_WATCH_DIR)
+    parser.add_argument('--output-dir', default=settings.INGEST_OUTPUT_DIR)
+    parser.add_argument('--workers', type=int, default=settings.INGEST_WORKERS)
+    parser.add_argument('--once', action='store_true', help="Ingest pending files and exit")
+    args = parser.parse_args()
+
+    service = IngestionService(args.watch_dir, args.output_dir, args.workers)
+    if args.once:
+        service.run_once()
+    else:
+        service.run_forever(settings.INGEST_POLL_SECONDS)
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+"""
+Parsing of Sackmann `atp_matches_*.csv` / `wta_matches_*.csv` files.
+
+Files are read with Arrow's multithreaded CSV reader and mapped to the same
+columns as the dbt `stg_atp_matches` / `stg_wta_matches` models, then written
+as Parquet parts partitioned by tour and year. Everything here runs inside
+ingestion worker processes, so it depends on pyarrow only.
+"""
+import hashlib
+import os
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pv
+import pyarrow.parquet as pq
+
+SOURCE_PATTERN = re.compile(r"^(atp|wta)_matches_(\d{4})\.csv$")
+
+# (CSV column, staging column, type), in stg_atp_matches order
+COLUMN_MAPPING: List[Tuple[str, str, pa.DataType]] = [
+    ('tourney_id', 'tournament_id', pa.string()),
+    ('tourney_name', 'tournament_name', pa.string()),
+    ('surface', 'surface', pa.string()),
+    ('draw_size', 'draw_size', pa.int64()),
+    ('tourney_level', 'tournament_level', pa.string()),
+    ('tourney_date', 'tournament_date', pa.string()),
+    ('match_num', 'match_num', pa.int64()),
+    ('winner_id', 'winner_id', pa.int64()),
+    ('winner_seed', 'winner_seed', pa.string()),
+    ('winner_entry', 'winner_entry', pa.string()),
+    ('winner_name', 'winner_name', pa.string()),
+    ('winner_hand', 'winner_hand', pa.string()),
+    ('winner_ht', 'winner_height', pa.float64()),
+    ('winner_ioc', 'winner_ioc', pa.string()),
+    ('winner_age', 'winner_age', pa.float64()),
+    ('loser_id', 'loser_id', pa.int64()),
+    ('loser_seed', 'loser_seed', pa.string()),
+    ('loser_entry', 'loser_entry', pa.string()),
+    ('loser_name', 'loser_name', pa.string()),
+    ('loser_hand', 'loser_hand', pa.string()),
+    ('loser_ht', 'loser_height', pa.float64()),
+    ('loser_ioc', 'loser_ioc', pa.string()),
+    ('loser_age', 'loser_age', pa.float64()),
+    ('score', 'score', pa.string()),
+    ('best_of', 'best_of', pa.int64()),
+    ('round', 'round_of_match', pa.string()),
+    ('minutes', 'minutes', pa.float64()),
+    ('w_ace', 'winner_ace', pa.float64()),
+    ('w_df', 'winner_double_faults', pa.float64()),
+    ('w_svpt', 'winner_service_points', pa.float64()),
+    ('w_1stIn', 'winner_1st_serves', pa.float64()),
+    ('w_1stWon', 'winner_1st_serves_won', pa.float64()),
+    ('w_2ndWon', 'winner_2nd_serves_won', pa.float64()),
+    ('w_SvGms', 'winner_serve_games', pa.float64()),
+    ('w_bpSaved', 'winner_break_points_saved', pa.float64()),
+    ('w_bpFaced', 'winner_break_points_faced', pa.float64()),
+    ('l_ace', 'loser_ace', pa.float64()),
+    ('l_df', 'loser_double_faults', pa.float64()),
+    ('l_svpt', 'loser_service_points', pa.float64()),
+    ('l_1stIn', 'loser_1st_serves', pa.float64()),
+    ('l_1stWon', 'loser_1st_serves_won', pa.float64()),
+    ('l_2ndWon', 'loser_2nd_serves_won', pa.float64()),
+    ('l_SvGms', 'loser_serve_games', pa.float64()),
+    ('l_bpSaved', 'loser_break_points_saved', pa.float64()),
+    ('l_bpFaced', 'loser_break_points_faced', pa.float64()),
+    ('winner_rank', 'winner_rank', pa.float64()),
+    ('winner_rank_points', 'winner_rank_points', pa.float64()),
+    ('loser_rank', 'loser_rank', pa.float64()),
+    ('loser_rank_points', 'loser_rank_points', pa.float64()),
+]
+
+ROUND_NUMBERS = {'F': 2, 'SF': 4, 'QF': 8, 'R16': 16, 'R32': 32, 'R64': 64, 'R128': 128}
+OTHER_ROUND_NUMBER = 130
+
+def file_sha256(path: str) -> str:
+    """Content hash of a file, read in 1 MB chunks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as source:
+        for chunk in iter(lambda: source.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def read_matches_csv(path: str, tour: str) -> pa.Table:
+    """Read a Sackmann matches file into the staging model's columns and types."""
+    with open(path, "r", encoding="utf-8", errors="replace") as source:
+        header = source.readline().strip().split(",")
+    # Header casing varies between files (w_SvGms / w_svGms)
+    present = {name.lower(): name for name in header}
+
+    column_types = {
+        present[csv_name.lower()]: dtype
+        for csv_name, _, dtype in COLUMN_MAPPING if csv_name.lower() in present
+    }
+    raw = pv.read_csv(path, convert_options=pv.ConvertOptions(
+        column_types=column_types,
+        include_columns=list(column_types),
+        strings_can_be_null=True
+    ))
+
+    columns = {}
+    for csv_name, target, dtype in COLUMN_MAPPING:
+        source_name = present.get(csv_name.lower())
+        columns[target] = raw.column(source_name) if source_name else pa.nulls(raw.num_rows, dtype)
+
+    columns['tournament_date'] = pc.cast(
+        pc.strptime(columns['tournament_date'], format='%Y%m%d', unit='s'), pa.date32()
+    )
+    rounds = columns['round_of_match']
+    round_index = pc.index_in(rounds, value_set=pa.array(list(ROUND_NUMBERS)))
+    round_numbers = pc.take(pa.array(list(ROUND_NUMBERS.values()), pa.int64()), round_index)
+
+    names = [target for _, target, _ in COLUMN_MAPPING]
+    position = names.index('round_of_match') + 1
+    names.insert(position, 'round_of_match_number')
+    columns['round_of_match_number'] = pc.fill_null(round_numbers, OTHER_ROUND_NUMBER)
+    names.append('governing_body')
+    columns['governing_body'] = pa.array([tour] * raw.num_rows, pa.string())
+
+    return pa.table([columns[name] for name in names], names=names)
+
+def partition_path(tour: str, year: int) -> str:
+    """Relative directory of a Hive-style (tour, year) partition."""
+    return os.path.join(f"governing_body={tour}", f"match_year={year}")
+
+def write_partitions(table: pa.Table, output_dir: str, tour: str, part_name: str) -> List[str]:
+    """Write one Parquet part per year present in the table; returns relative part paths."""
+    years = pc.year(table.column('tournament_date'))
+    written = []
+    for year in sorted(y for y in pc.unique(years).to_pylist() if y is not None):
+        relative = os.path.join(partition_path(tour, year), f"{part_name}.parquet")
+        target = os.path.join(output_dir, relative)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        # Written aside and renamed so readers never see a half-written part
+        temporary = f"{target}.tmp-{os.getpid()}"
+        pq.write_table(table.filter(pc.equal(years, year)), temporary, compression='zstd')
+        os.replace(temporary, target)
+        written.append(relative)
+    return written
+
+def ingest_file(path: str, output_dir: str, known_sha256: Optional[str] = None) -> Dict[str, Any]:
+    """Parse one source file and write its partitions, unless its content is unchanged.
+
+    Runs in a worker process; returns a manifest entry for the file.
+    """
+    name = os.path.basename(path)
+    match = SOURCE_PATTERN.match(name)
+    if not match:
+        raise ValueError(f"Not a Sackmann matches file: {name}")
+    tour = match.group(1)
+
+    stat = os.stat(path)
+    sha256 = file_sha256(path)
+    entry: Dict[str, Any] = {'sha256': sha256, 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+    if sha256 == known_sha256:
+        return dict(entry, unchanged=True)
+
+    table = read_matches_csv(path, tour)
+    dates = table.column('tournament_date')
+    entry.update(
+        unchanged=False,
+        tour=tour,
+        rows=table.num_rows,
+        partitions=write_partitions(table, output_dir, tour, os.path.splitext(name)[0]),
+        min_date=str(pc.min(dates).as_py()) if table.num_rows else None,
+        max_date=str(pc.max(dates).as_py()) if table.num_rows else None
+    )
+    return entry
\ No newline at end of file
@@ -0,0 +1,415 @@
+# -*- coding: utf-8 -*-
+"""
+Elo rating engine for Tennis Analytics.
+
+Walks the match history in chronological order and keeps overall and
+surface-specific ratings per player in flat NumPy arrays indexed by an
+integer player code. Players are keyed by tour and player id, so namesakes
+and renamed players keep separate and single ratings respectively. Matches
+in the same tournament week and round are independent of each other, so
+they are applied as one vectorized batch.
+
+Processed matches are remembered by (tour, tournament id, match number),
+since ATP and WTA Grand Slams share tournament ids, so matches that arrive
+late for the last processed week are still applied once; changes to earlier
+weeks need a rebuild (see `history_fingerprint`).
+"""
+from __future__ import annotations
+
+import os
+import threading
+from typing import TYPE_CHECKING, Dict, Any, List, Optional
+
+if TYPE_CHECKING:
+    import numpy as np
+    import pandas as pd
+
+SURFACES = ['Hard', 'Clay', 'Grass', 'Carpet']
+
+class EloRatingEngine:
+    """Array-backed Elo ratings with incremental updates and point-in-time lookups."""
+
+    INITIAL_RATING = 1500.0
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._reset()
+
+    def _reset(self):
+        """Clear all ratings and history."""
+        import numpy as np
+        self.player_names: List[str] = []
+        self.player_keys: List[str] = []
+        self._player_codes: Dict[str, int] = {}
+        self._name_codes: Dict[str, List[int]] = {}
+        self.ratings = np.empty(0, dtype=np.float64)
+        self.match_counts = np.empty(0, dtype=np.int32)
+        self.surface_ratings = np.empty((len(SURFACES), 0), dtype=np.float64)
+        self.surface_match_counts = np.empty((len(SURFACES), 0), dtype=np.int32)
+
+        # One entry per processed match, in processing order
+        self.history_dates = np.empty(0, dtype='datetime64[D]')
+        self.history_governing_bodies = np.empty(0, dtype=str)
+        self.history_tournament_ids = np.empty(0, dtype=str)
+        self.history_match_nums = np.empty(0, dtype=np.int64)
+        self.history_winners = np.empty(0, dtype=np.int32)
+        self.history_losers = np.empty(0, dtype=np.int32)
+        self.history_surfaces = np.empty(0, dtype=np.int8)
+        self.history_winner_ratings = np.empty(0, dtype=np.float64)
+        self.history_loser_ratings = np.empty(0, dtype=np.float64)
+        self.history_winner_surface_ratings = np.empty(0, dtype=np.float64)
+        self.history_loser_surface_ratings = np.empty(0, dtype=np.float64)
+
+        self.last_processed_date: Optional[np.datetime64] = None
+        # Warehouse fingerprint of the matches before last_processed_date when they were applied
+        self.history_fingerprint: Optional[str] = None
+
+    def reset(self):
+        """Drop all ratings so the next update recomputes them from scratch."""
+        with self._lock:
+            self._reset()
+
+    @property
+    def is_empty(self) -> bool:
+        return self.last_processed_date is None
+
+    @staticmethod
+    def k_factor(match_counts: np.ndarray) -> np.ndarray:
+        """Dynamic K-factor: new players move fast, established players slowly."""
+        import numpy as np
+        return 250.0 / np.power(match_counts + 5.0, 0.4)
+
+    @staticmethod
+    def expected_score(rating: np.ndarray, opponent_rating: np.ndarray) -> np.ndarray:
+        """Probability that a player with `rating` beats `opponent_rating`."""
+        import numpy as np
+        return 1.0 / (1.0 + np.power(10.0, (opponent_rating - rating) / 400.0))
+
+    @staticmethod
+    def _player_keys(governing_bodies: pd.Series, ids: pd.Series, names: pd.Series) -> np.ndarray:
+        """'<tour>:<player id>' keys, falling back to the name for rows without an id."""
+        ids = ids.astype('Int64').astype(str).where(ids.notna(), names.astype(str))
+        return (governing_bodies.astype(str).str.lower() + ':' + ids).to_numpy(dtype=str)
+
+    def _encode_players(self, keys: np.ndarray, names: np.ndarray) -> np.ndarray:
+        """Map player keys to integer codes, growing the state arrays for new players."""
+        import numpy as np
+        uniques, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+        unique_codes = np.empty(len(uniques), dtype=np.int32)
+        for i, key in enumerate(uniques.tolist()):
+            code = self._player_codes.get(key)
+            if code is None:
+                code = len(self.player_keys)
+                self._player_codes[key] = code
+                self.player_keys.append(key)
+                self.player_names.append(str(names[first[i]]))
+                self._name_codes.setdefault(self.player_names[code], []).append(code)
+            unique_codes[i] = code
+
+        grow = len(self.player_keys) - len(self.ratings)
+        if grow > 0:
+            self.ratings = np.concatenate([self.ratings, np.full(grow, self.INITIAL_RATING)])
+            self.match_counts = np.concatenate([self.match_counts, np.zeros(grow, dtype=np.int32)])
+            self.surface_ratings = np.hstack([
+                self.surface_ratings, np.full((len(SURFACES), grow), self.INITIAL_RATING)
+            ])
+            self.surface_match_counts = np.hstack([
+                self.surface_match_counts, np.zeros((len(SURFACES), grow), dtype=np.int32)
+            ])
+
+        return unique_codes[inverse]
+
+    def _apply_batch(self, winners: np.ndarray, losers: np.ndarray, surfaces: np.ndarray):
+        """Apply a batch of matches in which no player appears twice."""
+        import numpy as np
+        # Overall ratings
+        winner_ratings = self.ratings[winners]
+        loser_ratings = self.ratings[losers]
+        surprise = 1.0 - self.expected_score(winner_ratings, loser_ratings)
+        self.ratings[winners] = winner_ratings + self.k_factor(self.match_counts[winners]) * surprise
+        self.ratings[losers] = loser_ratings - self.k_factor(self.match_counts[losers]) * surprise
+        self.match_counts[winners] += 1
+        self.match_counts[losers] += 1
+
+        # Surface ratings (matches with an unknown surface only move overall ratings)
+        known = surfaces >= 0
+        s, w, l = surfaces[known], winners[known], losers[known]
+        winner_surface = self.surface_ratings[s, w]
+        loser_surface = self.surface_ratings[s, l]
+        surprise = 1.0 - self.expected_score(winner_surface, loser_surface)
+        self.surface_ratings[s, w] = winner_surface + self.k_factor(self.surface_match_counts[s, w]) * surprise
+        self.surface_ratings[s, l] = loser_surface - self.k_factor(self.surface_match_counts[s, l]) * surprise
+        self.surface_match_counts[s, w] += 1
+        self.surface_match_counts[s, l] += 1
+
+        winner_surface_after = np.full(len(winners), np.nan)
+        loser_surface_after = np.full(len(losers), np.nan)
+        winner_surface_after[known] = self.surface_ratings[s, w]
+        loser_surface_after[known] = self.surface_ratings[s, l]
+
+        return self.ratings[winners], self.ratings[losers], winner_surface_after, loser_surface_after
+
+    @staticmethod
+    def _independent_batches(batch_keys: np.ndarray, winners: np.ndarray, losers: np.ndarray) -> List[slice]:
+        """Split matches into consecutive slices in which no player appears twice."""
+        import numpy as np
+        boundaries = np.flatnonzero(batch_keys[1:] != batch_keys[:-1]) + 1
+        starts = np.concatenate([[0], boundaries])
+        ends = np.concatenate([boundaries, [len(batch_keys)]])
+
+        batches = []
+        for start, end in zip(starts, ends):
+            players = np.concatenate([winners[start:end], losers[start:end]])
+            if len(np.unique(players)) == len(players):
+                batches.append(slice(start, end))
+                continue
+
+            # Round robins and overlapping events: split where a player repeats
+            seen = set()
+            sub_start = start
+            for i in range(start, end):
+                if winners[i] in seen or losers[i] in seen:
+                    batches.append(slice(sub_start, i))
+                    seen = set()
+                    sub_start = i
+                seen.add(winners[i])
+                seen.add(losers[i])
+            batches.append(slice(sub_start, end))
+        return batches
+
+    def update(self, matches: pd.DataFrame) -> int:
+        """Process matches not applied yet, from the last processed date on.
+
+        Expects TOURNAMENT_DATE, GOVERNING_BODY, TOURNAMENT_ID, MATCH_NUM,
+        ROUND_OF_MATCH_NUMBER, WINNER_ID, WINNER_NAME, LOSER_ID, LOSER_NAME and
+        SURFACE columns, ordered chronologically.
+        Matches dated before the last processed date are ignored. Returns the
+        number of matches applied.
+        """
+        if matches is None or matches.empty:
+            return 0
+
+        import numpy as np
+        import pandas as pd
+        with self._lock:
+            dates = pd.to_datetime(matches['TOURNAMENT_DATE']).values.astype('datetime64[D]')
+            governing_bodies = matches['GOVERNING_BODY'].astype(str).str.lower().to_numpy(dtype=str)
+            tournament_ids = matches['TOURNAMENT_ID'].astype(str).to_numpy(dtype=str)
+            match_nums = matches['MATCH_NUM'].fillna(-1).values.astype(np.int64)
+            new_rows = np.ones(len(dates), dtype=bool)
+            if self.last_processed_date is not None:
+                # The last week can still receive matches (e.g. the other tour's file)
+                new_rows = dates >= self.last_processed_date
+                recent = self.history_dates >= self.last_processed_date
+                processed = set(zip(self.history_governing_bodies[recent].tolist(),
+                                    self.history_tournament_ids[recent].tolist(),
+                                    self.history_match_nums[recent].tolist()))
+                keys = zip(governing_bodies.tolist(), tournament_ids.tolist(), match_nums.tolist())
+                new_rows &= np.array([key not in processed for key in keys], dtype=bool)
+            if not new_rows.any():
+                return 0
+
+            matches = matches[new_rows]
+            dates = dates[new_rows]
+            governing_bodies = governing_bodies[new_rows]
+            tournament_ids = tournament_ids[new_rows]
+            match_nums = match_nums[new_rows]
+            winners = self._encode_players(
+                self._player_keys(matches['GOVERNING_BODY'], matches['WINNER_ID'], matches['WINNER_NAME']),
+                matches['WINNER_NAME'].values
+            )
+            losers = self._encode_players(
+                self._player_keys(matches['GOVERNING_BODY'], matches['LOSER_ID'], matches['LOSER_NAME']),
+                matches['LOSER_NAME'].values
+            )
+            surface_codes = {surface: code for code, surface in enumerate(SURFACES)}
+            surfaces = matches['SURFACE'].map(surface_codes).fillna(-1).values.astype(np.int8)
+
+            # Matches of the same week and round cannot depend on each other
+            rounds = matches['ROUND_OF_MATCH_NUMBER'].fillna(0).values.astype(np.int64)
+            batch_keys = dates.astype(np.int64) * 1000 + rounds
+
+            winner_after = np.empty(len(winners))
+            loser_after = np.empty(len(winners))
+            winner_surface_after = np.empty(len(winners))
+            loser_surface_after = np.empty(len(winners))
+            for batch in self._independent_batches(batch_keys, winners, losers):
+                (winner_after[batch], loser_after[batch],
+                 winner_surface_after[batch], loser_surface_after[batch]) = self._apply_batch(
+                    winners[batch], losers[batch], surfaces[batch]
+                )
+
+            self.history_dates = np.concatenate([self.history_dates, dates])
+            self.history_governing_bodies = np.concatenate([self.history_governing_bodies, governing_bodies])
+            self.history_tournament_ids = np.concatenate([self.history_tournament_ids, tournament_ids])
+            self.history_match_nums = np.concatenate([self.history_match_nums, match_nums])
+            self.history_winners = np.concatenate([self.history_winners, winners])
+            self.history_losers = np.concatenate([self.history_losers, losers])
+            self.history_surfaces = np.concatenate([self.history_surfaces, surfaces])
+            self.history_winner_ratings = np.concatenate([self.history_winner_ratings, winner_after])
+            self.history_loser_ratings = np.concatenate([self.history_loser_ratings, loser_after])
+            self.history_winner_surface_ratings = np.concatenate([self.history_winner_surface_ratings, winner_surface_after])
+            self.history_loser_surface_ratings = np.concatenate([self.history_loser_surface_ratings, loser_surface_after])
+            self.last_processed_date = dates.max()
+
+            print(f"ELO - Applied {len(winners)} matches (through {self.last_processed_date})")
+            return len(winners)
+
+    def _rating_at(self, code: int, as_of: np.datetime64, surface_code: Optional[int] = None) -> Optional[float]:
+        """Rating of a player after their last match on or before `as_of`."""
+        import numpy as np
+        involved = (self.history_winners == code) | (self.history_losers == code)
+        involved &= self.history_dates <= as_of
+        if surface_code is not None:
+            involved &= self.history_surfaces == surface_code
+
+        positions = np.flatnonzero(involved)
+        if len(positions) == 0:
+            return None
+
+        last = positions[-1]
+        if surface_code is not None:
+            if self.history_winners[last] == code:
+                return float(self.history_winner_surface_ratings[last])
+            return float(self.history_loser_surface_ratings[last])
+        if self.history_winners[last] == code:
+            return float(self.history_winner_ratings[last])
+        return float(self.history_loser_ratings[last])
+
+    def _code_for_name(self, player_name: str) -> Optional[int]:
+        """Code of the player with this name; namesakes resolve to the one with the most matches."""
+        codes = self._name_codes.get(player_name)
+        if not codes:
+            return None
+        return max(codes, key=lambda code: self.match_counts[code])
+
+    def get_rating(self, player_name: str, as_of: Optional[str] = None,
+                   surface: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Get a player's overall (and optionally surface) rating, now or at a past date."""
+        import numpy as np
+        with self._lock:
+            code = self._code_for_name(player_name)
+            if code is None:
+                return None
+
+            surface_code = SURFACES.index(surface) if surface in SURFACES else None
+
+            if as_of is None:
+                rating = float(self.ratings[code])
+                surface_rating = float(self.surface_ratings[surface_code, code]) if surface_code is not None else None
+                matches = int(self.match_counts[code])
+            else:
+                as_of_date = np.datetime64(as_of, 'D')
+                rating = self._rating_at(code, as_of_date)
+                if rating is None:
+                    return None
+                surface_rating = self._rating_at(code, as_of_date, surface_code) if surface_code is not None else None
+                matches = int(np.count_nonzero(
+                    ((self.history_winners == code) | (self.history_losers == code)) & (self.history_dates <= as_of_date)
+                ))
+
+            if surface_code is not None and surface_rating is None:
+                surface_rating = self.INITIAL_RATING
+
+            return {
+                'player_name': player_name,
+                'rating': round(rating, 1),
+                'surface': SURFACES[surface_code] if surface_code is not None else None,
+                'surface_rating': round(surface_rating, 1) if surface_rating is not None else None,
+                'matches': matches,
+                'as_of': as_of or str(self.last_processed_date)
+            }
+
+    def win_probability(self, player_one: str, player_two: str, surface: Optional[str] = None,
+                        as_of: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Probability that player_one beats player_two, blending surface ratings when given."""
+        import numpy as np
+        rating_one = self.get_rating(player_one, as_of, surface)
+        rating_two = self.get_rating(player_two, as_of, surface)
+        if rating_one is None or rating_two is None:
+            return None
+
+        strength_one, strength_two = rating_one['rating'], rating_two['rating']
+        if rating_one['surface_rating'] is not None:
+            strength_one = (strength_one + rating_one['surface_rating']) / 2
+            strength_two = (strength_two + rating_two['surface_rating']) / 2
+
+        probability = float(self.expected_score(np.float64(strength_one), np.float64(strength_two)))
+        return {
+            'player_one': rating_one,
+            'player_two': rating_two,
+            'player_one_win_probability': round(probability * 100, 1),
+            'player_two_win_probability': round((1 - probability) * 100, 1)
+        }
+
+    def save_snapshot(self, path: str):
+        """Persist the full engine state to a compressed .npz file."""
+        import numpy as np
+        with self._lock:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            np.savez_compressed(
+                path,
+                player_names=np.array(self.player_names, dtype=str),
+                player_keys=np.array(self.player_keys, dtype=str),
+                ratings=self.ratings,
+                match_counts=self.match_counts,
+                surface_ratings=self.surface_ratings,
+                surface_match_counts=self.surface_match_counts,
+                history_dates=self.history_dates,
+                history_governing_bodies=self.history_governing_bodies,
+                history_tournament_ids=self.history_tournament_ids,
+                history_match_nums=self.history_match_nums,
+                history_fingerprint=np.array(self.history_fingerprint or '', dtype=str),
+                history_winners=self.history_winners,
+                history_losers=self.history_losers,
+                history_surfaces=self.history_surfaces,
+                history_winner_ratings=self.history_winner_ratings,
+                history_loser_ratings=self.history_loser_ratings,
+                history_winner_surface_ratings=self.history_winner_surface_ratings,
+                history_loser_surface_ratings=self.history_loser_surface_ratings,
+            )
+            print(f"ELO - Saved snapshot to {path}")
+
+    def load_snapshot(self, path: str) -> bool:
+        """Restore engine state from a snapshot. Returns False if none exists or it predates tour keys."""
+        import numpy as np
+        if not os.path.exists(path):
+            return False
+
+        with self._lock:
+            with np.load(path) as snapshot:
+                if 'history_governing_bodies' not in snapshot.files:
+                    print(f"ELO - Ignoring snapshot {path} without tour keys")
+                    return False
+                self._reset()
+                self.player_names = snapshot['player_names'].tolist()
+                self.player_keys = snapshot['player_keys'].tolist()
+                self._player_codes = {key: code for code, key in enumerate(self.player_keys)}
+                for code, name in enumerate(self.player_names):
+                    self._name_codes.setdefault(name, []).append(code)
+                for field in ('ratings', 'match_counts', 'surface_ratings', 'surface_match_counts',
+                              'history_dates', 'history_governing_bodies', 'history_tournament_ids',
+                              'history_match_nums', 'history_winners', 'history_losers', 'history_surfaces',
+                              'history_winner_ratings', 'history_loser_ratings',
+                              'history_winner_surface_ratings', 'history_loser_surface_ratings'):
+                    setattr(self, field, snapshot[field])
+                self.history_fingerprint = str(snapshot['history_fingerprint']) or None
+
+            if len(self.history_dates):
+                self.last_processed_date = self.history_dates.max()
+            print(f"ELO - Loaded snapshot from {path} ({len(self.player_names)} players)")
+            return True
+
+_elo_engine: Optional[EloRatingEngine] = None
+_elo_engine_lock = threading.Lock()
+
+def get_elo_engine() -> EloRatingEngine:
+    """Global rating engine, created (and NumPy imported) on the first rating question."""
+    global _elo_engine
+    if _elo_engine is None:
+        with _elo_engine_lock:
+            if _elo_engine is None:
+                _elo_engine = EloRatingEngine()
+    return _elo_engine
\ No newline at end of file
@@ -7,17 +7,34 @@ Created on Mon Aug 11 22:24:32 2025
 Business logic services for Tennis Analytics.
 Contains all tennis-specific calculations and analysis.
 """
-import pandas as pd
-from typing import Dict, Any, List, Optional
-from ..data.repositories import PlayerRepository, MatchRepository
+from __future__ import annotations
+
+import datetime
+import json
+from typing import TYPE_CHECKING, BinaryIO, Dict, Any, List, Optional, Tuple
+from ..data.repositories import PlayerRepository, MatchRepository, TournamentRepository
+from ..data.events import DataChangeEvent, data_events
+from ..data.answer_store import get_player_answer_store
+from .elo_ratings import EloRatingEngine, get_elo_engine
 from config.settings import settings
 
+if TYPE_CHECKING:
+    import pyarrow as pa
+
+EXPORT_FORMATS = ('csv', 'parquet')
+
 class TennisAnalysisService:
     """Service for tennis data analysis and calculations."""
     
     def __init__(self):
         self.player_repo = PlayerRepository()
         self.match_repo = MatchRepository()
+        self.tournament_repo = TournamentRepository()
+    
+    @property
+    def rating_engine(self) -> EloRatingEngine:
+        """Shared rating engine, created on the first rating question."""
+        return get_elo_engine()
     
     def analyze_player_performance(self, player_name: str, year_start: Optional[int] = None, 
                                  year_end: Optional[int] = None) -> Dict[str, Any]:
@@ -25,8 +42,10 @@ class TennisAnalysisService:
         print(f"TS - Analyzing player: '{player_name}'")
         print(f"TS - Filters: year_start={year_start}, year_end={year_end}")
         
-        # Get raw data from repository
-        result = self.player_repo.get_player_tournament_stats(player_name, year_start, year_end)
+        # Precomputed answers cover any year range; the warehouse only for players the store lacks
+        result = get_player_answer_store().get_player_tournament_stats(player_name, year_start, year_end)
+        if result is None:
+            result = self.player_repo.get_player_tournament_stats(player_name, year_start, year_end)
         
         if not result or result[0] == 0:
             # Try to find similar players
@@ -38,11 +57,12 @@ class TennisAnalysisService:
             }
         
         # Extract data and perform calculations
-        tournaments, games_won, games_lost, avg_rank, total_points, governing_body = result
+        (tournaments, matches_won, matches_lost, sets_won, sets_lost, games_won, games_lost,
+         tiebreaks_won, tiebreaks_lost, avg_rank, total_points, governing_body) = result
         
         # Business logic calculations
+        total_matches = matches_won + matches_lost
         total_games = games_won + games_lost
-        win_percentage = round((games_won / total_games) * 100, 1) if total_games > 0 else 0
         avg_ranking = round(avg_rank, 1) if avg_rank else None
         
         # Format period description
@@ -55,42 +75,80 @@ class TennisAnalysisService:
             'period': period,
             'statistics': {
                 'total_tournaments': tournaments,
+                'matches_won': matches_won,
+                'matches_lost': matches_lost,
+                'total_matches': total_matches,
+                'match_win_percentage': self._percentage(matches_won, total_matches),
+                'sets_won': sets_won,
+                'sets_lost': sets_lost,
+                'set_win_percentage': self._percentage(sets_won, sets_won + sets_lost),
                 'games_won': games_won,
                 'games_lost': games_lost,
                 'total_games': total_games,
-                'win_percentage': win_percentage,
+                'game_win_percentage': self._percentage(games_won, total_games),
+                'tiebreaks_won': tiebreaks_won,
+                'tiebreaks_lost': tiebreaks_lost,
+                'tiebreak_win_percentage': self._percentage(tiebreaks_won, tiebreaks_won + tiebreaks_lost),
                 'average_ranking': avg_ranking,
                 'total_points': total_points or 0
             }
         }
     
+    def analyze_serve_return_stats(self, player_name: str, year_start: Optional[int] = None,
+                                   year_end: Optional[int] = None, surface: Optional[str] = None,
+                                   by_year: bool = False, by_surface: bool = False) -> Dict[str, Any]:
+        """Analyze serve and return statistics for a player."""
+        print(f"TS - Analyzing serve/return stats: '{player_name}'")
+        print(f"TS - Filters: year_start={year_start}, year_end={year_end}, surface={surface}")
+        
+        columns, rows = self.player_repo.get_player_serve_stats(
+            player_name, year_start, year_end, surface, by_year, by_surface
+        )
+        
+        if not rows:
+            similar_players = self.player_repo.find_similar_player_names(player_name)
+            return {
+                'success': False,
+                'message': f"No serve statistics found for player: {player_name}",
+                'similar_players': similar_players
+            }
+        
+        return {
+            'success': True,
+            'player_name': player_name,
+            'period': self._format_period(year_start, year_end),
+            'surface': surface or 'All surfaces',
+            'breakdown': [dict(zip(columns, row)) for row in rows]
+        }
+    
     def get_available_players_list(self, governing_body: str = 'All',
                                    year_start: Optional[int] = None, year_end: Optional[int] = None,
                                  limit: Optional[int] = None) -> Dict[str, Any]:
         """Get formatted list of available players."""
         print(f"TS - Getting '{governing_body}' players")
-        if limit is None:
-            limit = settings.DEFAULT_PLAYER_LIMIT
+        limit = min(limit or settings.DEFAULT_PLAYER_LIMIT, settings.MAX_PLAYER_LIMIT)
         
-        players_data = self.player_repo.get_all_players(governing_body, limit)
+        players_table = self.player_repo.get_all_players(
+            governing_body=governing_body,
+            year_start=year_start,
+            year_end=year_end,
+            limit=limit
+        )
         
-        if not players_data:
+        if players_table is None or players_table.num_rows == 0:
             return {
                 'success': False,
-                'message': f"No {governing_body} players found"
+                'message': f"No {governing_body} players found for {self._format_period(year_start, year_end)}"
             }
         
-        # Format player information
-        player_list = []
-        for player, tournament_count, total_games in players_data:
-            player_list.append(f"{player} ({tournament_count} tournaments, {total_games} games)")
-        
+        # Kept as an Arrow table; rows are only materialized when formatted
         return {
             'success': True,
             'governing_body': governing_body,
-            'count': len(player_list),
+            'period': self._format_period(year_start, year_end),
+            'count': players_table.num_rows,
             'limit': limit,
-            'players': player_list
+            'players': players_table
         }
     
     def analyze_head_to_head(self, player_one: str, player_two: str, 
@@ -102,41 +160,381 @@ class TennisAnalysisService:
         print(f"TS - Analyzing head-to-head: '{player_one}' vs '{player_two}'")
         print(f"TS - Filters: year_start={year_start}, year_end={year_end}")
         
+        # Resolve free-text tournament names to the exact warehouse value
+        if tournament_name:
+            resolved_name = self.tournament_repo.resolve_tournament_name(tournament_name)
+            if not resolved_name:
+                return {
+                    'success': False,
+                    'message': f"Unknown tournament: {tournament_name}"
+                }
+            tournament_name = resolved_name
+        
         # Get match data from repository
-        matches_df = self.match_repo.get_head_to_head_matches(
+        matches = self.match_repo.get_head_to_head_matches(
             player_one, player_two, year_start, year_end, 
             tournament_name, tournament_level, surface
         )
         
-        if matches_df.empty:
+        if matches is None or matches.num_rows == 0:
             return {
                 'success': False,
                 'message': f"No matches found between {player_one} and {player_two}"
             }
         
         # Perform head-to-head analysis
-        analysis = self._calculate_head_to_head_stats(matches_df, player_one, player_two)
+        analysis = self._calculate_head_to_head_stats(matches, player_one, player_two)
         analysis['period'] = self._format_period(year_start, year_end)
         analysis['success'] = True
         
         return analysis
     
-    def _calculate_head_to_head_stats(self, matches_df: pd.DataFrame, 
+    def analyze_tournament(self, tournament_name: str, year: Optional[int] = None,
+                           governing_body: Optional[str] = None) -> Dict[str, Any]:
+        """Summarize one or all editions of a tournament."""
+        print(f"TS - Analyzing tournament: '{tournament_name}'")
+        print(f"TS - Filters: year={year}, governing_body={governing_body}")
+        
+        resolved_name = self.tournament_repo.resolve_tournament_name(tournament_name)
+        if not resolved_name:
+            return {
+                'success': False,
+                'message': f"No tournament found matching: {tournament_name}",
+                'similar_tournaments': self.tournament_repo.get_tournament_name_index().suggestions(tournament_name)
+            }
+        
+        rows = self.tournament_repo.get_tournament_stats(resolved_name, year, governing_body)
+        if not rows:
+            return {
+                'success': False,
+                'message': f"No editions of {resolved_name} found for {year or 'any year'}"
+            }
+        
+        editions = []
+        for (name, match_year, body, level, surface, draw_size, champion, champion_seed,
+             finalist, finalist_seed, final_score, total_matches, upsets, upset_pct,
+             avg_minutes, seeds_entered, seeds_qf, seeds_sf, top_seed, top_seed_round) in rows:
+            editions.append({
+                'year': match_year,
+                'governing_body': body.upper() if body else None,
+                'level': level,
+                'surface': surface,
+                'draw_size': draw_size,
+                'champion': champion,
+                'champion_seed': champion_seed,
+                'finalist': finalist,
+                'finalist_seed': finalist_seed,
+                'final_score': final_score,
+                'total_matches': total_matches,
+                'upsets': upsets,
+                'upset_percentage': upset_pct,
+                'average_match_minutes': avg_minutes,
+                'seeds_entered': seeds_entered,
+                'seeds_reached_qf': seeds_qf,
+                'seeds_reached_sf': seeds_sf,
+                'top_seed': top_seed,
+                'top_seed_best_round': top_seed_round
+            })
+        
+        return {
+            'success': True,
+            'tournament_name': resolved_name,
+            'period': f"Year: {year}" if year else "All years",
+            'editions': editions
+        }
+    
+    def analyze_player_vs_field(self, player_name: str, group_by: str = 'opponent',
+                                year_start: Optional[int] = None, year_end: Optional[int] = None,
+                                surface: Optional[str] = None, tournament_level: Optional[str] = None,
+                                max_opponent_rank: Optional[int] = None, min_matches: Optional[int] = None,
+                                sort_by: Optional[str] = None, limit: Optional[int] = None) -> Dict[str, Any]:
+        """A player's win-loss record against the field, broken down by one dimension.
+        
+        Covers "record against top-10 opponents on clay" (max_opponent_rank,
+        surface) and "who did he beat most" (group_by='opponent', sort_by='wins')
+        in one grouped query instead of one head-to-head per opponent.
+        """
+        print(f"TS - Analyzing player vs field: '{player_name}' by {group_by}")
+        print(f"TS - Filters: year_start={year_start}, year_end={year_end}, surface={surface}, "
+              f"level={tournament_level}, max_opponent_rank={max_opponent_rank}")
+        
+        if group_by not in MatchRepository.FIELD_GROUPS:
+            return {'success': False, 'message': f"Unsupported grouping: {group_by} "
+                    f"(use one of {', '.join(MatchRepository.FIELD_GROUPS)})"}
+        if sort_by and sort_by not in MatchRepository.FIELD_SORTS:
+            return {'success': False, 'message': f"Unsupported sort: {sort_by} "
+                    f"(use one of {', '.join(MatchRepository.FIELD_SORTS)})"}
+        # Bounded groupings (years, rounds, ...) are returned whole unless a limit is asked for
+        if limit or group_by in MatchRepository.OPEN_FIELD_GROUPS:
+            limit = min(limit or settings.DEFAULT_PLAYER_LIMIT, settings.MAX_PLAYER_LIMIT)
+        
+        groups = self.match_repo.get_player_vs_field(
+            player_name, group_by, year_start, year_end, surface, tournament_level,
+            max_opponent_rank, min_matches, sort_by, limit
+        )
+        if groups is None or groups.num_rows == 0:
+            return {
+                'success': False,
+                'message': f"No matches found for {player_name} with these filters",
+                'similar_players': self.player_repo.find_similar_player_names(player_name)
+            }
+        
+        total_matches = int(groups.column('TOTAL_MATCHES')[0].as_py())
+        total_wins = int(groups.column('TOTAL_WINS')[0].as_py())
+        filters = [f"{surface} courts" if surface else None,
+                   f"level {tournament_level}" if tournament_level else None,
+                   f"opponents ranked {max_opponent_rank} or better" if max_opponent_rank else None,
+                   f"at least {min_matches} matches per {group_by}" if min_matches else None]
+        return {
+            'success': True,
+            'player_name': player_name,
+            'group_by': group_by,
+            'period': self._format_period(year_start, year_end),
+            'filters': ", ".join(f for f in filters if f) or "none",
+            'groups': groups.drop(['TOTAL_MATCHES', 'TOTAL_WINS', 'GROUPS']),
+            'group_count': int(groups.column('GROUPS')[0].as_py()),
+            'total_matches': total_matches,
+            'total_wins': total_wins,
+            'total_losses': total_matches - total_wins,
+            'total_win_percentage': self._percentage(total_wins, total_matches)
+        }
+    
+    def analyze_rivalry_network(self, players: List[str], year_start: Optional[int] = None,
+                                year_end: Optional[int] = None, surface: Optional[str] = None,
+                                tournament_level: Optional[str] = None) -> Dict[str, Any]:
+        """Head-to-head records among several players at once, and each player's record within the group."""
+        import pyarrow.compute as pc
+        players = list(dict.fromkeys(player for player in players or [] if player))
+        print(f"TS - Analyzing rivalry network: {players}")
+        
+        if not 2 <= len(players) <= settings.MAX_NETWORK_PLAYERS:
+            return {'success': False,
+                    'message': f"A rivalry network needs 2 to {settings.MAX_NETWORK_PLAYERS} players, got {len(players)}"}
+        
+        edges = self.match_repo.get_rivalry_network(players, year_start, year_end, surface, tournament_level)
+        if edges is None or edges.num_rows == 0:
+            return {'success': False, 'message': f"No matches found among {', '.join(players)}"}
+        
+        # Each pair once, from the alphabetically first player's side
+        pairs = edges.filter(pc.less(edges.column('PLAYER'), edges.column('OPPONENT')))
+        totals = edges.group_by('PLAYER').aggregate([('MATCHES', 'sum'), ('WINS', 'sum')])
+        standings = sorted((
+            {
+                'player': player,
+                'matches': int(matches),
+                'wins': int(wins),
+                'losses': int(matches - wins),
+                'win_percentage': self._percentage(wins, matches)
+            }
+            for player, matches, wins in zip(totals.column('PLAYER').to_pylist(),
+                                             totals.column('MATCHES_sum').to_pylist(),
+                                             totals.column('WINS_sum').to_pylist())
+        ), key=lambda row: (-row['win_percentage'], -row['matches'], row['player']))
+        met = {row['player'] for row in standings}
+        
+        return {
+            'success': True,
+            'players': players,
+            'period': self._format_period(year_start, year_end),
+            'surface': surface or "All surfaces",
+            'rivalries': [
+                {
+                    'player_one': player_one,
+                    'player_two': player_two,
+                    'matches': int(matches),
+                    'player_one_wins': int(wins),
+                    'player_two_wins': int(matches - wins),
+                    'last_match': last_match
+                }
+                for player_one, player_two, matches, wins, last_match in zip(
+                    *(pairs.column(column).to_pylist() for column in ('PLAYER', 'OPPONENT', 'MATCHES', 'WINS', 'LAST_MATCH'))
+                )
+            ],
+            'standings': standings,
+            'no_matches': [player for player in players if player not in met]
+        }
+    
+    def list_player_matches(self, player_name: str, opponent: Optional[str] = None,
+                            year_start: Optional[int] = None, year_end: Optional[int] = None,
+                            surface: Optional[str] = None, cursor: Optional[str] = None,
+                            page_size: Optional[int] = None) -> Dict[str, Any]:
+        """One page of a player's matches, newest first.
+        
+        Pass the returned `next_cursor` back to get the following page; it is
+        None on the last page.
+        """
+        page_size = max(1, min(page_size or settings.MATCH_PAGE_SIZE, settings.MAX_MATCH_PAGE_SIZE))
+        try:
+            after = self._decode_cursor(cursor)
+        except ValueError:
+            return {'success': False, 'message': f"Invalid match listing cursor: {cursor}"}
+        
+        # One extra row tells whether another page exists
+        matches = self.match_repo.get_player_matches_page(
+            player_name, opponent, year_start, year_end, surface, after, page_size + 1
+        )
+        if matches is None:
+            return {'success': False, 'message': f"Error listing matches for {player_name}"}
+        if matches.num_rows == 0 and after is None:
+            return {
+                'success': False,
+                'message': f"No matches found for {player_name}",
+                'similar_players': self.player_repo.find_similar_player_names(player_name)
+            }
+        
+        has_more = matches.num_rows > page_size
+        page = matches.slice(0, page_size)
+        return {
+            'success': True,
+            'player_name': player_name,
+            'opponent': opponent,
+            'period': self._format_period(year_start, year_end),
+            'count': page.num_rows,
+            'matches': page,
+            'next_cursor': self._encode_cursor(page) if has_more else None
+        }
+    
+    def export_player_matches(self, out: BinaryIO, file_format: str = 'csv', player_name: str = '',
+                              opponent: Optional[str] = None, year_start: Optional[int] = None,
+                              year_end: Optional[int] = None, surface: Optional[str] = None) -> int:
+        """Write a player's full match listing to `out` as CSV or Parquet; returns the row count.
+        
+        Batches are written as they arrive from the warehouse, so memory use is
+        one result chunk regardless of the listing size.
+        """
+        if file_format not in EXPORT_FORMATS:
+            raise ValueError(f"Unsupported export format: {file_format}")
+        print(f"TS - Exporting matches for '{player_name}' as {file_format}")
+        
+        rows = 0
+        if file_format == 'csv':
+            header = True
+            for batch in self.match_repo.iter_player_matches(player_name, opponent, year_start, year_end, surface):
+                out.write(batch.to_csv(index=False, header=header).encode('utf-8'))
+                header = False
+                rows += len(batch)
+            if header:
+                out.write((",".join(self.match_repo.LISTING_COLUMNS) + "\n").encode('utf-8'))
+            return rows
+        
+        # Parquet from Arrow batches: pandas batches can change dtypes between
+        # chunks (an int column with nulls becomes float), which one file schema can't hold
+        import pyarrow.parquet as pq
+        writer = None
+        try:
+            for batch in self.match_repo.iter_player_matches(player_name, opponent, year_start, year_end,
+                                                            surface, arrow=True):
+                if writer is None:
+                    writer = pq.ParquetWriter(out, batch.schema)
+                writer.write_table(batch.cast(writer.schema))
+                rows += batch.num_rows
+            if writer is None:
+                # No batches: still a valid file with the listing's columns, like the CSV header
+                writer = pq.ParquetWriter(out, self.match_repo.listing_schema())
+        finally:
+            if writer is not None:
+                writer.close()
+        return rows
+    
+    @staticmethod
+    def _encode_cursor(page: pa.Table) -> str:
+        """Opaque cursor from the listing key of a page's last row."""
+        tournament_date, tournament_id, match_num = (
+            page.column(column)[page.num_rows - 1].as_py() for column in MatchRepository.LISTING_KEY
+        )
+        # MATCH_NUM may arrive as a decimal
+        return json.dumps([tournament_date.isoformat(), str(tournament_id), int(match_num)])
+    
+    @staticmethod
+    def _decode_cursor(cursor: Optional[str]) -> Optional[Tuple]:
+        if not cursor:
+            return None
+        try:
+            tournament_date, tournament_id, match_num = json.loads(cursor)
+            return (datetime.date.fromisoformat(tournament_date), str(tournament_id), int(match_num))
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"Invalid cursor: {cursor}") from e
+    
+    def refresh_ratings(self, rebuild: bool = False) -> int:
+        """Bring Elo ratings up to date, processing only matches not rated yet.
+        
+        Ratings are recomputed from the full history with `rebuild`, or when
+        the warehouse shows matches before the last rated week were added or
+        corrected since they were rated.
+        """
+        if rebuild:
+            self.rating_engine.reset()
+        elif self.rating_engine.is_empty:
+            self.rating_engine.load_snapshot(settings.ELO_SNAPSHOT_PATH)
+        
+        since_date = None
+        if not self.rating_engine.is_empty:
+            since_date = str(self.rating_engine.last_processed_date)
+            fingerprint = self.match_repo.get_rating_matches_fingerprint(since_date)
+            stored = self.rating_engine.history_fingerprint
+            if fingerprint is not None and stored is not None and fingerprint != stored:
+                print(f"TS - Matches before {since_date} changed since they were rated, rebuilding ratings")
+                self.rating_engine.reset()
+                since_date = None
+        
+        matches_df = self.match_repo.get_matches_for_ratings(since_date)
+        applied = self.rating_engine.update(matches_df)
+        if not self.rating_engine.is_empty and (applied or self.rating_engine.history_fingerprint is None):
+            self.rating_engine.history_fingerprint = self.match_repo.get_rating_matches_fingerprint(
+                str(self.rating_engine.last_processed_date)
+            )
+            self.rating_engine.save_snapshot(settings.ELO_SNAPSHOT_PATH)
+        return applied
+    
+    def analyze_player_rating(self, player_one: str, player_two: Optional[str] = None,
+                              surface: Optional[str] = None, as_of: Optional[str] = None) -> Dict[str, Any]:
+        """Get Elo ratings for a player, or the win probability between two players."""
+        print(f"TS - Analyzing ratings: '{player_one}' vs '{player_two}'")
+        print(f"TS - Filters: surface={surface}, as_of={as_of}")
+        
+        if self.rating_engine.is_empty:
+            self.refresh_ratings()
+        
+        if player_two:
+            prediction = self.rating_engine.win_probability(player_one, player_two, surface, as_of)
+            if prediction is None:
+                return {
+                    'success': False,
+                    'message': f"No rating history for {player_one} or {player_two} as of {as_of or 'today'}"
+                }
+            prediction['success'] = True
+            return prediction
+        
+        rating = self.rating_engine.get_rating(player_one, as_of, surface)
+        if rating is None:
+            return {
+                'success': False,
+                'message': f"No rating history for {player_one} as of {as_of or 'today'}",
+                'similar_players': self.player_repo.find_similar_player_names(player_one)
+            }
+        
+        return {'success': True, 'player_one': rating}
+    
+    def _calculate_head_to_head_stats(self, matches: pa.Table, 
                                     player_one: str, player_two: str) -> Dict[str, Any]:
         """Calculate detailed head-to-head statistics."""
-        total_matches = len(matches_df)
+        import pyarrow.compute as pc
+        total_matches = matches.num_rows
         
         # Overall record
-        player_one_wins = len(matches_df[matches_df['WINNER_NAME'] == player_one])
-        player_two_wins = len(matches_df[matches_df['WINNER_NAME'] == player_two])
+        player_one_won = pc.equal(matches.column('WINNER_NAME'), player_one)
+        player_two_won = pc.equal(matches.column('WINNER_NAME'), player_two)
+        player_one_wins = self._count(player_one_won)
+        player_two_wins = self._count(player_two_won)
         
         # Grand Slam analysis
-        grand_slam_matches = matches_df[matches_df['TOURNAMENT_LEVEL'] == 'G']
-        player_one_gs_wins = len(grand_slam_matches[grand_slam_matches['WINNER_NAME'] == player_one])
-        player_two_gs_wins = len(grand_slam_matches[grand_slam_matches['WINNER_NAME'] == player_two])
+        grand_slam = pc.equal(matches.column('TOURNAMENT_LEVEL'), 'G')
+        player_one_gs_wins = self._count(pc.and_kleene(grand_slam, player_one_won))
+        player_two_gs_wins = self._count(pc.and_kleene(grand_slam, player_two_won))
         
         # Surface analysis
-        surface_stats = self._analyze_surface_performance(matches_df, player_one, player_two)
+        surface_stats = self._analyze_surface_performance(matches, player_one_won, player_two_won,
+                                                          player_one, player_two)
         
         return {
             'player_one': player_one,
@@ -154,18 +552,21 @@ class TennisAnalysisService:
             'chart_data': surface_stats['chart_data']
         }
     
-    def _analyze_surface_performance(self, matches_df: pd.DataFrame, 
+    def _analyze_surface_performance(self, matches: pa.Table, player_one_won: pa.ChunkedArray,
+                                   player_two_won: pa.ChunkedArray,
                                    player_one: str, player_two: str) -> Dict[str, Any]:
         """Analyze performance by surface type."""
+        import pandas as pd
+        import pyarrow.compute as pc
         surfaces = ['Hard', 'Clay', 'Grass']
         
         breakdown = {}
         chart_data = []
         
         for surface in surfaces:
-            surface_matches = matches_df[matches_df['SURFACE'] == surface]
-            p1_wins = len(surface_matches[surface_matches['WINNER_NAME'] == player_one])
-            p2_wins = len(surface_matches[surface_matches['WINNER_NAME'] == player_two])
+            on_surface = pc.equal(matches.column('SURFACE'), surface)
+            p1_wins = self._count(pc.and_kleene(on_surface, player_one_won))
+            p2_wins = self._count(pc.and_kleene(on_surface, player_two_won))
             
             breakdown[surface] = {player_one: p1_wins, player_two: p2_wins}
             
@@ -180,6 +581,17 @@ class TennisAnalysisService:
             'chart_data': pd.DataFrame(chart_data)
         }
     
+    @staticmethod
+    def _percentage(part: int, total: int) -> float:
+        return round((part / total) * 100, 1) if total else 0
+    
+    @staticmethod
+    def _count(mask) -> int:
+        """Count true values in an Arrow boolean mask (nulls count as false)."""
+        import pyarrow as pa
+        import pyarrow.compute as pc
+        return pc.sum(pc.cast(mask, pa.int64())).as_py() or 0
+    
     def _format_period(self, year_start: Optional[int], year_end: Optional[int]) -> str:
         """Format the time period description."""
         if year_start and year_end:
@@ -190,3 +602,13 @@ class TennisAnalysisService:
             return f"Until: {year_end}"
         else:
             return "All years"
+
+def _refresh_ratings_on_change(event: DataChangeEvent):
+    """Apply new matches once they reach the warehouse; refresh_ratings rebuilds when already-rated weeks changed."""
+    if not event.is_warehouse_refresh or get_elo_engine().is_empty:
+        # Only local Parquet changed, or not loaded yet (the first rating question loads everything)
+        return
+    applied = TennisAnalysisService().refresh_ratings()
+    print(f"TS - Ratings refreshed after data change ({applied} matches)")
+
+data_events.subscribe(_refresh_ratings_on_change)
\ No newline at end of file
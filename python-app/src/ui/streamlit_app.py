@@ -9,14 +9,51 @@ Handles user interface, conversation flow, and chart display.
 import streamlit as st
 import sys
 import os
+import json
+import tempfile
+import time
+from typing import Any, Dict, Optional
 
 # Add the project root to the Python path
 project_root = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
 sys.path.insert(0, project_root)
 
-from src.ai.claude_agent import TennisAnalysisAgent
 from config.settings import settings
 
+def build_chart_spec(chart_data) -> Optional[str]:
+    """Pivot head-to-head chart data once into a compact JSON spec (players x surfaces).
+    
+    History keeps this small string instead of the DataFrame.
+    """
+    if chart_data is None or chart_data.empty:
+        return None
+    try:
+        pivot = chart_data.pivot(index="player", columns="surface", values="wins").fillna(0)
+    except Exception as e:
+        print(f"UI - Error building chart: {str(e)}")
+        return None
+    if pivot.empty:
+        return None
+    return json.dumps({
+        'title': "Wins by Surface",
+        'index': [str(player) for player in pivot.index],
+        'columns': [str(surface) for surface in pivot.columns],
+        'values': pivot.values.tolist()
+    })
+
+@st.cache_data(max_entries=256, show_spinner=False)
+def chart_frame(spec: str):
+    """Chart DataFrame for a spec, memoized across reruns and sessions."""
+    import pandas as pd
+    chart = json.loads(spec)
+    return pd.DataFrame(chart['values'], index=chart['index'], columns=chart['columns'])
+
+def _show_earlier_messages():
+    st.session_state.history_shown += settings.UI_HISTORY_PAGE_SIZE
+
+SURFACES = ["Any", "Hard", "Clay", "Grass", "Carpet"]
+EXPORT_MIME_TYPES = {"csv": "text/csv", "parquet": "application/vnd.apache.parquet"}
+
 class TennisAnalyticsUI:
     """Streamlit user interface for tennis analytics."""
     
@@ -37,9 +74,15 @@ class TennisAnalyticsUI:
         """Initialize session state variables."""
         if 'agent' not in st.session_state:
             try:
-                # Validate settings before creating agent
-                settings.validate()
-                st.session_state.agent = TennisAnalysisAgent()
+                if settings.BACKEND_URL:
+                    # Thin client: the agent runs in the shared backend process
+                    from src.backend.client import BackendClient
+                    st.session_state.agent = BackendClient(settings.BACKEND_URL)
+                else:
+                    # Validate settings before creating agent
+                    settings.validate()
+                    from src.ai.claude_agent import TennisAnalysisAgent
+                    st.session_state.agent = TennisAnalysisAgent()
             except ValueError as e:
                 st.error(f"Configuration Error: {str(e)}")
                 st.stop()
@@ -49,6 +92,22 @@ class TennisAnalyticsUI:
         
         if 'messages' not in st.session_state:
             st.session_state.messages = []
+            st.session_state.history_dropped = 0
+            st.session_state.history_shown = settings.UI_HISTORY_PAGE_SIZE
+        
+        if 'match_listing' not in st.session_state:
+            st.session_state.match_listing = None
+            st.session_state.match_export = None
+        
+        if settings.INGEST_ENABLED and not settings.BACKEND_URL:
+            # Local stand-in for bucket ingestion; started once per process
+            from src.ingestion.pipeline import start_watcher
+            start_watcher()
+        
+        if settings.WARMUP_ENABLED and not settings.BACKEND_URL:
+            # Warms this process's caches; with a backend, the backend warms its own
+            from src.ai.warmup import start_warmup_scheduler
+            start_warmup_scheduler()
     
     def render_header(self):
         """Render the application header."""
@@ -73,34 +132,47 @@ class TennisAnalyticsUI:
             """)
     
     def render_conversation_history(self):
-        """Render the conversation history."""
-        for message in st.session_state.messages:
+        """Render the most recent page of the conversation; older messages on request."""
+        messages = st.session_state.messages
+        hidden = max(len(messages) - st.session_state.history_shown, 0)
+        
+        if st.session_state.history_dropped:
+            st.caption(f"{st.session_state.history_dropped} older messages are no longer kept.")
+        if hidden:
+            st.button(f"Show {min(hidden, settings.UI_HISTORY_PAGE_SIZE)} earlier messages",
+                      on_click=_show_earlier_messages)
+        
+        for message in messages[hidden:]:
             with st.chat_message(message["role"]):
                 st.markdown(message["content"])
                 
                 # Display charts if available
-                if message["role"] == "assistant" and "chart_data" in message:
-                    chart_data = message["chart_data"]
-                    if chart_data is not None and not chart_data.empty:
-                        self.display_chart(chart_data)
+                if message.get("chart"):
+                    self.display_chart(message["chart"])
     
-    def display_chart(self, chart_data):
+    def display_chart(self, spec: str):
         """Display chart for head-to-head analysis."""
         try:
-            # Create pivot table for bar chart
-            pivot = chart_data.pivot(index="player", columns="surface", values="wins").fillna(0)
-            
-            if not pivot.empty:
-                st.markdown("**Wins by Surface**")
-                st.bar_chart(pivot)
+            st.markdown(f"**{json.loads(spec)['title']}**")
+            st.bar_chart(chart_frame(spec))
         except Exception as e:
             st.error(f"Error displaying chart: {str(e)}")
     
+    def add_message(self, message: Dict[str, Any]):
+        """Append to the history, dropping the oldest messages past the cap."""
+        messages = st.session_state.messages
+        messages.append(message)
+        overflow = len(messages) - settings.UI_HISTORY_MAX_MESSAGES
+        if overflow > 0:
+            del messages[:overflow]
+            st.session_state.history_dropped += overflow
+    
     def handle_user_input(self):
         """Handle user input and generate responses."""
         if prompt := st.chat_input("Ask about tennis statistics..."):
-            # Add user message to history
-            st.session_state.messages.append({"role": "user", "content": prompt})
+            # Add user message to history; a new exchange collapses history to one page
+            self.add_message({"role": "user", "content": prompt})
+            st.session_state.history_shown = settings.UI_HISTORY_PAGE_SIZE
             
             # Display user message
             with st.chat_message("user"):
@@ -109,15 +181,15 @@ class TennisAnalyticsUI:
             # Generate and display assistant response
             with st.chat_message("assistant"):
                 with st.spinner("Analyzing..."):
-                    response = st.session_state.agent.process_query(prompt)
+                    response = self.run_agent_query(prompt)
                     
                     # Display the text response
                     st.markdown(response["text"])
                     
-                    # Display chart if available
-                    chart_data = response.get("chart_data")
-                    if chart_data is not None and not chart_data.empty:
-                        self.display_chart(chart_data)
+                    # Display chart if available; the spec is computed once and kept
+                    chart = build_chart_spec(response.get("chart_data"))
+                    if chart:
+                        self.display_chart(chart)
             
             # Add assistant response to history
             assistant_message = {
@@ -125,11 +197,126 @@ class TennisAnalyticsUI:
                 "content": response["text"]
             }
             
-            # Include chart data in message for history
-            if chart_data is not None:
-                assistant_message["chart_data"] = chart_data
+            # Include the chart spec in message for history
+            if chart:
+                assistant_message["chart"] = chart
             
-            st.session_state.messages.append(assistant_message)
+            self.add_message(assistant_message)
+    
+    def run_agent_query(self, prompt: str):
+        """Stream the agent's progress, cancelling its queries if this run is interrupted.
+        
+        A new message, the Stop button or a closed page stops the script at its
+        next Streamlit call; closing the event stream then cancels the session's
+        warehouse queries instead of leaving them to run on unobserved.
+        """
+        agent = st.session_state.agent
+        events = agent.process_query_stream(prompt)
+        status = st.empty()
+        stop = st.empty()
+        stop.button("Stop", key=f"stop_{len(st.session_state.messages)}")
+        started = time.monotonic()
+        stage = "Analyzing"
+        try:
+            for event in events:
+                if event['type'] == 'result':
+                    status.empty()
+                    stop.empty()
+                    return event['response']
+                if event['type'] == 'status':
+                    stage = event['message']
+                status.caption(f"{stage}... {time.monotonic() - started:.0f}s")
+            return {"text": "No response from the assistant.", "chart_data": None}
+        except BaseException:
+            events.close()
+            print("UI - Interrupted, cancelled running queries")
+            self.add_message({"role": "assistant", "content": "_Cancelled._"})
+            raise
+    
+    def render_match_browser(self):
+        """Browse a player's full match history a page at a time, or export all of it."""
+        with st.expander("Browse matches"):
+            with st.form("match_filters"):
+                columns = st.columns(5)
+                player_name = columns[0].text_input("Player")
+                opponent = columns[1].text_input("Opponent (optional)")
+                year_start = columns[2].number_input("From year", min_value=2000, max_value=2100, value=None, step=1)
+                year_end = columns[3].number_input("To year", min_value=2000, max_value=2100, value=None, step=1)
+                surface = columns[4].selectbox("Surface", SURFACES)
+                submitted = st.form_submit_button("Show matches")
+            
+            if submitted and player_name.strip():
+                filters = {
+                    'opponent': opponent.strip() or None,
+                    'year_start': int(year_start) if year_start else None,
+                    'year_end': int(year_end) if year_end else None,
+                    'surface': None if surface == "Any" else surface
+                }
+                st.session_state.match_listing = {'player_name': player_name.strip(), 'filters': filters,
+                                                  'frame': None, 'next_cursor': None}
+                self._discard_match_export()
+                self.load_match_page()
+            
+            listing = st.session_state.match_listing
+            if not listing:
+                return
+            if listing.get('message'):
+                st.warning(listing['message'])
+            if listing['frame'] is not None:
+                st.caption(f"{len(listing['frame'])} matches, newest first")
+                st.dataframe(listing['frame'], hide_index=True, use_container_width=True)
+            if listing['next_cursor']:
+                st.button("Load more", on_click=self.load_match_page)
+            self.render_match_export(listing)
+    
+    def load_match_page(self):
+        """Fetch the page after the current one and append it to the table."""
+        import pandas as pd
+        listing = st.session_state.match_listing
+        result = st.session_state.agent.list_matches(
+            listing['player_name'], cursor=listing['next_cursor'], **listing['filters']
+        )
+        if not result.get('success'):
+            listing['message'] = result.get('message', "Could not load matches")
+            return
+        
+        listing['message'] = None
+        page = result['matches'].to_pandas()
+        listing['frame'] = page if listing['frame'] is None else pd.concat([listing['frame'], page], ignore_index=True)
+        listing['next_cursor'] = result['next_cursor']
+    
+    def render_match_export(self, listing: Dict[str, Any]):
+        """Write the full listing to a temporary file batch by batch, then offer it for download."""
+        columns = st.columns([1, 1, 3])
+        file_format = columns[0].selectbox("Export format", list(EXPORT_MIME_TYPES), label_visibility="collapsed")
+        if columns[1].button("Export all"):
+            self._discard_match_export()
+            out = tempfile.NamedTemporaryFile(suffix=f".{file_format}", delete=False)
+            try:
+                with out, st.spinner("Exporting..."):
+                    st.session_state.agent.export_matches(out, file_format, listing['player_name'],
+                                                          **listing['filters'])
+                st.session_state.match_export = {'path': out.name, 'format': file_format}
+            except Exception as e:
+                print(f"UI - Export failed: {str(e)}")
+                os.unlink(out.name)
+                st.error(f"Export failed: {str(e)}")
+        
+        export = st.session_state.match_export
+        if export and os.path.exists(export['path']):
+            with open(export['path'], "rb") as data:
+                columns[2].download_button(
+                    f"Download {export['format'].upper()} ({os.path.getsize(export['path']) // 1024} KB)",
+                    data=data,
+                    file_name=f"{listing['player_name'].replace(' ', '_')}_matches.{export['format']}",
+                    mime=EXPORT_MIME_TYPES[export['format']]
+                )
+    
+    def _discard_match_export(self):
+        export = st.session_state.match_export
+        st.session_state.match_export = None
+        if export and os.path.exists(export['path']):
+            os.unlink(export['path'])
     
     def render_sidebar_info(self):
         """Render additional information in the sidebar."""
@@ -144,6 +331,7 @@ class TennisAnalyticsUI:
             - Player performance analysis
             - Head-to-head comparisons
             - Tournament statistics
+            - Full match histories with CSV/Parquet export
             - Interactive visualizations
             """)
             
@@ -160,6 +348,7 @@ class TennisAnalyticsUI:
         """Run the Streamlit application."""
         self.render_header()
         self.render_sidebar_info()
+        self.render_match_browser()
         self.render_conversation_history()
         self.handle_user_input()
 
@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for the LLM scheduler against the local rate-limiting stub server.
+"""
+import threading
+import time
+
+import anthropic
+import pytest
+
+from scripts.stub_anthropic_server import serve_stub
+from src.ai.llm_scheduler import BATCH, INTERACTIVE, LLMScheduler, TokenBucket
+
+@pytest.fixture
+def stub():
+    servers = []
+
+    def start(**options):
+        server = serve_stub(port=0, **options)
+        servers.append(server)
+        client = anthropic.Anthropic(api_key="stub", base_url=f"http://127.0.0.1:{server.server_address[1]}",
+                                     max_retries=0)
+        return server, client
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+def _scheduler(**overrides):
+    options = dict(requests_per_minute=6000, tokens_per_minute=1_000_000, max_concurrency=4,
+                   max_retries=3, backoff_base=0.05, backoff_max=0.5, queue_timeout=30.0)
+    options.update(overrides)
+    return LLMScheduler(**options)
+
+def _call(scheduler, client, priority=INTERACTIVE, max_tokens=16):
+    return scheduler.create_message(client, priority=priority, model="stub", max_tokens=max_tokens,
+                                    messages=[{"role": "user", "content": "hi"}])
+
+def _wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+def test_interactive_calls_are_admitted_before_queued_batch_calls(stub):
+    server, client = stub(rpm=1000, latency=0.1)
+    scheduler = _scheduler(max_concurrency=1)
+    finished = []
+    lock = threading.Lock()
+
+    def call(priority, name):
+        _call(scheduler, client, priority)
+        with lock:
+            finished.append(name)
+
+    threads = [threading.Thread(target=call, args=(INTERACTIVE, 'first'))]
+    threads[0].start()
+    _wait_for(lambda: scheduler.stats()['in_flight'] == 1)
+    for i in range(3):
+        threads.append(threading.Thread(target=call, args=(BATCH, f'batch{i}')))
+        threads[-1].start()
+    _wait_for(lambda: scheduler.stats()['queue_depth'] == 3)
+    for i in range(3):
+        threads.append(threading.Thread(target=call, args=(INTERACTIVE, f'interactive{i}')))
+        threads[-1].start()
+    _wait_for(lambda: scheduler.stats()['queue_depth'] == 6)
+    for thread in threads:
+        thread.join()
+
+    assert finished[0] == 'first'
+    assert set(finished[1:4]) == {'interactive0', 'interactive1', 'interactive2'}
+    assert set(finished[4:]) == {'batch0', 'batch1', 'batch2'}
+    assert server.state.counts == {'ok': 7, 'rate_limited': 0, 'overloaded': 0}
+
+def test_rate_limit_honors_retry_after_and_pauses_every_caller(stub):
+    server, client = stub(rpm=1, latency=0.0, window=1.0)
+    scheduler = _scheduler()
+    _call(scheduler, client)
+
+    started = time.monotonic()
+    retried = threading.Thread(target=_call, args=(scheduler, client))
+    retried.start()
+    _wait_for(lambda: server.state.counts['rate_limited'] == 1)
+
+    # A new caller is held by the pause instead of drawing another 429
+    held = threading.Thread(target=_call, args=(scheduler, client))
+    held.start()
+    time.sleep(0.5)
+    assert server.state.counts == {'ok': 1, 'rate_limited': 1, 'overloaded': 0}
+
+    retried.join()
+    held.join()
+    assert time.monotonic() - started >= 1.0  # retry-after is rounded up to 1s
+    assert server.state.counts['ok'] == 3
+    stats = scheduler.stats()
+    assert stats['rate_limited'] >= 1
+    assert stats['retries'] >= 1
+    assert stats['failed'] == 0
+
+def test_request_bucket_spaces_calls_once_the_burst_is_spent(stub):
+    server, client = stub(rpm=1000, latency=0.0)
+    scheduler = _scheduler(requests_per_minute=120)  # 2 per second after the burst
+    scheduler._requests.take(120, time.monotonic())
+
+    started = time.monotonic()
+    threads = [threading.Thread(target=_call, args=(scheduler, client)) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert time.monotonic() - started >= 1.2
+    assert server.state.counts == {'ok': 3, 'rate_limited': 0, 'overloaded': 0}
+
+def test_token_bucket_holds_a_call_until_its_estimate_fits(stub):
+    server, client = stub(rpm=1000, latency=0.0)
+    scheduler = _scheduler(tokens_per_minute=1200)  # 20 per second
+    scheduler._tokens.take(1200, time.monotonic())
+
+    started = time.monotonic()
+    _call(scheduler, client, max_tokens=20)
+
+    estimated = LLMScheduler.estimate_tokens({'max_tokens': 20, 'messages': [{"role": "user", "content": "hi"}]})
+    assert time.monotonic() - started >= estimated / 20 * 0.9
+    assert server.state.counts['ok'] == 1
+
+def test_token_bucket_refills_to_capacity():
+    bucket = TokenBucket(per_minute=60)  # 1 per second
+    bucket.take(60, now=bucket._updated)
+    start = bucket._updated
+
+    assert bucket.wait_time(10, now=start) == pytest.approx(10.0)
+    assert bucket.wait_time(10, now=start + 4) == pytest.approx(6.0)
+    assert bucket.wait_time(10, now=start + 10) == 0.0
+    # Never more than capacity, and requests above capacity wait for a full bucket
+    assert bucket.wait_time(1000, now=start + 1000) == 0.0
+    bucket.take(1000, now=start + 1000)
+    bucket.give_back(1000, now=start + 1000)
+    assert bucket.wait_time(60, now=start + 1000) == 0.0
\ No newline at end of file
@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for keyset-paginated match listings: the query builder's keyset SQL,
+listing cursors and exports of empty listings.
+"""
+import datetime
+import io
+from decimal import Decimal
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from src.data.query_builder import SelectQuery
+from src.data.repositories import MatchRepository
+from src.services.tennis_service import TennisAnalysisService
+
+LISTING_KEY = ('TOURNAMENT_DATE', 'TOURNAMENT_ID', 'MATCH_NUM')
+
+def _listing_page(after_values):
+    return SelectQuery('listing', 'STG_ALL_MATCHES_SIMPLE', ['TOURNAMENT_DATE', 'SCORE']) \
+        .where_any(['WINNER_NAME', 'LOSER_NAME'], '=', 'Rafael Nadal') \
+        .where('SURFACE', '=', 'Clay') \
+        .after(LISTING_KEY, after_values, descending=True) \
+        .order_by('TOURNAMENT_DATE DESC', 'TOURNAMENT_ID DESC', 'MATCH_NUM DESC') \
+        .limit(50) \
+        .build()
+
+def test_descending_keyset_sql_and_param_order():
+    query = _listing_page((datetime.date(2020, 1, 6), '2020-0410', 7))
+
+    assert query.sql == (
+        "SELECT TOURNAMENT_DATE, SCORE FROM STG_ALL_MATCHES_SIMPLE "
+        "WHERE (LOSER_NAME = %s OR WINNER_NAME = %s) AND SURFACE = %s "
+        "AND (TOURNAMENT_DATE < %s OR (TOURNAMENT_DATE = %s "
+        "AND (TOURNAMENT_ID < %s OR (TOURNAMENT_ID = %s AND MATCH_NUM < %s)))) "
+        "ORDER BY TOURNAMENT_DATE DESC, TOURNAMENT_ID DESC, MATCH_NUM DESC LIMIT 50"
+    )
+    # where_any repeats its value per column, then filters, then each key value where the keyset uses it
+    assert query.params == (
+        'Rafael Nadal', 'Rafael Nadal', 'Clay',
+        datetime.date(2020, 1, 6), datetime.date(2020, 1, 6),
+        '2020-0410', '2020-0410',
+        7,
+    )
+
+def test_keyset_pages_share_one_sql_text():
+    first = _listing_page((datetime.date(2020, 1, 6), '2020-0410', 7))
+    second = _listing_page((datetime.date(2019, 5, 27), '2019-0520', 101))
+
+    assert first.sql == second.sql
+    assert first.params != second.params
+
+def test_ascending_keyset_uses_greater_than():
+    query = SelectQuery('listing', 'STG_ALL_MATCHES_SIMPLE', ['SCORE']) \
+        .after(('TOURNAMENT_DATE', 'MATCH_NUM'), (datetime.date(2020, 1, 6), 3)) \
+        .build()
+
+    assert query.sql.endswith("WHERE (TOURNAMENT_DATE > %s OR (TOURNAMENT_DATE = %s AND MATCH_NUM > %s))")
+    assert query.params == (datetime.date(2020, 1, 6), datetime.date(2020, 1, 6), 3)
+
+def test_keyset_rejects_mismatched_values():
+    with pytest.raises(ValueError):
+        SelectQuery('listing', 'STG_ALL_MATCHES_SIMPLE', ['SCORE']).after(LISTING_KEY, (datetime.date(2020, 1, 6),))
+
+def test_cursor_round_trips_the_last_rows_listing_key():
+    page = pa.table({
+        'TOURNAMENT_DATE': [datetime.date(2020, 1, 13), datetime.date(2020, 1, 6)],
+        'TOURNAMENT_ID': ['2020-0451', '2020-0410'],
+        # NUMBER columns can arrive as decimals
+        'MATCH_NUM': pa.array([Decimal(300), Decimal(7)], type=pa.decimal128(38, 0)),
+    })
+
+    cursor = TennisAnalysisService._encode_cursor(page)
+
+    assert TennisAnalysisService._decode_cursor(cursor) == (datetime.date(2020, 1, 6), '2020-0410', 7)
+    assert TennisAnalysisService._decode_cursor(None) is None
+    assert TennisAnalysisService._decode_cursor('') is None
+
+@pytest.mark.parametrize('cursor', [
+    'not json',
+    '["2020-01-06", "2020-0410"]',
+    '["2020-13-01", "2020-0410", 7]',
+    '["2020-01-06", "2020-0410", "seven"]',
+    '{"date": "2020-01-06"}',
+    '7',
+])
+def test_invalid_cursors_raise_value_error(cursor):
+    with pytest.raises(ValueError):
+        TennisAnalysisService._decode_cursor(cursor)
+
+def test_invalid_cursor_is_reported_before_any_query():
+    result = TennisAnalysisService().list_player_matches('Rafael Nadal', cursor='not json')
+
+    assert result == {'success': False, 'message': "Invalid match listing cursor: not json"}
+
+class _NoMatches(MatchRepository):
+    def iter_player_matches(self, *args, **kwargs):
+        return iter(())
+
+def _export_empty(file_format):
+    service = TennisAnalysisService()
+    service.match_repo = _NoMatches()
+    out = io.BytesIO()
+    rows = service.export_player_matches(out, file_format, 'Nobody')
+    return rows, out.getvalue()
+
+def test_empty_csv_export_has_the_header_only():
+    rows, data = _export_empty('csv')
+
+    assert rows == 0
+    assert data.decode('utf-8') == ",".join(MatchRepository.LISTING_COLUMNS) + "\n"
+
+def test_empty_parquet_export_is_a_valid_file_with_the_listing_schema():
+    rows, data = _export_empty('parquet')
+
+    assert rows == 0
+    table = pq.read_table(io.BytesIO(data))
+    assert table.num_rows == 0
+    assert table.schema.equals(MatchRepository.listing_schema())
\ No newline at end of file
@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for the compact tool result encoding and its truncation summary.
+"""
+from decimal import Decimal
+
+from src.ai.result_encoding import _csv, _summary, encode_table, estimate_tokens
+
+COLUMNS = ('opponent', 'year', 'matches', 'wins', 'win_pct')
+TOTALS = ('matches', 'wins')
+RATIOS = {'win_pct': ('wins', 'matches')}
+
+def _rows(count=60):
+    # Ranked by matches, as the repositories return them
+    rows = []
+    for i in range(count):
+        matches = 100 - i
+        wins = matches // 2 + i % 3
+        rows.append((f"Player {i:02d}", 2000 + i % 20, matches, wins, round(100 * wins / matches, 1)))
+    return rows
+
+def _truncated(rows, budget=200):
+    return encode_table("Record by opponent", COLUMNS, rows, budget_tokens=budget, totals=TOTALS, ratios=RATIOS)
+
+def test_small_tables_are_sent_whole_as_csv():
+    result = encode_table("Record by opponent", COLUMNS, _rows(3), budget_tokens=1000, totals=TOTALS)
+
+    assert result.encoding == 'csv'
+    assert result.rows == result.rows_sent == 3
+    assert result.text.splitlines()[1] == ",".join(COLUMNS)
+    assert "omitted" not in result.text
+
+def test_single_row_is_sent_as_labelled_lines():
+    result = encode_table("Career", ('player', 'matches'), [('Ann', Decimal('12.0'))])
+
+    assert result.encoding == 'records'
+    assert result.text == "Career\nplayer: Ann\nmatches: 12"
+
+def test_truncation_keeps_the_largest_prefix_that_fits():
+    rows = _rows()
+    result = _truncated(rows)
+
+    assert result.encoding == 'csv_truncated'
+    assert 1 <= result.rows_sent < len(rows)
+    assert result.tokens <= 200
+    # One more leading row would no longer fit with the summary
+    shown = result.rows_sent
+    longer = (f"Record by opponent\n{_csv(COLUMNS, rows[:shown + 1])}\n"
+              f"{_summary(COLUMNS, rows, shown + 1, TOTALS, RATIOS)}")
+    assert estimate_tokens(longer) > 200
+    assert result.text.splitlines()[2:2 + shown] == _csv(COLUMNS, rows[:shown]).splitlines()[1:]
+
+def test_summary_totals_additive_columns_and_recomputes_ratios():
+    rows = _rows()
+    summary = _truncated(rows).text.splitlines()[-1]
+    matches = sum(row[2] for row in rows)
+    wins = sum(row[3] for row in rows)
+
+    assert summary.startswith(f"[{len(rows) - _truncated(rows).rows_sent} of {len(rows)} rows omitted; all rows: ")
+    assert f"matches total {matches}" in summary
+    assert f"wins total {wins}" in summary
+    # The overall percentage, not a sum or mean of per-row percentages
+    assert f"win_pct overall {round(wins / matches * 100, 1)}" in summary
+    assert "win_pct total" not in summary
+
+def test_summary_gives_ranges_for_other_numeric_columns_and_the_omitted_rows():
+    rows = _rows()
+    result = _truncated(rows)
+    summary = result.text.splitlines()[-1]
+    omitted = rows[result.rows_sent:]
+
+    assert "year range 2000 to 2019" in summary
+    assert "year total" not in summary
+    assert (f"matches total {sum(row[2] for row in rows)} "
+            f"(omitted range {min(row[2] for row in omitted)} to {max(row[2] for row in omitted)})") in summary
+    # Text columns are not summarized
+    assert "opponent" not in summary
+
+def test_ratio_is_skipped_when_its_totals_are_not_declared():
+    rows = _rows()
+    result = encode_table("Record by opponent", COLUMNS, rows, budget_tokens=200, ratios=RATIOS)
+    summary = result.text.splitlines()[-1]
+
+    assert "win_pct overall" not in summary
+    assert "matches range" in summary
\ No newline at end of file